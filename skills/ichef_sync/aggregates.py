@@ -0,0 +1,399 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from ingest import SCHEMAS, compact, concat_frames, clean_item_names, item_categories, fill_category
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MASTER_CACHE_PATH = os.path.join(BASE_DIR, 'product_master_cache.csv')
+
+# Same rules as src/lib/dateUtils.ts: the business day starts at 05:00,
+# night owl is 22:30-05:00.
+BUSINESS_DAY_START_HOUR = 5
+NIGHT_OWL_START_MINUTES = 22 * 60 + 30
+
+# Order-level dimensions come from the Orders export, item-level ones from Product Sales.
+# Each source only ever replaces its own dimensions.
+ORDER_DIMENSIONS = ['total', 'hour', 'order_type', 'payment', 'period']
+ITEM_DIMENSIONS = ['items', 'category']
+HOURS = [f'{hour:02d}' for hour in range(24)]
+# Summary tabs, without the tab prefix (see summary_tables)
+TABS = ['Daily', 'Monthly', 'Hourly', 'OrderType', 'Payment', 'TimePeriod', 'Category']
+# One sale in the exports: item lines of an order share it, so it keys both kinds
+INVOICE_KEY = ['發票號碼', '結帳時間']
+
+
+class BatchCollector:
+    """Sink that keeps the validated batches of this run for the aggregation stage."""
+    name = 'summaries'
+
+    def __init__(self):
+        self.batches = {'orders': [], 'product_sales': []}
+        # file -> (target, validated rows), so archiving can catalog a file without re-reading it
+        self.files = {}
+
+    def write(self, target, file_path, df):
+        if target in self.batches and not df.empty:
+            self.batches[target].append(df)
+            self.files[file_path] = (target, df)
+        return True
+
+    def close(self):
+        pass
+
+
+def connect_store(path):
+    """sqlite3 connection for a store path; relative paths are resolved against this folder.
+
+    ':memory:' and 'file:' URIs are passed through as they are.
+    """
+    if path == ':memory:' or path.startswith('file:'):
+        return sqlite3.connect(path, uri=path.startswith('file:'))
+    if not os.path.isabs(path):
+        path = os.path.join(BASE_DIR, path)
+    return sqlite3.connect(path)
+
+
+def business_date(ts):
+    """'YYYY-MM-DD' of the business day each timestamp belongs to (NaT -> NA)."""
+    days = (ts - pd.Timedelta(hours=BUSINESS_DAY_START_HOUR)).dt.normalize()
+    # Formatted once per distinct day, not once per row; NaT has code -1, the trailing None
+    codes, uniques = pd.factorize(days)
+    labels = np.append(np.asarray(uniques.strftime('%Y-%m-%d'), dtype=object), None)
+    return pd.Series(labels[codes], index=ts.index, name=ts.name)
+
+
+def latest_per_day(frames, kept=None):
+    """Concatenates batches so that every sale of a business day is counted once.
+
+    Exports are cut at midnight but a business day runs until 05:00, so the first
+    and last business day of a file are usually partial; the rest of them is in the
+    neighbouring export. A day strictly inside a later file's range is taken from
+    that file alone. On the partial days an invoice (INVOICE_KEY) found in a later
+    file replaces the same invoice from earlier files, and the other invoices are kept.
+    `kept` are rows stored by an earlier run (with _date), older than every file.
+    """
+    tagged, spans = [], []
+    if kept is not None and not kept.empty:
+        tagged.append(kept.assign(_file=-1))
+    for i, df in enumerate(frames):
+        df = df[df['結帳時間'].notna()].copy()
+        df['_date'] = business_date(df['結帳時間'])
+        df['_file'] = i
+        tagged.append(df)
+        if len(df):
+            spans.append((i, df['_date'].min(), df['_date'].max()))
+    if not tagged:
+        return pd.DataFrame()
+    df = concat_frames(tagged)
+
+    # Latest file holding each day completely (-1: none), decided once per distinct day
+    codes, days = pd.factorize(df['_date'])
+    days = np.asarray(days, dtype=object)
+    covered = np.full(len(days), -1)
+    for i, first, last in spans:
+        covered[(days > first) & (days < last)] = i
+    latest = df.groupby(INVOICE_KEY, observed=True, sort=False)['_file'].transform('max')
+    return df[(df['_file'].to_numpy() >= covered[codes]) & (df['_file'] == latest)]
+
+
+class InvoiceRows:
+    """Rows a store was built from, in one table of the store's SQLite file.
+
+    A business day split over two exports is rebuilt from these rows plus the new
+    file (see latest_per_day) instead of from the new file alone. Only `columns`
+    (besides INVOICE_KEY) are kept, which is what the store's facts need.
+    """
+
+    def __init__(self, conn, table, kind, columns):
+        self.conn = conn
+        self.table = table
+        self.kind = kind
+        self.columns = INVOICE_KEY + [c for c in columns if c not in INVOICE_KEY]
+        amounts = SCHEMAS[kind]['amounts']
+        defs = ', '.join(f'"{c}" {"REAL" if c in amounts else "TEXT"}' for c in self.columns)
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (date TEXT NOT NULL, {defs})")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_date ON {table} (date)")
+
+    def read(self, dates):
+        """Stored rows of the given business days, typed like validated rows (with _date)."""
+        dates = sorted(dates)
+        df = pd.read_sql_query(
+            f"SELECT * FROM {self.table} WHERE date IN ({', '.join('?' for _ in dates)})", self.conn, params=dates)
+        df = df.rename(columns={'date': '_date'})
+        for col in self.columns:
+            if col == '結帳時間':
+                df[col] = pd.to_datetime(df[col])
+            elif col in SCHEMAS[self.kind]['amounts']:
+                df[col] = pd.to_numeric(df[col]).astype('Float64')
+            else:
+                df[col] = df[col].astype('string')
+        return compact(df, self.kind)
+
+    def merge(self, frames):
+        """Folds this run's frames into the stored rows.
+
+        Returns the complete rows (with _date) of every business day in the frames.
+        """
+        frames = [df[[c for c in self.columns if c in df.columns]] for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+        dates = business_date(pd.concat([df['結帳時間'] for df in frames]).dropna()).unique()
+        df = latest_per_day(frames, self.read(dates))
+        rows = df.reindex(columns=['_date'] + self.columns)
+        rows['結帳時間'] = rows['結帳時間'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        with self.conn:
+            self.conn.executemany(f"DELETE FROM {self.table} WHERE date = ?", [(d,) for d in dates])
+            self.conn.executemany(
+                f"INSERT INTO {self.table} VALUES ({', '.join('?' for _ in rows.columns)})",
+                rows.astype(object).where(rows.notna(), None).values.tolist(),
+            )
+        return df
+
+
+def _facts(df, key, measures):
+    facts = df.groupby(['_date', key], observed=True).agg(**measures).reset_index()
+    return facts.rename(columns={'_date': 'date', key: 'key'})
+
+
+def order_facts(df):
+    """Per business day: totals and hour / order type / payment / night-owl splits."""
+    df = df.copy()
+    ts = df['結帳時間']
+    minutes = ts.dt.hour * 60 + ts.dt.minute
+    df['_all'] = 'all'
+    # '00'..'23' as a categorical: formatting every timestamp with strftime is the slow part here
+    df['_hour'] = pd.Categorical.from_codes(ts.dt.hour.fillna(-1).astype(int), HOURS)
+    df['_period'] = 'regular'
+    df.loc[(minutes >= NIGHT_OWL_START_MINUTES) | (minutes < BUSINESS_DAY_START_HOUR * 60), '_period'] = 'night_owl'
+    df['_order_type'] = fill_category(df.get('訂單種類', pd.Series('', index=df.index)))
+    df['_payment'] = fill_category(df.get('支付方式', pd.Series('', index=df.index)))
+
+    measures = {'orders': ('發票號碼', 'size'), 'revenue': ('結帳金額', 'sum')}
+    parts = []
+    for dimension, col in zip(ORDER_DIMENSIONS, ['_all', '_hour', '_order_type', '_payment', '_period']):
+        facts = _facts(df, col, measures)
+        facts['dimension'] = dimension
+        facts['items'] = 0
+        parts.append(facts)
+    return pd.concat(parts, ignore_index=True)
+
+
+def item_facts(df, category_map):
+    """Per business day: item totals and per-category items/revenue."""
+    df = df.copy()
+    df['_category'] = item_categories(clean_item_names(df['商品名稱']), category_map)
+    df['_all'] = 'all'
+
+    measures = {'items': ('商品名稱', 'size'), 'revenue': ('結帳金額', 'sum')}
+    parts = []
+    for dimension, col in zip(ITEM_DIMENSIONS, ['_all', '_category']):
+        facts = _facts(df, col, measures)
+        facts['dimension'] = dimension
+        facts['orders'] = 0
+        parts.append(facts)
+    return pd.concat(parts, ignore_index=True)
+
+
+def load_category_map(client, config):
+    """商品名稱 -> 大分類, from the master sheet when connected, else the local cache."""
+    columns = config['sheets']['product_master']['columns']
+    try:
+        if client is not None:
+            sh = client.open_by_key(config['sheets']['product_master']['id'])
+            records = sh.worksheet(config['sheets']['product_master']['sheet_name']).get_all_records()
+            df_master = pd.DataFrame(records)
+        elif os.path.exists(MASTER_CACHE_PATH):
+            df_master = pd.read_csv(MASTER_CACHE_PATH)
+        else:
+            return {}
+        df_master = df_master.drop_duplicates(subset=[columns['name']])
+        return df_master.set_index(df_master[columns['name']].astype(str).str.strip())[columns['category']].to_dict()
+    except Exception as e:
+        print(f"Warning: could not load product categories ({repr(e)}); using 未分類.")
+        return {}
+
+
+class SummaryStore:
+    """Local SQLite store of per-day facts; a re-synced day replaces its previous facts.
+
+    The facts of a day are computed from all of its rows (`rows`, merged by invoice),
+    so a day split over two exports is summarized whole.
+    """
+
+    def __init__(self, path):
+        self.conn = connect_store(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS daily_facts ("
+            " date TEXT NOT NULL, dimension TEXT NOT NULL, key TEXT NOT NULL,"
+            " orders INTEGER NOT NULL, items INTEGER NOT NULL, revenue REAL NOT NULL,"
+            " PRIMARY KEY (date, dimension, key))"
+        )
+        self.rows = {
+            'orders': InvoiceRows(self.conn, 'order_rows', 'orders', ['結帳金額', '訂單種類', '支付方式']),
+            'product_sales': InvoiceRows(self.conn, 'item_rows', 'product_sales', ['商品名稱', '結帳金額']),
+        }
+
+    def replace(self, facts, dimensions):
+        """Replaces the given dimensions for every date present in facts."""
+        dates = sorted(facts['date'].unique())
+        with self.conn:
+            self.conn.executemany(
+                f"DELETE FROM daily_facts WHERE date = ? AND dimension IN ({', '.join('?' for _ in dimensions)})",
+                [(d, *dimensions) for d in dates],
+            )
+            rows = facts[['date', 'dimension', 'key', 'orders', 'items', 'revenue']]
+            self.conn.executemany(
+                "INSERT INTO daily_facts (date, dimension, key, orders, items, revenue) VALUES (?, ?, ?, ?, ?, ?)",
+                [(d, dim, str(k), int(o), int(i), float(r)) for d, dim, k, o, i, r in rows.itertuples(index=False)],
+            )
+        return dates
+
+    def read(self, months=None):
+        """Stored facts, optionally only those of the given 'YYYY-MM' months."""
+        if months is None:
+            return pd.read_sql_query("SELECT * FROM daily_facts", self.conn)
+        months = sorted(months)
+        return pd.read_sql_query(
+            f"SELECT * FROM daily_facts WHERE substr(date, 1, 7) IN ({', '.join('?' for _ in months)})",
+            self.conn, params=months,
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+def summary_tables(facts):
+    """Compact dashboard tables (one per summary tab) from the stored daily facts."""
+    facts = facts.copy()
+    facts['month'] = facts['date'].str[:7]
+    tables = {}
+
+    total = facts[facts['dimension'] == 'total'][['date', 'month', 'orders', 'revenue']]
+    items = facts[facts['dimension'] == 'items'][['date', 'items']]
+    daily = total.merge(items, on='date', how='outer').fillna({'orders': 0, 'revenue': 0, 'items': 0})
+    daily['month'] = daily['date'].str[:7]
+    daily = daily.sort_values('date')
+
+    tables['Daily'] = daily[['date', 'orders', 'revenue', 'items']]
+    monthly = daily.groupby('month', as_index=False)[['orders', 'revenue', 'items']].sum()
+    tables['Monthly'] = monthly
+
+    for dimension, tab, measure in [
+        ('hour', 'Hourly', 'orders'),
+        ('order_type', 'OrderType', 'orders'),
+        ('payment', 'Payment', 'orders'),
+        ('period', 'TimePeriod', 'orders'),
+        ('category', 'Category', 'items'),
+    ]:
+        part = facts[facts['dimension'] == dimension]
+        tables[tab] = (
+            part.groupby(['month', 'key'], as_index=False)[[measure, 'revenue']].sum()
+            .rename(columns={'key': dimension})
+            .sort_values(['month', dimension])
+        )
+
+    for df in tables.values():
+        if 'orders' in df.columns and 'revenue' in df.columns:
+            df['avg_order_value'] = (df['revenue'] / df['orders'].where(df['orders'] > 0)).round(0).fillna(0)
+    return tables
+
+
+def _sheet_values(df):
+    return df.astype(object).where(df.notna(), '').values.tolist()
+
+
+def _update_rows(ws, df, keys):
+    """Replaces only the rows whose first column is in keys. False if the tab must be rewritten.
+
+    A key keeps its rows in place when it still has as many; a key newer than
+    everything in the tab is appended. Anything else (a key whose row count
+    changed, a new key in the middle, another header) needs a full rewrite.
+    """
+    key_col = df.columns[0]
+    if ws.row_values(1) != df.columns.tolist():
+        return False
+    sheet_keys = ws.col_values(1)[1:]
+    updates, appends = [], []
+    for key in sorted(keys):
+        values = _sheet_values(df[df[key_col] == key])
+        rows = [i for i, k in enumerate(sheet_keys) if k == key]
+        if not rows and not values:
+            continue
+        if rows and len(rows) == len(values) and rows[-1] - rows[0] == len(rows) - 1:
+            updates.append({'range': f'A{rows[0] + 2}', 'values': values})
+        elif not rows and all(k < key for k in sheet_keys):
+            appends.extend(values)
+        else:
+            return False
+    if updates:
+        ws.batch_update(updates)
+    if appends:
+        ws.append_rows(appends)
+    return True
+
+
+def publish_tabs(client, config, store, dates=None):
+    """Writes each summary table to its own tab.
+
+    With `dates`, only the rows of those business days (Daily) or of their
+    months (the other tabs) are written. A tab that cannot be patched in place,
+    or any tab when `dates` is None, is rewritten from all stored facts.
+    """
+    summaries = config['summaries']
+    sh = client.open_by_key(summaries['id'])
+    prefix = summaries.get('tab_prefix', 'Summary_')
+    existing = {ws.title: ws for ws in sh.worksheets()}
+
+    rewrite = list(TABS)
+    if dates is not None:
+        months = {d[:7] for d in dates}
+        tables = summary_tables(store.read(months))
+        rewrite = []
+        for name, df in tables.items():
+            ws = existing.get(prefix + name)
+            keys = dates if df.columns[0] == 'date' else months
+            if ws is None or not _update_rows(ws, df, keys):
+                rewrite.append(name)
+
+    if rewrite:
+        tables = summary_tables(store.read())
+        for name in rewrite:
+            df = tables[name]
+            title = prefix + name
+            values = [df.columns.tolist()] + _sheet_values(df)
+            ws = existing.get(title) or sh.add_worksheet(title=title, rows=str(len(values) + 10), cols=str(len(df.columns)))
+            ws.clear()
+            ws.update(values, 'A1')
+    print(f"Published {len(TABS)} summary tabs ({prefix}*), {len(rewrite)} rewritten in full.")
+
+
+def update_summaries(batches, config, client=None):
+    """Aggregation stage: refreshes the summaries for the business days touched by this run."""
+    summaries = config.get('summaries')
+    if not summaries or not (batches['orders'] or batches['product_sales']):
+        return
+
+    print("Updating dashboard summaries...")
+    store = SummaryStore(summaries.get('store', 'downloads/summaries.db'))
+    try:
+        touched = set()
+        if batches['orders']:
+            df = store.rows['orders'].merge(batches['orders'])
+            touched.update(store.replace(order_facts(df), ORDER_DIMENSIONS))
+        if batches['product_sales']:
+            category_map = load_category_map(client, config)
+            df = store.rows['product_sales'].merge(batches['product_sales'])
+            touched.update(store.replace(item_facts(df, category_map), ITEM_DIMENSIONS))
+        if not touched:
+            print("No business days to summarize in this run.")
+            return
+        print(f"Summaries updated for {len(touched)} business days ({min(touched)} ~ {max(touched)}).")
+
+        if client is not None and summaries.get('id'):
+            publish_tabs(client, config, store, touched)
+    finally:
+        store.close()
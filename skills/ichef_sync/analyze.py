@@ -0,0 +1,492 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import pickle
+import hashlib
+import argparse
+import warnings
+
+import pandas as pd
+
+import journal
+import catalog
+# profiling.py is shared with the other skills
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import profiling
+from ingest import validate, compact, clean_item_names, item_categories, fill_category
+from aggregates import BASE_DIR, MASTER_CACHE_PATH, latest_per_day, load_category_map, connect_store
+from analyze_category_impact import BASELINE_WEEKS, Z_THRESHOLD, scan_anomalies, print_anomalies, print_deep_dive
+
+warnings.simplefilter(action='ignore', category=FutureWarning)
+
+ARCHIVE_DIR = os.path.join(BASE_DIR, 'downloads', 'processed')
+CONFIG_PATH = os.path.join(BASE_DIR, 'config.json')
+
+# Bump when an analysis changes what it computes, so cached results from older code are not served
+CACHE_VERSION = 3
+
+# Items the stability analysis leaves out: set menus, catering, frozen and take-out bundles
+EXCLUDE_KEYWORDS = ['年菜', '餐酒', '無菜單', '冷凍', '外燴', '外帶', '2500元', '2000元', '1500元', '1200元']
+# --exclude when not given on the command line
+DEFAULT_EXCLUDE = {'stability': EXCLUDE_KEYWORDS}
+# An item is "stable" when it sold on at least this share of business days
+STABLE_SHARE = 0.2
+# Categories with fewer lines than this are left out of the variety correlations
+MIN_CATEGORY_LINES = 10
+BLACKBOARD_KEYWORD = '黑板'
+
+
+def expand_sources(sources):
+    """Export paths from files, directories and glob patterns, in the order given.
+
+    Within a directory or pattern files are sorted by name; archived exports start
+    with their archive timestamp, so a later export wins in latest_per_day.
+    """
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            found = sorted(glob.glob(os.path.join(source, '*.xls*')))
+        elif glob.has_magic(source):
+            found = sorted(glob.glob(source))
+        else:
+            found = [source]
+        for path in found:
+            name = os.path.basename(path)
+            if not (name.startswith('.') or name.startswith('~$')) and path not in paths:
+                paths.append(path)
+    return paths
+
+
+class AnalysisCache:
+    """Parsed exports and finished analyses in SQLite, keyed by content hashes.
+
+    files remembers the content hash per (path, size, mtime), so an unchanged file is
+    not even re-hashed; frames keeps each export's validated rows by content hash, so
+    only new or changed exports are read from Excel; results keeps finished analyses
+    by a hash of their inputs and parameters.
+    """
+
+    def __init__(self, path):
+        self.conn = connect_store(path)
+        with self.conn:
+            self.conn.executescript(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS frames ("
+                " digest TEXT PRIMARY KEY, kind TEXT, rows INTEGER NOT NULL, data BLOB NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, analysis TEXT NOT NULL, params TEXT NOT NULL,"
+                " created_at REAL NOT NULL, data BLOB NOT NULL);"
+            )
+
+    def digest(self, path):
+        """Content hash of a file, re-hashed only when its size or mtime changed."""
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        row = self.conn.execute("SELECT size, mtime_ns, digest FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return row[2]
+        digest = journal.file_id(path)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                              (path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def frame(self, path, digest):
+        """(kind, validated rows, first raw rows, rejected rows per reason) of an export, parsed once per content hash."""
+        row = self.conn.execute("SELECT data FROM frames WHERE digest = ?", (digest,)).fetchone()
+        parsed = pickle.loads(row[0]) if row else None
+        # Frames cached by an older validate() (3-tuples, no rejected counts) are read again
+        if parsed and len(parsed) == 4:
+            kind, clean, head, rejected = parsed
+            # Frames cached before the compact dtypes get them on the way out
+            return kind, compact(clean, kind) if kind else clean, head, rejected
+        print(f"Reading {os.path.basename(path)}...")
+        raw = pd.read_excel(path)
+        kind = catalog.export_kind(raw.columns)
+        clean, rejected = None, {}
+        if kind:
+            clean, bad, _ = validate(raw, kind)
+            rejected = bad['_reject_reason'].str.split('; ').explode().value_counts().to_dict()
+        parsed = (kind, clean, raw.head(5), rejected)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO frames (digest, kind, rows, data) VALUES (?, ?, ?, ?)",
+                              (digest, kind, len(raw), pickle.dumps(parsed, protocol=pickle.HIGHEST_PROTOCOL)))
+        return parsed
+
+    def result(self, key):
+        row = self.conn.execute("SELECT created_at, data FROM results WHERE key = ?", (key,)).fetchone()
+        return (row[0], pickle.loads(row[1])) if row else None
+
+    def store(self, key, analysis, params, result):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, analysis, params, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                (key, analysis, json.dumps(params, ensure_ascii=False, sort_keys=True), time.time(),
+                 pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def clear(self):
+        with self.conn:
+            self.conn.executescript("DELETE FROM files; DELETE FROM frames; DELETE FROM results;")
+        self.conn.execute("VACUUM")
+
+    def close(self):
+        self.conn.close()
+
+
+def load_master(path):
+    """商品名稱 -> 大分類 from a product master CSV/XLSX, or the local master cache."""
+    if not path:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            return load_category_map(None, json.load(f))
+    df = pd.read_excel(path) if '.xls' in path.lower() else pd.read_csv(path)
+    df = df.drop_duplicates(subset=['商品名稱'])
+    return df.set_index(df['商品名稱'].astype(str).str.strip())['大分類'].to_dict()
+
+
+def load_inputs(cache, paths, master, params):
+    """Item lines and orders of the selected exports and date range, one file per business day."""
+    frames = {'product_sales': [], 'orders': []}
+    headers = []
+    for path in paths:
+        kind, clean, head, rejected = cache.frame(path, cache.digest(path))
+        headers.append((path, kind, head))
+        if rejected:
+            reasons = ', '.join(f"{reason}: {count}" for reason, count in rejected.items())
+            print(f"Warning: {os.path.basename(path)} has rows that failed validation and are left out ({reasons}).")
+        if kind:
+            frames[kind].append(clean)
+
+    def select(kind):
+        df = latest_per_day(frames[kind]) if frames[kind] else pd.DataFrame(columns=['_date', '結帳時間', '結帳金額'])
+        if params['start']:
+            df = df[df['_date'] >= params['start']]
+        if params['end']:
+            df = df[df['_date'] <= params['end']]
+        return df.assign(結帳金額=df['結帳金額'].astype(float))
+
+    items, orders = select('product_sales'), select('orders')
+    if not items.empty:
+        category_map = load_master(master)
+        items = items.assign(CleanName=clean_item_names(items['商品名稱']))
+        items = items.assign(Category=item_categories(items['CleanName'], category_map))
+        if params.get('exclude'):
+            pattern = '|'.join(map(re.escape, params['exclude']))
+            excluded = items['CleanName'].str.contains(pattern, na=False)
+            print(f"Excluded {int(excluded.sum())} item lines matching {', '.join(params['exclude'])}.")
+            items = items[~excluded]
+    return {'items': items, 'orders': orders, 'headers': headers}
+
+
+def revenue_groups(revenue):
+    """'High' / 'Low' per day: at or above the median daily revenue, or below it."""
+    median = revenue.median()
+    return revenue.ge(median).map({True: 'High', False: 'Low'}), median
+
+
+# --- Analyses: each takes the loaded inputs and parameters and returns plain frames/values ---
+
+def variety(data, params):
+    """Does menu variety move with revenue? Overall, per category, and blackboard items on low days."""
+    df = data['items']
+    daily = df.groupby('_date').agg(revenue=('結帳金額', 'sum'), variety=('CleanName', 'nunique'),
+                                    lines=('CleanName', 'size'))
+    group, median = revenue_groups(daily['revenue'])
+    cat_variety = df.groupby(['_date', 'Category'], observed=True)['CleanName'].nunique().unstack(fill_value=0).reindex(daily.index, fill_value=0)
+    cat_lines = df['Category'].value_counts()
+    correlations = cat_variety.loc[:, cat_lines[cat_lines >= MIN_CATEGORY_LINES].index].corrwith(daily['revenue'])
+
+    cat_summary = cat_variety.groupby(group).mean().T.reindex(columns=['High', 'Low'], fill_value=0).rename_axis(columns=None)
+    cat_summary['Difference'] = cat_summary['High'] - cat_summary['Low']
+    cat_summary['% Drop'] = cat_summary['Difference'] / cat_summary['High'] * 100
+    cat_summary = cat_summary.sort_values('Difference', ascending=False)
+
+    board = df[df['Category'].astype(str).str.contains(params['blackboard'], regex=False)]
+    days_per_group = group.value_counts()
+    item_stats = board.groupby(['CleanName', board['_date'].map(group)], observed=True).size().unstack(fill_value=0)
+    item_stats = item_stats.reindex(columns=['High', 'Low'], fill_value=0).rename_axis(columns=None)
+    item_stats['High_Freq'] = item_stats['High'] / days_per_group.get('High', 1)
+    item_stats['Low_Freq'] = item_stats['Low'] / max(days_per_group.get('Low', 0), 1)
+    item_stats['Diff_Freq'] = item_stats['High_Freq'] - item_stats['Low_Freq']
+    return {
+        'days': len(daily),
+        'range': (daily.index.min(), daily.index.max()),
+        'median': median,
+        'corr_variety': daily['revenue'].corr(daily['variety']),
+        'corr_lines': daily['revenue'].corr(daily['lines']),
+        'category_correlations': correlations.sort_values(ascending=False),
+        'category_summary': cat_summary,
+        'blackboard': item_stats.sort_values('Diff_Freq', ascending=False),
+    }
+
+
+def stability(data, params):
+    """Revenue from items sold on most days (stable) vs occasional ones (unstable), high vs low days."""
+    df = data['items']
+    total_days = df['_date'].nunique()
+    item_days = df.groupby('CleanName', observed=True)['_date'].nunique()
+    threshold_days = total_days * params['stable_share']
+    stable = item_days >= threshold_days
+    item_type = df['CleanName'].map(stable).map({True: 'Stable', False: 'Unstable'})
+
+    split = df.groupby(['_date', item_type], observed=True)['結帳金額'].sum().unstack(fill_value=0)
+    split = split.reindex(columns=['Stable', 'Unstable'], fill_value=0)
+    split['TotalRevenue'] = split['Stable'] + split['Unstable']
+    split['Stable%'] = split['Stable'] / split['TotalRevenue'] * 100
+    split['Unstable%'] = split['Unstable'] / split['TotalRevenue'] * 100
+    group, median = revenue_groups(split['TotalRevenue'])
+    summary = split.groupby(group).agg(
+        Avg_Total_Revenue=('TotalRevenue', 'mean'),
+        Avg_Stable_Revenue=('Stable', 'mean'),
+        Avg_Unstable_Revenue=('Unstable', 'mean'),
+        Avg_Stable_Pct=('Stable%', 'mean'),
+        Avg_Unstable_Pct=('Unstable%', 'mean'),
+    ).rename_axis('RevenueGroup')
+
+    # Which unstable items show up on high days but rarely on low days (lines per day)
+    unstable = df[item_type == 'Unstable']
+    days_per_group = group.value_counts()
+    lines = unstable.groupby(['CleanName', unstable['_date'].map(group)], observed=True).size().unstack(fill_value=0)
+    lines = lines.reindex(columns=['High', 'Low'], fill_value=0)
+    impact = pd.DataFrame({
+        'High_Freq': lines['High'] / days_per_group.get('High', 1),
+        'Low_Freq': lines['Low'] / max(days_per_group.get('Low', 0), 1),
+    })
+    impact['Diff'] = impact['High_Freq'] - impact['Low_Freq']
+    return {
+        'days': total_days,
+        'threshold_days': threshold_days,
+        'items': len(item_days),
+        'stable_items': int(stable.sum()),
+        'median': median,
+        'summary': summary,
+        'impact': impact.sort_values('Diff', ascending=False),
+    }
+
+
+def trends(data, params):
+    """Year-over-year revenue, category share, order types, top items and menu variety."""
+    items = data['items'].assign(Year=data['items']['_date'].str[:4], Month=data['items']['_date'].str[:7])
+    orders = data['orders'].assign(Year=data['orders']['_date'].str[:4])
+    annual = orders.groupby('Year').agg(
+        TotalRevenue=('結帳金額', 'sum'),
+        TotalOrders=('發票號碼', 'nunique'),
+        AvgOrderValue=('結帳金額', 'mean'),
+    )
+    cat_revenue = items.groupby(['Year', 'Category'], observed=True)['結帳金額'].sum().unstack(fill_value=0)
+    cat_share = cat_revenue.div(cat_revenue.sum(axis=1), axis=0) * 100
+    # Columns ordered by the year with the most business days, the most representative one
+    full_year = items.groupby('Year')['_date'].nunique().idxmax() if not items.empty else None
+    if full_year is not None:
+        cat_share = cat_share[cat_share.loc[full_year].sort_values(ascending=False).index]
+    if '訂單種類' in orders.columns:
+        types = orders.groupby(['Year', fill_category(orders['訂單種類'])], observed=True).size().unstack(fill_value=0)
+        type_share = types.div(types.sum(axis=1), axis=0) * 100
+    else:
+        type_share = pd.DataFrame()
+
+    year_revenue = items.groupby('Year')['結帳金額'].sum()
+    top = items.groupby(['Year', 'CleanName'], observed=True)['結帳金額'].sum().reset_index()
+    top = top.sort_values('結帳金額', ascending=False).groupby('Year').head(params['top_items'])
+    top['Share'] = top['結帳金額'] / top['Year'].map(year_revenue)
+    return {
+        'annual': annual,
+        'category_share': cat_share,
+        'order_type_share': type_share,
+        'top_items': top.sort_values(['Year', '結帳金額'], ascending=[True, False]),
+        'variety': items.groupby('Year')['CleanName'].nunique().rename('UniqueItemsSold').to_frame(),
+        'monthly_variety': items.groupby(['Year', 'Month'])['CleanName'].nunique().groupby('Year').mean(),
+    }
+
+
+def inspect(data, params):
+    """Detected type, columns and first rows of every selected export."""
+    return [{'file': os.path.basename(path), 'kind': kind, 'columns': head.columns.tolist(), 'head': head.head(2)}
+            for path, kind, head in data['headers']]
+
+
+def anomalies(data, params):
+    """Same-weekday anomaly scan of every business day (see analyze_category_impact.py)."""
+    return scan_anomalies(data['items'], weeks=params['weeks'], threshold=params['threshold'])
+
+
+# --- Reports: print a (possibly cached) result ---
+
+def report_variety(result, args):
+    print(f"\n--- Correlation Analysis (n={result['days']} days, {result['range'][0]} ~ {result['range'][1]}) ---")
+    print(f"Overall Variety vs Revenue: {result['corr_variety']:.4f}")
+    print(f"Total Items Sold (Quantity) vs Revenue: {result['corr_lines']:.4f}")
+    print("\n--- Correlation by Category Variety ---")
+    for cat, c in result['category_correlations'].items():
+        print(f"{cat}: {c:.4f}")
+    print(f"\n--- Category Variety Impact (Median Revenue: ${result['median']:,.0f}) ---")
+    print(result['category_summary'][['High', 'Low', 'Difference', '% Drop']].round(1).to_string())
+    print("\n--- Top Blackboard Items Missing in Low Revenue Days ---")
+    print(result['blackboard'].head(args.top)[['High_Freq', 'Low_Freq', 'Diff_Freq']].round(3).to_string())
+
+
+def report_stability(result, args):
+    print(f"Total Business Days: {result['days']}")
+    print(f"Stability Threshold ({args.stable_share:.0%} of days): {result['threshold_days']:.1f} days")
+    stable, items = result['stable_items'], max(result['items'], 1)
+    print(f"Total Unique Items Sold: {result['items']}")
+    print(f"Stable Items Count: {stable} ({stable / items:.1%})")
+    print(f"Unstable Items Count: {result['items'] - stable} ({(result['items'] - stable) / items:.1%})")
+    summary = result['summary']
+    print(f"\n--- Revenue Contribution Analysis (Median Revenue: ${result['median']:,.0f}) ---")
+    print(summary.round(1).to_string())
+    if {'High', 'Low'} <= set(summary.index):
+        gap = summary.loc['High'] - summary.loc['Low']
+        total_gap = gap['Avg_Total_Revenue']
+        print("\n--- Interpretation ---")
+        print(f"Revenue Gap between High ({summary.loc['High', 'Avg_Total_Revenue']:,.0f}) and "
+              f"Low ({summary.loc['Low', 'Avg_Total_Revenue']:,.0f}) days: ${total_gap:,.0f}")
+        print(f"  - Driven by stable items: ${gap['Avg_Stable_Revenue']:,.0f} ({gap['Avg_Stable_Revenue'] / total_gap:.1%})")
+        print(f"  - Driven by unstable items: ${gap['Avg_Unstable_Revenue']:,.0f} ({gap['Avg_Unstable_Revenue'] / total_gap:.1%})")
+    print("\n--- Top 'Unstable' Items driving High Revenue Days ---")
+    print("(Values represent average transactions per day)")
+    print(result['impact'].head(args.top).round(2).to_string())
+
+
+def report_trends(result, args):
+    print("\n--- A. Annual Performance Overview ---")
+    print(result['annual'].round(0).to_string())
+    print("\n--- B. Category Revenue Share Trends (%) ---")
+    share = result['category_share']
+    print(share.round(1).to_string())
+    if len(share) >= 2:
+        previous, latest = share.index[-2], share.index[-1]
+        diff = share.loc[latest] - share.loc[previous]
+        print(f"\nBiggest Share Growers ({previous} -> {latest}):")
+        print(diff.sort_values(ascending=False).head(3).round(1).to_string())
+        print(f"\nBiggest Share Losers ({previous} -> {latest}):")
+        print(diff.sort_values().head(3).round(1).to_string())
+    print("\n--- C. Order Type Evolution (%) ---")
+    print(result['order_type_share'].round(1).to_string())
+    print(f"\n--- D. Top {args.top_items} Items by Revenue (Yearly Shift) ---")
+    for year, top in result['top_items'].groupby('Year'):
+        print(f"\n[ Year {year} ]")
+        for _, row in top.iterrows():
+            print(f"  - {row['CleanName']}: ${row['結帳金額']:,.0f} ({row['Share']:.1%})")
+    print("\n--- E. Menu Variety Trends ---")
+    print(result['variety'].to_string())
+    print("\nAverage Unique Items Sold Per Month:")
+    print(result['monthly_variety'].round(1).to_string())
+
+
+def report_inspect(result, args):
+    for entry in result:
+        print(f"\n--- {entry['file']} ({entry['kind'] or 'unknown export'}) ---")
+        print(f"Columns: {entry['columns']}")
+        print("First 2 rows:")
+        print(entry['head'].to_string())
+
+
+def report_anomalies(result, args):
+    print_anomalies(result, args.top)
+    if args.date:
+        print_deep_dive(result, args.date)
+
+
+# name: (compute, report, parameters that change the result)
+ANALYSES = {
+    'variety': (variety, report_variety, ['blackboard']),
+    'stability': (stability, report_stability, ['stable_share']),
+    'trends': (trends, report_trends, ['top_items']),
+    'inspect': (inspect, report_inspect, []),
+    'anomalies': (anomalies, report_anomalies, ['weeks', 'threshold']),
+}
+
+
+def run(args):
+    """Prints one analysis, computed or read from the cache."""
+    compute, report, keys = ANALYSES[args.analysis]
+    exclude = args.exclude if args.exclude is not None else DEFAULT_EXCLUDE.get(args.analysis, [])
+    params = {'start': args.start, 'end': args.end, 'exclude': sorted(exclude), 'master': args.master}
+    params.update({k: getattr(args, k) for k in keys})
+
+    cache = AnalysisCache(args.cache)
+    try:
+        if args.clear_cache:
+            cache.clear()
+        if args.source:
+            paths = [p for p in expand_sources(args.source) if os.path.isfile(p)]
+        else:
+            # Archived exports whose business days overlap --from/--to, picked from the catalog
+            store = catalog.open_catalog()
+            try:
+                paths = store.files(start=args.start, end=args.end)
+            finally:
+                store.close()
+        if not paths:
+            print(f"No exports found in {', '.join(args.source or [ARCHIVE_DIR])}.")
+            return
+        with profiling.stage('cache lookup'):
+            master = args.master or MASTER_CACHE_PATH
+            inputs = [cache.digest(p) for p in paths] + [cache.digest(master) if os.path.exists(master) else None]
+            key_fields = {'analysis': args.analysis, 'version': CACHE_VERSION, 'inputs': inputs,
+                          'params': {k: v for k, v in params.items() if k != 'master'}}
+            key = hashlib.sha1(json.dumps(key_fields, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+            cached = None if args.refresh else cache.result(key)
+        if cached:
+            created_at, result = cached
+            print(f"{args.analysis}: {len(paths)} exports unchanged, result cached "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(created_at))}.")
+        else:
+            print(f"{args.analysis}: analysing {len(paths)} exports...")
+            with profiling.stage('load'):
+                data = load_inputs(cache, paths, args.master, params)
+            if args.analysis != 'inspect' and data['items'].empty:
+                print("No item sales in the selected exports and date range.")
+                return
+            with profiling.stage('compute'):
+                result = compute(data, params)
+            with profiling.stage('cache store'):
+                cache.store(key, args.analysis, params, result)
+        pd.set_option('display.width', 200)
+        with profiling.stage('report'):
+            report(result, args)
+    finally:
+        cache.close()
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--source', nargs='+', help="Exports: files, folders or glob patterns (default: the archived exports covering --from/--to)")
+    common.add_argument('--from', dest='start', help="First business day, e.g. 2025-01-01")
+    common.add_argument('--to', dest='end', help="Last business day")
+    common.add_argument('--exclude', nargs='*', help="Leave out items whose name contains any of these keywords (stability: set menus etc. unless given)")
+    common.add_argument('--master', help="Product master CSV/XLSX for categories (default: product_master_cache.csv)")
+    common.add_argument('--cache', default='downloads/analysis_cache.db')
+    common.add_argument('--refresh', action='store_true', help="Recompute even when a cached result exists")
+    common.add_argument('--clear-cache', action='store_true', help="Drop all cached exports and results first")
+    common.add_argument('--top', type=int, default=10, help="Rows to list")
+    common.add_argument('--profile', action='store_true', help="Write cProfile/tracemalloc/RSS per stage to profiles/")
+
+    parser = argparse.ArgumentParser(description="Sales analyses over iCHEF exports, cached by input content and parameters.")
+    sub = parser.add_subparsers(dest='analysis', required=True)
+    p = sub.add_parser('variety', parents=[common], help="Menu variety vs daily revenue")
+    p.add_argument('--blackboard', default=BLACKBOARD_KEYWORD, help="Category keyword of the rotating blackboard menu")
+    p = sub.add_parser('stability', parents=[common], help="Stable vs occasional items on high and low days")
+    p.add_argument('--stable-share', type=float, default=STABLE_SHARE, help="Share of days an item must sell on to be stable")
+    p = sub.add_parser('trends', parents=[common], help="Year-over-year revenue, categories, order types and items")
+    p.add_argument('--top-items', type=int, default=5, help="Top items per year")
+    sub.add_parser('inspect', parents=[common], help="Columns and first rows of each export")
+    p = sub.add_parser('anomalies', parents=[common], help="Business days far off their same-weekday baseline")
+    p.add_argument('--weeks', type=int, default=BASELINE_WEEKS, help="Trailing same-weekday weeks in the baseline")
+    p.add_argument('--threshold', type=float, default=Z_THRESHOLD, help="Flag days this many robust SDs off baseline (revenue, variety or item mix)")
+    p.add_argument('--date', help="Full breakdown of one business day")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    with profiling.profiled(f"analyze_{args.analysis}", args.profile):
+        run(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
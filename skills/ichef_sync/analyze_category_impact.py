@@ -1,40 +1,209 @@
 import pandas as pd
-import glob
+import numpy as np
 import os
- 
+import sys
+import argparse
+
+# profiling.py is shared with the other skills
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import profiling
+import catalog
+from ingest import clean_item_names, item_categories
+from aggregates import latest_per_day
 
 # Suppress warnings
 import warnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
-DOWNLOADS_DIR = 'downloads/processed'
 MASTER_FILE = 'product_master_cache.csv'
 
-def analyze():
+# Baseline: the same weekday over the trailing weeks (closed days don't count)
+BASELINE_WEEKS = 8
+MIN_BASELINE_WEEKS = 3
+# Robust z-score (median / MAD) below which a day is anomalous
+Z_THRESHOLD = 2.0
+# Scale floor as a fraction of the baseline, so very steady weekdays don't flag small dips
+MIN_SCALE_FRACTION = 0.1
+# Scale floor for the item-mix shift (share of revenue that moved between categories)
+MIN_MIX_SCALE = 0.05
+ATTRIBUTION_COUNT = 3
+
+def weekday_history(values, weeks):
+    """(weeks, days, columns) array of the same weekday 1..weeks weeks earlier; NaN where unknown.
+
+    `values` is a (days, columns) array on a gap-free calendar, so 7 rows back is the same weekday.
+    """
+    history = np.full((weeks,) + values.shape, np.nan)
+    for k in range(1, weeks + 1):
+        if 7 * k < len(values):
+            history[k - 1, 7 * k:] = values[:-7 * k]
+    return history
+
+def baseline(values, weeks, min_weeks=MIN_BASELINE_WEEKS):
+    """Per day and column: (median, MAD, mean) over the same weekday in the trailing weeks."""
+    history = weekday_history(values, weeks)
+    enough = (~np.isnan(history)).sum(axis=0) >= min_weeks
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN slices: not enough history yet
+        median = np.nanmedian(history, axis=0)
+        mad = np.nanmedian(np.abs(history - median), axis=0)
+        mean = np.nanmean(history, axis=0)
+    return np.where(enough, median, np.nan), np.where(enough, mad, np.nan), np.where(enough, mean, np.nan)
+
+def robust_z(values, weeks, floor=0.0):
+    median, mad, _ = baseline(values, weeks)
+    scale = np.maximum(np.maximum(1.4826 * mad, MIN_SCALE_FRACTION * np.abs(median)), floor)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (values - median) / scale, median
+
+def scan_anomalies(df_sales, weeks=BASELINE_WEEKS, threshold=Z_THRESHOLD):
+    """Scores every business day against its same-weekday baseline, all days at once.
+
+    Returns a dict with the per-day score frame (revenue, category variety and item-mix
+    shift, robust z-scores, flagged) and the per-day category/item deficits used to
+    explain the flagged days.
+
+    A day is flagged when any of the three signals is `threshold` robust SDs off in the
+    bad direction (less revenue, fewer items, a larger mix shift). `score` is the largest
+    of them, and days are ranked by it.
+    """
+    # Gap-free calendar: a missing date is a closed day (NaN), not a zero-revenue day
+    calendar = pd.date_range(df_sales['_date'].min(), df_sales['_date'].max()).strftime('%Y-%m-%d')
+    df_sales = df_sales.assign(結帳金額=df_sales['結帳金額'].astype(float))
+    by_day = df_sales.groupby('_date')
+    revenue = by_day['結帳金額'].sum().reindex(calendar)
+    variety = by_day['CleanName'].nunique().reindex(calendar)
+    cat_revenue = df_sales.groupby(['_date', 'Category'], observed=True)['結帳金額'].sum().unstack(fill_value=0).reindex(calendar)
+    cat_variety = df_sales.groupby(['_date', 'Category'], observed=True)['CleanName'].nunique().unstack(fill_value=0).reindex(calendar)
+    item_qty = df_sales.groupby(['_date', 'CleanName'], observed=True).size().unstack(fill_value=0).reindex(calendar)
+
+    revenue_z, revenue_base = robust_z(revenue.to_numpy()[:, None], weeks)
+    variety_z, variety_base = robust_z(variety.to_numpy()[:, None], weeks)
+
+    # Item mix: share of revenue per category vs the baseline share (total variation distance, 0..1)
+    shares = cat_revenue.to_numpy() / revenue.to_numpy()[:, None]
+    _, _, base_shares = baseline(shares, weeks)
+    mix_shift = 0.5 * np.abs(shares - base_shares).sum(axis=1)
+    mix_shift[np.isnan(base_shares).all(axis=1) | np.isnan(shares).all(axis=1)] = np.nan
+    mix_z, _ = robust_z(mix_shift[:, None], weeks, floor=MIN_MIX_SCALE)
+
+    # Expected (mean) category revenue / variety and item counts for the same weekday
+    _, _, cat_revenue_base = baseline(cat_revenue.to_numpy(), weeks)
+    _, _, cat_variety_base = baseline(cat_variety.to_numpy().astype(float), weeks)
+    _, _, item_base = baseline(item_qty.to_numpy().astype(float), weeks)
+
+    scores = pd.DataFrame({
+        'date': calendar,
+        'weekday': pd.to_datetime(calendar).strftime('%a'),
+        'revenue': revenue.to_numpy(),
+        'revenue_base': revenue_base[:, 0],
+        'revenue_z': revenue_z[:, 0],
+        'variety': variety.to_numpy(),
+        'variety_base': variety_base[:, 0],
+        'variety_z': variety_z[:, 0],
+        'mix_shift': mix_shift,
+        'mix_z': mix_z[:, 0],
+    })
+    scores = scores[scores['revenue'].notna()]
+    signals = pd.DataFrame({'revenue': -scores['revenue_z'], 'variety': -scores['variety_z'], 'mix': scores['mix_z']})
+    scores['score'] = signals.max(axis=1)
+    scores['signals'] = (signals >= threshold).apply(lambda row: '+'.join(row.index[row]), axis=1)
+    scores['flagged'] = scores['score'] >= threshold
+    return {
+        'scores': scores.sort_values('score', ascending=False).reset_index(drop=True),
+        'calendar': calendar,
+        'category_revenue_deficit': pd.DataFrame(cat_revenue_base - cat_revenue.to_numpy(), index=calendar, columns=cat_revenue.columns),
+        'category_variety_deficit': pd.DataFrame(cat_variety_base - cat_variety.to_numpy(), index=calendar, columns=cat_variety.columns),
+        'item_deficit': pd.DataFrame(item_base - item_qty.to_numpy(), index=calendar, columns=item_qty.columns),
+        'item_base': pd.DataFrame(item_base, index=calendar, columns=item_qty.columns),
+    }
+
+def top_missing(deficits, date, count=ATTRIBUTION_COUNT):
+    row = deficits.loc[date].dropna()
+    row = row[row > 0].sort_values(ascending=False)
+    return row.head(count)
+
+def print_anomalies(anomalies, top):
+    scores = anomalies['scores']
+    flagged = scores[scores['flagged']]
+    print(f"\n--- Anomaly Scan: {len(scores)} business days, {len(flagged)} off their same-weekday baseline ---")
+    if flagged.empty:
+        return
+    rows = []
+    for _, day in flagged.head(top).iterrows():
+        cats = top_missing(anomalies['category_revenue_deficit'], day['date'])
+        items = top_missing(anomalies['item_deficit'], day['date'])
+        rows.append({
+            'Date': f"{day['date']} {day['weekday']}",
+            'Revenue': f"{day['revenue']:,.0f} / {day['revenue_base']:,.0f}",
+            'z': round(day['revenue_z'], 1),
+            'Variety': f"{day['variety']:.0f} / {day['variety_base']:.0f}",
+            'MixShift': round(day['mix_shift'], 2),
+            'Score': round(day['score'], 1),
+            'Signals': day['signals'],
+            'MissingCategories': ', '.join(f"{c} -{v:,.0f}" for c, v in cats.items()),
+            'MissingItems': ', '.join(f"{i} -{v:.1f}" for i, v in items.items()),
+        })
+    print("Revenue and variety shown as actual / baseline median; missing amounts are vs the weekday's average.")
+    print("Score: the largest of -revenue z, -variety z and item-mix shift z; Signals: which of them passed the threshold.\n")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+def print_deep_dive(anomalies, date):
+    scores = anomalies['scores']
+    day = scores[scores['date'] == date]
+    if day.empty:
+        print(f"\nNo sales on business day {date}.")
+        return
+    day = day.iloc[0]
+    print(f"\n--- Deep Dive: {date} ({day['weekday']}) ---")
+    if np.isnan(day['revenue_base']):
+        print(f"Total Revenue: ${day['revenue']:,.0f}; not enough history for a baseline "
+              f"(needs {MIN_BASELINE_WEEKS} earlier open {day['weekday']}s).")
+        return
+    print(f"Total Revenue: ${day['revenue']:,.0f} (same-weekday median ${day['revenue_base']:,.0f}, z = {day['revenue_z']:.1f})")
+    print(f"Unique items: {day['variety']:.0f} (median {day['variety_base']:.0f}, z = {day['variety_z']:.1f}), "
+          f"item-mix shift {day['mix_shift']:.2f} (z = {day['mix_z']:.1f})")
+    table = pd.DataFrame({
+        'MissingRevenue': anomalies['category_revenue_deficit'].loc[date],
+        'MissingVariety': anomalies['category_variety_deficit'].loc[date],
+    }).dropna().sort_values('MissingRevenue', ascending=False)
+    print("Categories vs the weekday's average:")
+    print(table.round(1).to_string())
+    items = top_missing(anomalies['item_deficit'], date, 10)
+    expected = anomalies['item_base'].loc[date, items.index]
+    print("Items sold less than usual (usual -> missing):")
+    print(pd.DataFrame({'Usual': expected, 'Missing': items}).round(1).to_string())
+
+def analyze(weeks=BASELINE_WEEKS, threshold=Z_THRESHOLD, top=15, deep_dive=None):
     print("Starting analysis...")
     
     # 1. Load Sales Data
-    files = glob.glob(os.path.join(DOWNLOADS_DIR, '*結帳品項紀錄*.xlsx'))
+    store = catalog.open_catalog()
+    try:
+        files = store.files('product_sales')
+    finally:
+        store.close()
     if not files:
         print("No item sales records found.")
         return
 
     print(f"Loading {len(files)} sales files...")
     df_list = []
-    for f in files:
-        try:
-            d = pd.read_excel(f)
-            d['結帳時間'] = pd.to_datetime(d['結帳時間'])
-            df_list.append(d)
-        except Exception as e:
-            print(f"Error reading {f}: {e}")
-    
+    with profiling.stage('load'):
+        for f in files:
+            try:
+                # Typed rows without voids (Parquet twin when cataloged); amounts are in 結帳金額
+                d = catalog.load(f)
+                df_list.append(d)
+            except Exception as e:
+                print(f"Error reading {f}: {e}")
+
     if not df_list:
         return
 
-    df_sales = pd.concat(df_list, ignore_index=True)
-    df_sales = df_sales.drop_duplicates()
-    df_sales['Date'] = df_sales['結帳時間'].dt.date
+    # Overlapping exports: each business day (05:00 start) is taken from the newest file only
+    df_sales = latest_per_day(df_list)
+    df_sales['Date'] = df_sales['_date']
     
     # 2. Load Product Master for Categories
     if not os.path.exists(MASTER_FILE):
@@ -60,15 +229,15 @@ def analyze():
     # 3. Map Categories to Sales Data
     # Note: Sales data names might slightly differ (e.g., * prefix for modifications). 
     # Global cleanup for matching: remove leading asterisk if any
-    df_sales['CleanName'] = df_sales['商品名稱'].astype(str).str.replace(r'^\*', '', regex=True).str.strip()
+    df_sales['CleanName'] = clean_item_names(df_sales['商品名稱'])
     
     # Fill unknown categories
-    df_sales['Category'] = df_sales['CleanName'].map(item_category_map).fillna('未分類')
+    df_sales['Category'] = item_categories(df_sales['CleanName'], item_category_map)
 
     # 4. Analyze Variety by Category
     # We want to see: For low revenue days vs high revenue days, which categories had fewer unique items sold?
     
-    daily_revenue = df_sales.groupby('Date')['發票金額'].sum().reset_index()
+    daily_revenue = df_sales.groupby('Date')['結帳金額'].sum().reset_index()
     daily_revenue.columns = ['Date', 'TotalRevenue']
     
     # Classify days into High/Low (e.g., Median split)
@@ -76,14 +245,14 @@ def analyze():
     daily_revenue['RevenueGroup'] = daily_revenue['TotalRevenue'].apply(lambda x: 'High' if x >= median_rev else 'Low')
     
     # Calculate unique items per category per day
-    daily_cat_variety = df_sales.groupby(['Date', 'Category'])['CleanName'].nunique().reset_index()
+    daily_cat_variety = df_sales.groupby(['Date', 'Category'], observed=True)['CleanName'].nunique().reset_index()
     daily_cat_variety.columns = ['Date', 'Category', 'UniqueItemsCount']
     
     # Merge with revenue info
     merged = pd.merge(daily_cat_variety, daily_revenue[['Date', 'RevenueGroup', 'TotalRevenue']], on='Date')
     
     # Pivot to compare High vs Low revenue days per category
-    comparison = merged.groupby(['Category', 'RevenueGroup'])['UniqueItemsCount'].mean().unstack().fillna(0)
+    comparison = merged.groupby(['Category', 'RevenueGroup'], observed=True)['UniqueItemsCount'].mean().unstack().fillna(0)
     comparison['Difference'] = comparison['High'] - comparison['Low']
     comparison = comparison.sort_values('Difference', ascending=False)
     
@@ -95,26 +264,20 @@ def analyze():
     print("\n--- Interpretation ---")
     print("Positive difference means High revenue days have significantly MORE variety in this category than Low revenue days.")
     
-    # 5. Specific Low Day Analysis (e.g., 2026-01-23)
-    target_date = pd.to_datetime('2026-01-23').date()
-    if target_date in df_sales['Date'].unique():
-        print(f"\n--- Deep Dive: Low Revenue Day ({target_date}) ---")
-        day_data = df_sales[df_sales['Date'] == target_date]
-        day_cats = day_data.groupby('Category')['CleanName'].nunique()
-        
-        avg_cats = df_sales.groupby('Category')['CleanName'].nunique().mean() # This is wrong, this is variety across all time
-        # Better: Average daily variety per category
-        temp_df = df_sales.groupby(['Date', 'Category'])['CleanName'].nunique().reset_index()
-        temp_df.columns = ['Date', 'Category', 'UniqueItemsCount']
-        daily_avg_cats = temp_df.groupby('Category')['UniqueItemsCount'].mean()
-        
-        diff_df = pd.DataFrame({'LowDay': day_cats, 'AvgDay': daily_avg_cats}).fillna(0)
-        diff_df['MissingVariety'] = diff_df['AvgDay'] - diff_df['LowDay']
-        diff_df = diff_df.sort_values('MissingVariety', ascending=False)
-        
-        print(f"Total Revenue: ${daily_revenue[daily_revenue['Date'] == target_date]['TotalRevenue'].values[0]:,.0f}")
-        print("Categories with biggest drop in variety compared to average:")
-        print(diff_df.head(5).round(1).to_string())
+    # 5. Scan every business day for revenue, variety and item-mix anomalies (see scan_anomalies)
+    with profiling.stage('anomaly scan'):
+        anomalies = scan_anomalies(df_sales, weeks=weeks, threshold=threshold)
+    print_anomalies(anomalies, top)
+    if deep_dive:
+        print_deep_dive(anomalies, deep_dive)
 
 if __name__ == "__main__":
-    analyze()
+    parser = argparse.ArgumentParser(description="Category variety vs revenue, and a same-weekday anomaly scan of every business day.")
+    parser.add_argument('--weeks', type=int, default=BASELINE_WEEKS, help="Trailing same-weekday weeks in the baseline")
+    parser.add_argument('--threshold', type=float, default=Z_THRESHOLD, help="Flag days this many robust SDs off baseline (revenue, variety or item mix)")
+    parser.add_argument('--top', type=int, default=15, help="Anomalous days to list")
+    parser.add_argument('--date', help="Full breakdown of one business day, e.g. 2026-01-23")
+    parser.add_argument('--profile', action='store_true', help="Write cProfile/tracemalloc/RSS per stage to profiles/")
+    args = parser.parse_args()
+    with profiling.profiled('analyze_category_impact', args.profile):
+        analyze(args.weeks, args.threshold, args.top, args.date)
@@ -1,54 +1,40 @@
-import pandas as pd
-import glob
 import os
+import sys
+import argparse
+
+# profiling.py is shared with the other skills
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import profiling
+import catalog
+from aggregates import latest_per_day
 
 
 # Suppress warnings
 import warnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
-DOWNLOADS_DIR = 'downloads/processed'
 OUTPUT_FILE = 'analysis_results.txt'
 
 def analyze():
-    # 1. Load Data
-    files = glob.glob(os.path.join(DOWNLOADS_DIR, '*結帳品項紀錄*.xlsx'))
-    if not files:
+    # 1. Load Data: validated item lines (no voids) of the archived exports, picked from the catalog
+    with profiling.stage('load'):
+        frames = catalog.load_frames('product_sales')
+    if not frames:
         print("No item sales records found.")
         return
+    print(f"Loaded {len(frames)} files.")
 
-    print(f"Loading {len(files)} files...")
-    df_list = []
-    for f in files:
-        try:
-            d = pd.read_excel(f)
-            # Ensure proper datetime parsing
-            d['結帳時間'] = pd.to_datetime(d['結帳時間'])
-            df_list.append(d)
-        except Exception as e:
-            print(f"Error reading {f}: {e}")
-    
-    if not df_list:
-        return
-
-    df = pd.concat(df_list, ignore_index=True)
-    
-    # filter duplicates if any (based on Invoice + Product Name + Time)
-    # But since we have no unique ID per row, duplicates might be valid (2 items sold).
-    # Since files overlap (Jan 26 present in both ranges?), we need to handle overlap.
-    # The file names suggest: 16-26 and 26-31.
-    # Let's drop duplicates based on all columns to be safe.
-    df = df.drop_duplicates()
-
-    # Create Date Column
-    df['Date'] = df['結帳時間'].dt.date
+    # Overlapping exports: each business day (05:00 start) is counted once, merged by invoice
+    df = latest_per_day(frames)
+    df['Date'] = df['_date']
 
     # 2. Daily Stats
-    daily_stats = df.groupby('Date').agg(
-        Revenue=('發票金額', 'sum'),
-        UniqueItems=('商品名稱', 'nunique'),
-        TotalItemsSold=('商品名稱', 'count')
-    ).reset_index()
+    with profiling.stage('daily stats'):
+        daily_stats = df.groupby('Date').agg(
+            Revenue=('結帳金額', 'sum'),
+            UniqueItems=('商品名稱', 'nunique'),
+            TotalItemsSold=('商品名稱', 'count')
+        ).reset_index()
 
     # Sort by Date
     daily_stats = daily_stats.sort_values('Date')
@@ -80,9 +66,13 @@ def analyze():
 
     # 5. Top Categories (Simulated)
     # Since we lack category data, we can list top 10 items contributing to revenue
-    item_revenue = df.groupby('商品名稱')['發票金額'].sum().sort_values(ascending=False).head(10)
+    item_revenue = df.groupby('商品名稱', observed=True)['結帳金額'].sum().sort_values(ascending=False).head(10)
     print("\n--- Top 10 Revenue Generating Items ---")
     print(item_revenue.to_string())
 
 if __name__ == "__main__":
-    analyze()
+    parser = argparse.ArgumentParser(description="Daily item variety vs revenue over the archived item exports.")
+    parser.add_argument('--profile', action='store_true', help="Write cProfile/tracemalloc/RSS per stage to profiles/")
+    args = parser.parse_args()
+    with profiling.profiled('analyze_variety_vs_revenue', args.profile):
+        analyze()
@@ -0,0 +1,197 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from ingest import validate, clean_item_names
+from aggregates import InvoiceRows, connect_store
+import catalog
+
+# Pairs bought together fewer times than this are noise on a menu of a few hundred items
+MIN_PAIR_COUNT = 5
+
+
+def basket_matrix(invoices, items, n_items):
+    """Binary invoice x item CSR matrix from parallel arrays of invoice and item codes."""
+    rows = pd.factorize(invoices)[0]
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, items)),
+                               shape=(rows.max() + 1 if len(rows) else 0, n_items))
+    # A line per unit sold: two portions of the same dish are still one basket entry
+    matrix.data[:] = 1
+    return matrix
+
+
+def cooccurrence(matrix):
+    """Upper triangle of X'X: the diagonal is each item's basket count, (a, b) how often a and b share one."""
+    return sparse.triu(matrix.T @ matrix).tocoo()
+
+
+class BasketStore:
+    """Per-business-day co-occurrence counts in SQLite.
+
+    Co-occurrence is additive over invoices, so a date range is the sum of its days;
+    a re-synced day replaces its own rows, recounted from all of the day's item lines
+    (`rows`, merged by invoice).
+    """
+
+    def __init__(self, path):
+        self.conn = connect_store(path)
+        with self.conn:
+            self.conn.executescript(
+                "CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS day_invoices (date TEXT PRIMARY KEY, invoices INTEGER NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS pair_days ("
+                " date TEXT NOT NULL, a INTEGER NOT NULL, b INTEGER NOT NULL, count INTEGER NOT NULL,"
+                " PRIMARY KEY (date, a, b));"
+            )
+        self.rows = InvoiceRows(self.conn, 'item_rows', 'product_sales', ['商品名稱'])
+
+    def item_ids(self, names):
+        """Stable integer ids for (categorical) item names; new names are added."""
+        names = names.astype('category')
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO items (name) VALUES (?)",
+                                  [(n,) for n in names.cat.categories])
+        known = dict(self.conn.execute("SELECT name, id FROM items").fetchall())
+        # Looked up once per distinct name, then spread over the rows by category code
+        return names.cat.categories.map(known).to_numpy(dtype=np.int64)[names.cat.codes.to_numpy()]
+
+    def item_names(self):
+        rows = self.conn.execute("SELECT id, name FROM items").fetchall()
+        names = np.empty(max((i for i, _ in rows), default=0) + 1, dtype=object)
+        for i, name in rows:
+            names[i] = name
+        return names
+
+    def replace(self, lines):
+        """Recounts every business day present in `lines` (validated item rows with _date)."""
+        lines = lines[lines['發票號碼'].notna() & lines['商品名稱'].notna()]
+        ids = self.item_ids(clean_item_names(lines['商品名稱']))
+        n_items = int(ids.max()) + 1 if len(ids) else 0
+        dates = lines['_date'].to_numpy()
+        invoices = lines['發票號碼'].astype('category').cat.codes.to_numpy()
+
+        order = np.argsort(dates, kind='stable')
+        dates, invoices, ids = dates[order], invoices[order], ids[order]
+        bounds = np.flatnonzero(dates[1:] != dates[:-1]) + 1
+        day_rows, pair_rows = [], []
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(dates)]):
+            matrix = basket_matrix(invoices[start:end], ids[start:end], n_items)
+            pairs = cooccurrence(matrix)
+            date = dates[start]
+            day_rows.append((date, matrix.shape[0]))
+            pair_rows.extend(zip([date] * pairs.nnz, pairs.row.tolist(), pairs.col.tolist(), pairs.data.tolist()))
+
+        with self.conn:
+            for date, _ in day_rows:
+                self.conn.execute("DELETE FROM pair_days WHERE date = ?", (date,))
+            self.conn.executemany("INSERT OR REPLACE INTO day_invoices (date, invoices) VALUES (?, ?)", day_rows)
+            self.conn.executemany("INSERT INTO pair_days (date, a, b, count) VALUES (?, ?, ?, ?)", pair_rows)
+        return [date for date, _ in day_rows]
+
+    def counts(self, start=None, end=None):
+        """(symmetric item x item co-occurrence matrix, invoice count) summed over a date range."""
+        where, params = "WHERE date BETWEEN ? AND ?", (start or '0000-00-00', end or '9999-99-99')
+        invoices = self.conn.execute(f"SELECT COALESCE(SUM(invoices), 0) FROM day_invoices {where}", params).fetchone()[0]
+        pairs = np.array(self.conn.execute(
+            f"SELECT a, b, SUM(count) FROM pair_days {where} GROUP BY a, b", params).fetchall(), dtype=np.int64)
+        n = len(self.item_names())
+        if not len(pairs):
+            return sparse.csr_matrix((n, n), dtype=np.int64), invoices
+        upper = sparse.coo_matrix((pairs[:, 2], (pairs[:, 0], pairs[:, 1])), shape=(n, n)).tocsr()
+        return upper + sparse.triu(upper, k=1).T, invoices
+
+    def close(self):
+        self.conn.close()
+
+
+def association_rules(counts, invoices, names, min_count=MIN_PAIR_COUNT):
+    """Frame of antecedent -> consequent rules with support, confidence and lift.
+
+    Computed on the nonzero entries of the co-occurrence matrix only, so the cost
+    follows the number of pairs that actually occur, not items squared.
+    """
+    baskets = counts.diagonal().astype(float)
+    pairs = sparse.triu(counts, k=1).tocoo()
+    keep = pairs.data >= min_count
+    a, b, both = pairs.row[keep], pairs.col[keep], pairs.data[keep].astype(float)
+    # Every pair gives a rule in both directions
+    antecedent, consequent, both = np.r_[a, b], np.r_[b, a], np.r_[both, both]
+    rules = pd.DataFrame({
+        'antecedent': names[antecedent],
+        'consequent': names[consequent],
+        'together': both.astype(int),
+        'support': both / invoices,
+        'confidence': both / baskets[antecedent],
+        'lift': both * invoices / (baskets[antecedent] * baskets[consequent]),
+    })
+    return rules.sort_values(['lift', 'together'], ascending=False, ignore_index=True)
+
+
+def item_summary(counts, invoices, names):
+    baskets = counts.diagonal()
+    present = np.flatnonzero(baskets)
+    return pd.DataFrame({'item': names[present], 'baskets': baskets[present],
+                         'share': baskets[present] / max(invoices, 1)}).sort_values('baskets', ascending=False)
+
+
+def update_baskets(item_batches, config):
+    """Sync stage: recounts co-occurrence for the business days in this run's item batches."""
+    settings = config.get('baskets')
+    if not settings or not item_batches:
+        return
+    store = BasketStore(settings.get('store', 'downloads/baskets.db'))
+    try:
+        df = store.rows.merge(item_batches)
+        if df.empty:
+            return
+        dates = store.replace(df)
+        print(f"Basket counts updated for {len(dates)} business days.")
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Which items sell together (co-occurrence, confidence, lift per invoice).")
+    parser.add_argument('--store', default='downloads/baskets.db')
+    parser.add_argument('--load', nargs='*', help="Item sales exports to (re)count, default: the archived exports covering --from/--to")
+    parser.add_argument('--from', dest='start', help="First business day, e.g. 2025-01-01")
+    parser.add_argument('--to', dest='end', help="Last business day")
+    parser.add_argument('--item', help="Only rules starting from this item")
+    parser.add_argument('--min-count', type=int, default=MIN_PAIR_COUNT)
+    parser.add_argument('--top', type=int, default=30)
+    args = parser.parse_args()
+
+    store = BasketStore(args.store)
+    try:
+        if args.load is not None:
+            if args.load:
+                frames = [validate(pd.read_excel(f), 'product_sales')[0] for f in args.load]
+            else:
+                frames = catalog.load_frames('product_sales', args.start, args.end)
+            print(f"Counting {len(frames)} item sales exports...")
+            dates = store.replace(store.rows.merge(frames))
+            print(f"Counted {len(dates)} business days.")
+
+        counts, invoices = store.counts(args.start, args.end)
+        if not invoices:
+            print("No baskets in the store for this range; run with --load first.")
+            return
+        names = store.item_names()
+        rules = association_rules(counts, invoices, names, args.min_count)
+        if args.item:
+            rules = rules[rules['antecedent'] == args.item].sort_values('confidence', ascending=False)
+
+        pd.set_option('display.width', 200)
+        print(f"{invoices} invoices, {int((counts.diagonal() > 0).sum())} items, {len(rules)} rules (together >= {args.min_count})")
+        if not args.item:
+            print(item_summary(counts, invoices, names).head(args.top).to_string(index=False))
+            print()
+        print(rules.head(args.top).to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+import journal
+from ingest import COLUMN_RENAMES, validate, compact
+from aggregates import BASE_DIR, business_date, connect_store
+
+ARCHIVE_DIR = os.path.join(BASE_DIR, 'downloads', 'processed')
+TWIN_DIR = os.path.join(ARCHIVE_DIR, 'parquet')
+CONFIG_PATH = os.path.join(BASE_DIR, 'config.json')
+DEFAULT_STORE = 'downloads/catalog.db'
+
+
+def export_kind(columns):
+    """'product_sales' or 'orders' from an export's header, else None.
+
+    Both sales exports carry 發票號碼 and 結帳時間; item exports also carry 商品名稱.
+    Other workbooks with 商品名稱, such as the product master 商品主檔.xlsx, get None.
+    """
+    columns = set(map(str, columns))
+    if not {'發票號碼', '結帳時間'} <= columns:
+        return None
+    return 'product_sales' if '商品名稱' in columns else 'orders'
+
+
+def normalized_columns(columns):
+    """Column names as validate() leaves them (renamed, no 'Unnamed' index columns)."""
+    return [COLUMN_RENAMES.get(str(c), str(c)) for c in columns if not str(c).startswith('Unnamed')]
+
+
+def header_signature(columns):
+    """Short hash of the normalized column list; changes when iCHEF changes the export layout."""
+    return hashlib.sha1('\x1f'.join(normalized_columns(columns)).encode('utf-8')).hexdigest()[:12]
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def describe(path, clean=None, kind=None, twin=False):
+    """Catalog entry for one archived export.
+
+    `clean` (the validated rows) is reused when the caller already has it, so
+    archiving right after a sync does not open the workbook again. With twin=True
+    the validated rows are also written as Parquet for fast loading.
+    """
+    if clean is None:
+        raw = pd.read_excel(path)
+        kind = export_kind(raw.columns)
+        clean = validate(raw, kind)[0] if kind else raw
+    kind = kind or export_kind(clean.columns)
+    if kind and '結帳時間' in clean.columns:
+        dates = business_date(clean['結帳時間'].dropna())
+    else:
+        dates = pd.Series(dtype=str)
+    stat = os.stat(path)
+    entry = {
+        'name': os.path.basename(path),
+        'kind': kind,
+        'header_signature': header_signature(clean.columns),
+        'columns': json.dumps(normalized_columns(clean.columns), ensure_ascii=False),
+        'first_date': dates.min() if len(dates) else None,
+        'last_date': dates.max() if len(dates) else None,
+        'rows': len(clean),
+        'content_hash': journal.file_id(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'twin': None,
+        'cataloged_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    if twin and kind and parquet_available():
+        os.makedirs(TWIN_DIR, exist_ok=True)
+        twin_path = os.path.join(TWIN_DIR, entry['name'] + '.parquet')
+        clean.reset_index(drop=True).to_parquet(twin_path, index=False)
+        entry['twin'] = os.path.relpath(twin_path, ARCHIVE_DIR)
+    return entry
+
+
+class ExportCatalog:
+    """SQLite index of downloads/processed: what each archived export holds, without opening it.
+
+    archive_file adds an entry per archived file; scan() brings the catalog in line
+    with the folder (new, changed and removed files), so it can always be rebuilt.
+    """
+
+    COLUMNS = ['name', 'kind', 'header_signature', 'columns', 'first_date', 'last_date', 'rows',
+               'content_hash', 'size', 'mtime_ns', 'twin', 'cataloged_at']
+
+    def __init__(self, path=DEFAULT_STORE, twins=False):
+        self.twins = twins
+        self.conn = connect_store(path)
+        with self.conn:
+            self.conn.executescript(
+                "CREATE TABLE IF NOT EXISTS exports ("
+                " name TEXT PRIMARY KEY, kind TEXT, header_signature TEXT NOT NULL, columns TEXT NOT NULL,"
+                " first_date TEXT, last_date TEXT, rows INTEGER NOT NULL, content_hash TEXT NOT NULL,"
+                " size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, twin TEXT, cataloged_at TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_exports_range ON exports (kind, first_date, last_date);"
+            )
+
+    def record(self, path, clean=None, kind=None):
+        entry = describe(path, clean, kind, twin=self.twins)
+        with self.conn:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO exports ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+                [entry[c] for c in self.COLUMNS])
+        return entry
+
+    def scan(self, rebuild=False):
+        """Catalogs new or changed workbooks in the archive and forgets deleted ones.
+
+        Unchanged files (same size and mtime) are not opened. Returns (added, removed).
+        """
+        if rebuild:
+            with self.conn:
+                self.conn.execute("DELETE FROM exports")
+        known = {name: (size, mtime, kind and not twin) for name, size, mtime, kind, twin in
+                 self.conn.execute("SELECT name, size, mtime_ns, kind, twin FROM exports")}
+        present = set()
+        added = 0
+        for name in sorted(os.listdir(ARCHIVE_DIR)) if os.path.isdir(ARCHIVE_DIR) else []:
+            path = os.path.join(ARCHIVE_DIR, name)
+            if '.xls' not in name.lower() or name.startswith(('.', '~$')) or not os.path.isfile(path):
+                continue
+            present.add(name)
+            stat = os.stat(path)
+            size, mtime, twin_missing = known.get(name, (None, None, None))
+            if (size, mtime) == (stat.st_size, stat.st_mtime_ns) and not (self.twins and twin_missing and parquet_available()):
+                continue
+            try:
+                self.record(path)
+                added += 1
+            except Exception as e:
+                print(f"Could not catalog {name}: {repr(e)}")
+        removed = sorted(set(known) - present)
+        with self.conn:
+            self.conn.executemany("DELETE FROM exports WHERE name = ?", [(n,) for n in removed])
+        return added, len(removed)
+
+    def entries(self, kind=None, start=None, end=None):
+        """Catalog rows (oldest archive first) whose business dates overlap [start, end]."""
+        where, params = [], []
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        if start:
+            where.append("last_date >= ?")
+            params.append(start)
+        if end:
+            where.append("first_date <= ?")
+            params.append(end)
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM exports"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return pd.read_sql_query(sql + " ORDER BY name", self.conn, params=params)
+
+    def files(self, kind=None, start=None, end=None):
+        """Paths of the archived exports covering a date range, in archive order."""
+        return [os.path.join(ARCHIVE_DIR, n) for n in self.entries(kind, start, end)['name']]
+
+    def close(self):
+        self.conn.close()
+
+
+def open_catalog(config=None, refresh=True):
+    """The catalog configured in config.json, brought up to date with the archive folder."""
+    if config is None:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    settings = config.get('catalog') or {}
+    catalog = ExportCatalog(settings.get('store', DEFAULT_STORE), settings.get('parquet', False))
+    if refresh:
+        catalog.scan()
+    return catalog
+
+
+def load(path):
+    """Validated rows of an archived export: from its Parquet twin when there is one, else the workbook."""
+    name = os.path.basename(path)
+    twin = os.path.join(TWIN_DIR, name + '.parquet')
+    if parquet_available() and os.path.exists(twin) and os.path.getmtime(twin) >= os.path.getmtime(path):
+        df = pd.read_parquet(twin)
+        return compact(df, export_kind(df.columns))
+    raw = pd.read_excel(path)
+    return validate(raw, export_kind(raw.columns))[0]
+
+
+def load_frames(kind, start=None, end=None, config=None):
+    """Validated frames of every archived `kind` export overlapping [start, end], oldest first."""
+    catalog = open_catalog(config)
+    try:
+        paths = catalog.files(kind, start, end)
+    finally:
+        catalog.close()
+    return [load(p) for p in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="What the archived iCHEF exports contain, from the catalog.")
+    parser.add_argument('--rebuild', action='store_true', help="Re-read every archived workbook")
+    parser.add_argument('--kind', choices=['orders', 'product_sales'])
+    parser.add_argument('--from', dest='start', help="Only exports with business days on or after this date")
+    parser.add_argument('--to', dest='end', help="Only exports with business days on or before this date")
+    parser.add_argument('--columns', action='store_true', help="Also list the columns per header signature")
+    args = parser.parse_args()
+
+    catalog = open_catalog(refresh=False)
+    try:
+        added, removed = catalog.scan(rebuild=args.rebuild)
+        print(f"Catalog: {added} exports (re)cataloged, {removed} removed.")
+        entries = catalog.entries(args.kind, args.start, args.end)
+        pd.set_option('display.width', 200)
+        print(entries[['name', 'kind', 'first_date', 'last_date', 'rows', 'header_signature', 'twin']].to_string(index=False))
+        if args.columns:
+            for signature, group in entries.groupby('header_signature'):
+                print(f"\n{signature} ({len(group)} files): {', '.join(json.loads(group['columns'].iloc[0]))}")
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,21 @@
-import pandas as pd
-import os
-import glob
+import json
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOWNLOADS_DIR = os.path.join(BASE_DIR, 'downloads', 'processed')
+from catalog import open_catalog
 
 def main():
-    files = glob.glob(os.path.join(DOWNLOADS_DIR, "*.xls*"))
-    if not files:
+    # Headers come from the export catalog; only new or changed workbooks are opened
+    catalog = open_catalog()
+    try:
+        entries = catalog.entries()
+    finally:
+        catalog.close()
+    if entries.empty:
         print("No files found in downloads folder.")
         return
 
-    for f in files:
-        print(f"\n📄 File: {os.path.basename(f)}")
-        try:
-            df = pd.read_excel(f)
-            print(f"   Columns: {df.columns.tolist()}")
-        except Exception as e:
-            print(f"   Error reading file: {e}")
+    for _, entry in entries.iterrows():
+        print(f"\n📄 File: {entry['name']}")
+        print(f"   Columns: {json.loads(entry['columns'])}")
 
 if __name__ == "__main__":
     main()
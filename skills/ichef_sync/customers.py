@@ -0,0 +1,234 @@
+import argparse
+
+import pandas as pd
+
+from ingest import is_missing, normalize_phone
+from aggregates import InvoiceRows, connect_store
+
+# RFM scores are quintiles (1-5) over all known customers
+SCORE_BINS = 5
+
+# (segment, rule on r/f/m scores), first match wins; everyone else is DEFAULT_SEGMENT
+SEGMENTS = [
+    ('冠軍顧客', lambda r, f, m: (r >= 4) & (f >= 4) & (m >= 4)),
+    ('忠實顧客', lambda r, f, m: (r >= 3) & (f >= 4)),
+    ('新顧客', lambda r, f, m: (r >= 4) & (f <= 1)),
+    ('潛力顧客', lambda r, f, m: (r >= 4) & (f <= 3)),
+    ('流失風險', lambda r, f, m: (r <= 2) & (f >= 3)),
+    ('沉睡顧客', lambda r, f, m: r <= 2),
+]
+DEFAULT_SEGMENT = '需要關注'
+
+RANK_COLUMNS = {'monetary': 'monetary', 'frequency': 'frequency'}
+
+
+def customer_key(series):
+    """Same key as src/lib/phoneUtils.ts normalizePhone: digits only, no leading zeros ('' -> NA)."""
+    text = series.astype('string')
+    text = text.mask(is_missing(text.str.strip()))
+    key = normalize_phone(text.str.replace(r'\D', '', regex=True))
+    return key.mask(key == '')
+
+
+def customer_days(orders):
+    """Per business day and customer: orders, revenue, last checkout and the name used last."""
+    df = orders.copy()
+    missing = pd.Series(pd.NA, index=df.index, dtype='string')
+    # Takeout and delivery orders often only carry the orderer's phone and name
+    df['phone'] = customer_key(df.get('顧客電話', missing)).fillna(customer_key(df.get('訂購人電話', missing)))
+    df = df[df['phone'].notna()]
+    if df.empty:
+        return pd.DataFrame(columns=['phone', 'date', 'orders', 'revenue', 'last_time', 'name'])
+
+    def names(col):
+        text = df.get(col, missing).astype('string')
+        return text.mask(is_missing(text.fillna('')))
+    df['name'] = names('顧客姓名').fillna(names('訂購人'))
+    df = df.sort_values('結帳時間')
+    days = df.groupby(['phone', '_date'], sort=False).agg(
+        orders=('發票號碼', 'size'),
+        revenue=('結帳金額', 'sum'),
+        last_time=('結帳時間', 'max'),
+        name=('name', 'last'),
+    ).reset_index().rename(columns={'_date': 'date'})
+    days['last_time'] = days['last_time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return days
+
+
+def rfm_scores(customers, as_of):
+    """Adds recency_days, r/f/m scores and segment to a customers frame."""
+    df = customers.copy()
+    df['recency_days'] = (pd.Timestamp(as_of) - pd.to_datetime(df['last_visit'])).dt.days
+
+    def quintile(values, ascending=True):
+        # Score from the share of customers strictly worse, so equal values always get
+        # the same score whatever the row order (most customers come once and share F=1)
+        below = (values.rank(method='min', ascending=ascending) - 1) / len(values)
+        return (below * SCORE_BINS).astype(int) + 1
+
+    df['r_score'] = quintile(df['recency_days'], ascending=False)
+    df['f_score'] = quintile(df['frequency'])
+    df['m_score'] = quintile(df['monetary'])
+    df['segment'] = None
+    for name, rule in SEGMENTS:
+        hit = df['segment'].isna() & rule(df['r_score'], df['f_score'], df['m_score'])
+        df.loc[hit, 'segment'] = name
+    df['segment'] = df['segment'].fillna(DEFAULT_SEGMENT)
+    return df
+
+
+class CustomerStore:
+    """SQLite customer table keyed by normalized phone, maintained per sync batch.
+
+    customer_days holds one row per customer and business day; a re-synced day
+    replaces its rows, computed from all of the day's orders (`rows`, merged by
+    invoice), and only the customers and months touched by the batch are
+    re-aggregated into customers / customer_months. Rankings read an index in order,
+    so a top-k query touches k rows however long the history is.
+    """
+
+    def __init__(self, path):
+        self.conn = connect_store(path)
+        with self.conn:
+            self.conn.executescript(
+                "CREATE TABLE IF NOT EXISTS customer_days ("
+                " phone TEXT NOT NULL, date TEXT NOT NULL, orders INTEGER NOT NULL, revenue REAL NOT NULL,"
+                " last_time TEXT NOT NULL, name TEXT, PRIMARY KEY (phone, date));"
+                "CREATE INDEX IF NOT EXISTS idx_customer_days_date ON customer_days (date);"
+                "CREATE TABLE IF NOT EXISTS customers ("
+                " phone TEXT PRIMARY KEY, name TEXT, first_visit TEXT NOT NULL, last_visit TEXT NOT NULL,"
+                " frequency INTEGER NOT NULL, visit_days INTEGER NOT NULL, monetary REAL NOT NULL,"
+                " recency_days INTEGER, r_score INTEGER, f_score INTEGER, m_score INTEGER, segment TEXT);"
+                "CREATE INDEX IF NOT EXISTS idx_customers_monetary ON customers (monetary DESC);"
+                "CREATE INDEX IF NOT EXISTS idx_customers_frequency ON customers (frequency DESC);"
+                "CREATE INDEX IF NOT EXISTS idx_customers_segment ON customers (segment, monetary DESC);"
+                "CREATE TABLE IF NOT EXISTS customer_months ("
+                " phone TEXT NOT NULL, month TEXT NOT NULL, orders INTEGER NOT NULL, revenue REAL NOT NULL,"
+                " PRIMARY KEY (phone, month));"
+                "CREATE INDEX IF NOT EXISTS idx_customer_months_revenue ON customer_months (month, revenue DESC);"
+                "CREATE INDEX IF NOT EXISTS idx_customer_months_orders ON customer_months (month, orders DESC);"
+            )
+        self.rows = InvoiceRows(self.conn, 'order_rows', 'orders', ['結帳金額', '顧客電話', '訂購人電話', '顧客姓名', '訂購人'])
+
+    def replace(self, days, dates):
+        """Replaces the given business dates with `days` and re-aggregates the affected customers."""
+        dates = sorted(dates)
+        with self.conn:
+            c = self.conn
+            c.execute("CREATE TEMP TABLE IF NOT EXISTS batch_dates (date TEXT PRIMARY KEY)")
+            c.execute("CREATE TEMP TABLE IF NOT EXISTS touched (phone TEXT PRIMARY KEY)")
+            c.execute("DELETE FROM batch_dates")
+            c.execute("DELETE FROM touched")
+            c.executemany("INSERT INTO batch_dates VALUES (?)", [(d,) for d in dates])
+
+            # Customers who had rows on these days (they may have disappeared) or have new ones
+            c.execute("INSERT OR IGNORE INTO touched SELECT phone FROM customer_days WHERE date IN (SELECT date FROM batch_dates)")
+            c.executemany("INSERT OR IGNORE INTO touched VALUES (?)", [(p,) for p in days['phone'].unique()])
+            c.execute("DELETE FROM customer_days WHERE date IN (SELECT date FROM batch_dates)")
+            c.executemany(
+                "INSERT INTO customer_days (phone, date, orders, revenue, last_time, name) VALUES (?, ?, ?, ?, ?, ?)",
+                [(p, d, int(o), float(r), t, None if pd.isna(n) else n)
+                 for p, d, o, r, t, n in days[['phone', 'date', 'orders', 'revenue', 'last_time', 'name']].itertuples(index=False)],
+            )
+
+            c.execute("DELETE FROM customers WHERE phone IN (SELECT phone FROM touched)")
+            c.execute(
+                "INSERT INTO customers (phone, name, first_visit, last_visit, frequency, visit_days, monetary)"
+                " SELECT d.phone,"
+                "  (SELECT name FROM customer_days n WHERE n.phone = d.phone AND n.name IS NOT NULL ORDER BY n.last_time DESC LIMIT 1),"
+                "  MIN(d.date), MAX(d.date), SUM(d.orders), COUNT(*), SUM(d.revenue)"
+                " FROM customer_days d WHERE d.phone IN (SELECT phone FROM touched) GROUP BY d.phone"
+            )
+
+            months = sorted({d[:7] for d in dates})
+            marks = ', '.join('?' for _ in months)
+            c.execute(f"DELETE FROM customer_months WHERE phone IN (SELECT phone FROM touched) AND month IN ({marks})", months)
+            c.execute(
+                "INSERT INTO customer_months (phone, month, orders, revenue)"
+                " SELECT phone, substr(date, 1, 7) AS month, SUM(orders), SUM(revenue) FROM customer_days"
+                f" WHERE phone IN (SELECT phone FROM touched) AND substr(date, 1, 7) IN ({marks}) GROUP BY phone, month",
+                months,
+            )
+            touched = c.execute("SELECT COUNT(*) FROM touched").fetchone()[0]
+        return touched
+
+    def rescore(self):
+        """Recomputes RFM scores and segments; quintile edges depend on the whole population."""
+        customers = pd.read_sql_query("SELECT phone, last_visit, frequency, monetary FROM customers", self.conn)
+        if customers.empty:
+            return customers
+        as_of = self.conn.execute("SELECT MAX(date) FROM customer_days").fetchone()[0]
+        scored = rfm_scores(customers, as_of)
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE customers SET recency_days = ?, r_score = ?, f_score = ?, m_score = ?, segment = ? WHERE phone = ?",
+                [(int(d), int(r), int(f), int(m), s, p) for d, r, f, m, s, p in
+                 scored[['recency_days', 'r_score', 'f_score', 'm_score', 'segment', 'phone']].itertuples(index=False)],
+            )
+        return scored
+
+    def top(self, k=20, by='monetary', month=None, segment=None):
+        """Top-k customers by monetary or frequency, overall, within a month or within a segment."""
+        if month:
+            measure = 'revenue' if by == 'monetary' else 'orders'
+            sql = ("SELECT m.phone, c.name, m.orders, m.revenue, c.first_visit, c.segment,"
+                   " substr(c.first_visit, 1, 7) = m.month AS is_new"
+                   " FROM customer_months m JOIN customers c ON c.phone = m.phone WHERE m.month = ?"
+                   f" ORDER BY m.{measure} DESC LIMIT ?")
+            return pd.read_sql_query(sql, self.conn, params=(month, k))
+        where, params = ("WHERE segment = ?", (segment, k)) if segment else ("", (k,))
+        sql = ("SELECT phone, name, frequency, monetary, first_visit, last_visit, recency_days,"
+               f" r_score, f_score, m_score, segment FROM customers {where} ORDER BY {RANK_COLUMNS[by]} DESC LIMIT ?")
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def segments(self):
+        return pd.read_sql_query(
+            "SELECT segment, COUNT(*) AS customers, SUM(frequency) AS orders, SUM(monetary) AS revenue"
+            " FROM customers GROUP BY segment ORDER BY revenue DESC", self.conn)
+
+    def close(self):
+        self.conn.close()
+
+
+def update_customers(order_batches, config):
+    """Sync stage: folds this run's order batches into the customer table."""
+    settings = config.get('customers')
+    if not settings or not order_batches:
+        return
+
+    print("Updating customer table...")
+    store = CustomerStore(settings.get('store', 'downloads/customers.db'))
+    try:
+        df = store.rows.merge(order_batches)
+        if df.empty:
+            return
+        touched = store.replace(customer_days(df), df['_date'].unique())
+        store.rescore()
+        print(f"Customer table updated: {touched} customers re-aggregated.")
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Customer rankings and RFM segments from the local customer table.")
+    parser.add_argument('--store', default='downloads/customers.db')
+    parser.add_argument('--by', choices=sorted(RANK_COLUMNS), default='monetary')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--month', help="Rank within one month, e.g. 2026-01")
+    parser.add_argument('--segment', help="Rank within one RFM segment, e.g. 流失風險")
+    parser.add_argument('--segments', action='store_true', help="Show the segment summary instead")
+    args = parser.parse_args()
+
+    store = CustomerStore(args.store)
+    try:
+        pd.set_option('display.width', 200)
+        if args.segments:
+            print(store.segments().to_string(index=False))
+        else:
+            print(store.top(args.top, args.by, args.month, args.segment).to_string(index=False))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
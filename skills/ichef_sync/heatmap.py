@@ -0,0 +1,197 @@
+import os
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from ingest import clean_item_names, item_categories, fill_category
+from aggregates import BASE_DIR, BUSINESS_DAY_START_HOUR, InvoiceRows, load_category_map, connect_store
+import catalog
+
+# Finest slot stored per day; 30- and 60-minute heatmaps are sums of adjacent slots
+SLOT_MINUTES = 15
+SLOTS = 24 * 60 // SLOT_MINUTES
+SLOT_CHOICES = (15, 30, 60)
+WEEKDAYS = ['一', '二', '三', '四', '五', '六', '日']
+
+def business_minutes(ts):
+    """Minutes since the business day started (05:00), so a night runs on into the same day's columns."""
+    return ((ts.dt.hour - BUSINESS_DAY_START_HOUR) % 24) * 60 + ts.dt.minute
+
+
+def slot_histograms(df, key):
+    """Per (business day, key): counts and revenue in SLOTS time-of-day bins.
+
+    One np.histogram2d call over (group, minute) bins the whole batch at once.
+    Returns (groups frame with date/key, counts array, revenue array), one row per group.
+    """
+    codes, groups = pd.factorize(pd.MultiIndex.from_arrays([df['_date'], key]))
+    minutes = business_minutes(df['結帳時間']).to_numpy()
+    edges = [np.arange(len(groups) + 1) - 0.5, np.arange(SLOTS + 1) * SLOT_MINUTES]
+    counts, _, _ = np.histogram2d(codes, minutes, bins=edges)
+    revenue, _, _ = np.histogram2d(codes, minutes, bins=edges, weights=df['結帳金額'].fillna(0).to_numpy())
+    keys = pd.DataFrame({'date': groups.get_level_values(0), 'key': groups.get_level_values(1).astype(str)})
+    return keys, counts.astype(np.int32), revenue
+
+
+def order_slots(df):
+    """Orders per slot: all orders and per 訂單種類."""
+    parts = [('all', pd.Series('all', index=df.index))]
+    order_type = fill_category(df.get('訂單種類', pd.Series('', index=df.index)))
+    parts.append(('order_type', order_type))
+    return [(dimension, *slot_histograms(df, key)) for dimension, key in parts]
+
+
+def item_slots(df, category_map):
+    """Item lines per slot: all items, per 大分類 and per 訂單種類."""
+    parts = [
+        ('all', pd.Series('all', index=df.index)),
+        ('category', item_categories(clean_item_names(df['商品名稱']), category_map)),
+        ('order_type', fill_category(df.get('訂單種類', pd.Series('', index=df.index)))),
+    ]
+    return [(dimension, *slot_histograms(df, key)) for dimension, key in parts]
+
+
+class HeatmapStore:
+    """Per-day time-of-day histograms; a date-range heatmap is a sum of stored day arrays.
+
+    A day is binned from all of its rows (`rows`, merged by invoice), so the late
+    hours in the next export add to the day instead of replacing it.
+    """
+
+    def __init__(self, path):
+        self.conn = connect_store(path)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS slot_days ("
+                " date TEXT NOT NULL, source TEXT NOT NULL, dimension TEXT NOT NULL, key TEXT NOT NULL,"
+                " counts BLOB NOT NULL, revenue BLOB NOT NULL, PRIMARY KEY (source, dimension, key, date))"
+            )
+        self.rows = {
+            'orders': InvoiceRows(self.conn, 'order_rows', 'orders', ['結帳金額', '訂單種類']),
+            'items': InvoiceRows(self.conn, 'item_rows', 'product_sales', ['商品名稱', '結帳金額', '訂單種類']),
+        }
+
+    def replace(self, source, parts):
+        """Replaces the stored days of `source` ('orders' or 'items') present in parts."""
+        dates = sorted({d for _, keys, _, _ in parts for d in keys['date']})
+        with self.conn:
+            self.conn.executemany("DELETE FROM slot_days WHERE source = ? AND date = ?", [(source, d) for d in dates])
+            for dimension, keys, counts, revenue in parts:
+                self.conn.executemany(
+                    "INSERT INTO slot_days (date, source, dimension, key, counts, revenue) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(d, source, dimension, k, c.tobytes(), r.tobytes())
+                     for d, k, c, r in zip(keys['date'], keys['key'], counts, revenue)],
+                )
+        return dates
+
+    def keys(self, source, dimension):
+        return [k for (k,) in self.conn.execute(
+            "SELECT DISTINCT key FROM slot_days WHERE source = ? AND dimension = ? ORDER BY key", (source, dimension))]
+
+    def heatmap(self, source='orders', dimension='all', key='all', start=None, end=None, slot_minutes=60,
+                measure='counts', average=True):
+        """weekday x slot frame (slots as rows) summed, or averaged per calendar day, over a date range."""
+        rows = self.conn.execute(
+            f"SELECT date, {'counts' if measure == 'counts' else 'revenue'} FROM slot_days"
+            " WHERE source = ? AND dimension = ? AND key = ? AND date BETWEEN ? AND ?",
+            (source, dimension, key, start or '0000-00-00', end or '9999-99-99'),
+        ).fetchall()
+        dtype = np.int32 if measure == 'counts' else np.float64
+        grid = np.zeros((7, SLOTS))
+        if rows:
+            days = np.stack([np.frombuffer(blob, dtype=dtype) for _, blob in rows])
+            weekdays = pd.to_datetime([d for d, _ in rows]).weekday.to_numpy()
+            np.add.at(grid, weekdays, days)
+
+        if average:
+            # Divide by every open day of that weekday in the range, not only days this key sold on
+            open_days = self.conn.execute(
+                "SELECT DISTINCT date FROM slot_days WHERE source = ? AND dimension = 'all' AND date BETWEEN ? AND ?",
+                (source, start or '0000-00-00', end or '9999-99-99')).fetchall()
+            per_weekday = np.bincount(pd.to_datetime([d for (d,) in open_days]).weekday, minlength=7)
+            grid = grid / np.maximum(per_weekday, 1)[:, None]
+
+        grid = grid.reshape(7, SLOTS * SLOT_MINUTES // slot_minutes, slot_minutes // SLOT_MINUTES).sum(axis=2)
+        starts = (BUSINESS_DAY_START_HOUR * 60 + np.arange(grid.shape[1]) * slot_minutes) % (24 * 60)
+        labels = [f"{m // 60:02d}:{m % 60:02d}" for m in starts]
+        return pd.DataFrame(grid.T, index=labels, columns=WEEKDAYS)
+
+    def close(self):
+        self.conn.close()
+
+
+def update_heatmaps(batches, config, client=None):
+    """Sync stage: re-bins the business days touched by this run's order and item batches."""
+    settings = config.get('heatmaps')
+    if not settings or not (batches['orders'] or batches['product_sales']):
+        return
+    store = HeatmapStore(settings.get('store', 'downloads/heatmaps.db'))
+    try:
+        touched = set()
+        if batches['orders']:
+            touched.update(store.replace('orders', order_slots(store.rows['orders'].merge(batches['orders']))))
+        if batches['product_sales']:
+            category_map = load_category_map(client, config)
+            df = store.rows['items'].merge(batches['product_sales'])
+            touched.update(store.replace('items', item_slots(df, category_map)))
+        print(f"Heatmaps updated for {len(touched)} business days.")
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weekday x time-of-day demand heatmaps for staffing and prep.")
+    parser.add_argument('--store', default='downloads/heatmaps.db')
+    parser.add_argument('--load', action='store_true', help="(Re)bin the archived order and item exports covering --from/--to first")
+    parser.add_argument('--source', choices=['orders', 'items'], default='orders')
+    parser.add_argument('--category', help="Items of one 大分類 (implies --source items)")
+    parser.add_argument('--order-type', help="Only one 訂單種類, e.g. 內用 / 外帶")
+    parser.add_argument('--from', dest='start', help="First business day, e.g. 2025-01-01")
+    parser.add_argument('--to', dest='end', help="Last business day")
+    parser.add_argument('--slot', type=int, choices=SLOT_CHOICES, default=60, help="Slot length in minutes")
+    parser.add_argument('--revenue', action='store_true', help="Revenue instead of counts")
+    parser.add_argument('--total', action='store_true', help="Sum over the range instead of the per-day average")
+    parser.add_argument('--csv', help="Also write the heatmap to this CSV file")
+    args = parser.parse_args()
+
+    store = HeatmapStore(args.store)
+    try:
+        if args.load:
+            with open(os.path.join(BASE_DIR, 'config.json'), 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            category_map = load_category_map(None, config)
+            for source, kind in (('orders', 'orders'), ('items', 'product_sales')):
+                frames = catalog.load_frames(kind, args.start, args.end, config)
+                if frames:
+                    df = store.rows[source].merge(frames)
+                    parts = order_slots(df) if source == 'orders' else item_slots(df, category_map)
+                    print(f"Binned {len(store.replace(source, parts))} business days of {source} from {len(frames)} files.")
+
+        source, dimension, key = args.source, 'all', 'all'
+        if args.category:
+            source, dimension, key = 'items', 'category', args.category
+        elif args.order_type:
+            dimension, key = 'order_type', args.order_type
+        if key not in store.keys(source, dimension):
+            print(f"No {source} data for {dimension} = {key}. Known: {', '.join(store.keys(source, dimension)) or '(none, run --load)'}")
+            return
+
+        grid = store.heatmap(source, dimension, key, args.start, args.end, args.slot,
+                             'revenue' if args.revenue else 'counts', average=not args.total)
+        # Hide the hours the shop is closed
+        grid = grid.loc[grid.sum(axis=1) > 0]
+        what = 'revenue' if args.revenue else ('orders' if source == 'orders' else 'items')
+        print(f"{what} per {args.slot} min, {'total' if args.total else 'average per day'}"
+              f" ({source} {dimension}={key}, {args.start or 'start'} ~ {args.end or 'end'})")
+        print(grid.round(1).to_string())
+        if args.csv:
+            grid.to_csv(args.csv, encoding='utf-8-sig')
+            print(f"Written to {args.csv}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUARANTINE_DIR = os.path.join(BASE_DIR, 'downloads', 'quarantine')
+
+# iCHEF timestamp format, also what is stored in the sheets (dedupe keys depend on it)
+TIMESTAMP_FORMAT = '%Y/%m/%d %H:%M:%S'
+
+# iCHEF writes '--' for "no value"
+MISSING_MARKERS = ['', '--', 'nan', 'NaN', 'None', 'NaT']
+
+# Normalize Column Names (Fix mismatches between export versions and the sheets)
+COLUMN_RENAMES = {
+    '載具／捐贈碼': '載具/捐贈碼',  # Full-width slash to half-width
+    '發票金額': '結帳金額',        # Invoice Amount to Checkout Amount
+    '支付模組': '支付方式',        # Payment Module to Payment Method
+    '訂單標籤與備註': '訂單備註'    # Tags to Notes
+}
+
+# Per-export rules. Column names are the normalized (renamed) ones.
+#   required:     must be present and non-empty
+#   timestamps:   parsed as TIMESTAMP_FORMAT
+#   amounts:      numeric (may be fractional, e.g. 499.5)
+#   non_negative: amounts that may not be below zero
+#   integers:     whole numbers
+#   phones:       normalized to match legacy data (no leading '0')
+#   categories:   few distinct values repeated on many rows; kept as categoricals
+#   void_column:  rows whose status starts with '已作廢' are dropped
+SCHEMAS = {
+    'orders': {
+        'required': ['發票號碼', '結帳時間', '結帳金額'],
+        'timestamps': ['結帳時間'],
+        'amounts': ['結帳金額', '服務費', '運費', '折扣金額細項'],
+        'non_negative': ['結帳金額'],
+        'integers': [],
+        'phones': ['顧客電話', '訂購人電話'],
+        'categories': ['訂單來源', '訂單種類', '桌號', '支付方式', '帳本', '目前概況'],
+        'void_column': '目前概況',
+    },
+    'product_sales': {
+        'required': ['商品名稱', '發票號碼', '結帳時間', '結帳金額'],
+        'timestamps': ['結帳時間'],
+        'amounts': ['結帳金額'],
+        'non_negative': [],
+        'integers': [],
+        'phones': [],
+        # Item lines repeat their order's fields, so the invoice columns are categoricals too
+        'categories': ['商品名稱', '發票號碼', '載具/捐贈碼', '原始單號', '外部單號',
+                       '訂單來源', '訂單種類', '桌號', '目前概況'],
+        'void_column': '目前概況',
+    },
+    'reward_cards': {
+        'required': ['name'],
+        'timestamps': [],
+        'amounts': [],
+        'non_negative': [],
+        'integers': ['validCards', 'issuedCards', 'storeVisitPoints', 'WelcomeBonusesAwarded',
+                     'expiredPoints', 'vouchersAwarded', 'vouchersUsed'],
+        'phones': [],
+        'categories': [],
+        'void_column': None,
+    },
+    'reward_points': {
+        'required': ['point', 'users'],
+        'timestamps': [],
+        'amounts': [],
+        'non_negative': [],
+        'integers': ['point', 'users'],
+        'phones': [],
+        'categories': [],
+        'void_column': None,
+    },
+}
+
+
+def _as_text(series):
+    """Returns the column as stripped strings (NA stays NA)."""
+    text = series.astype('string').str.strip()
+    # Excel hands whole-number cells in a column with blanks back as floats ('912345678.0')
+    return text.str.replace(r'^(-?\d+)\.0$', r'\1', regex=True)
+
+
+def _cell_text(series):
+    """The cell text as it was written to the sheets before validation (str() of the Excel value)."""
+    # str() once per distinct value; NA has code -1, the trailing NA
+    codes, uniques = pd.factorize(series)
+    labels = np.append(np.array([str(v) for v in uniques], dtype=object), pd.NA)
+    return pd.Series(labels[codes], index=series.index, name=series.name, dtype='string')
+
+
+def is_missing(text):
+    return text.isna() | text.isin(MISSING_MARKERS)
+
+
+def normalize_phone(series):
+    """Strips leading '0' from phone numbers to match legacy data (e.g. '0912345678' -> '912345678')."""
+    text = series.astype('string').str.strip()
+    return text.where(~text.str.startswith('0', na=False), text.str.lstrip('0'))
+
+
+def validate(df, kind):
+    """Checks an export against SCHEMAS[kind].
+
+    Returns (clean, rejected, voided_count). `clean` holds typed columns
+    (datetime64 timestamps, Int64 amounts unless some are fractional, normalized
+    phones) and keeps every other column's original cell text, as categoricals for
+    the schema's categories; `rejected` holds the raw rows plus a `_reject_reason` column.
+    """
+    schema = SCHEMAS[kind]
+    df = df.rename(columns=COLUMN_RENAMES)
+    df = df.loc[:, ~df.columns.astype(str).str.startswith('Unnamed')]
+
+    # Filter out voided transactions (目前概況 starts with '已作廢')
+    voided_count = 0
+    void_col = schema['void_column']
+    if void_col and void_col in df.columns:
+        voided = df[void_col].astype('string').str.strip().str.startswith('已作廢', na=False)
+        voided_count = int(voided.sum())
+        df = df[~voided]
+
+    raw = df
+    typed = pd.DataFrame(index=df.index)
+    problems = {}
+
+    # Checks and parsing use the stripped text; untyped columns keep the original
+    # text, since the sheets' dedupe keys were built from it
+    text = {col: _as_text(df[col]) for col in df.columns}
+    for col in df.columns:
+        typed[col] = _cell_text(df[col])
+
+    for col in schema['required']:
+        if col not in df.columns:
+            problems[f'missing column {col}'] = pd.Series(True, index=df.index)
+        else:
+            problems[f'empty {col}'] = is_missing(text[col])
+
+    for col in schema['timestamps']:
+        if col not in df.columns:
+            continue
+        missing = is_missing(text[col])
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            parsed = df[col]
+        else:
+            values = text[col].mask(missing)
+            parsed = pd.to_datetime(values, format=TIMESTAMP_FORMAT, errors='coerce')
+            # History reports mix Excel date cells (datetime objects, whose text is ISO) with text cells
+            retry = parsed.isna() & values.notna()
+            if retry.any():
+                parsed[retry] = pd.to_datetime(values[retry], format='ISO8601', errors='coerce')
+        problems[f'bad timestamp {col}'] = ~missing & parsed.isna()
+        typed[col] = parsed
+
+    for col in schema['amounts'] + schema['integers']:
+        if col not in df.columns:
+            continue
+        missing = is_missing(text[col])
+        parsed = pd.to_numeric(text[col].mask(missing).str.replace(',', '', regex=False), errors='coerce')
+        problems[f'non-numeric {col}'] = ~missing & parsed.isna()
+        if col in schema['non_negative']:
+            problems[f'negative {col}'] = parsed < 0
+        if col in schema['integers']:
+            problems[f'non-integer {col}'] = parsed.notna() & (parsed % 1 != 0)
+        typed[col] = parsed
+
+    for col in schema['phones']:
+        if col in df.columns:
+            typed[col] = normalize_phone(text[col])
+
+    if problems:
+        problem_frame = pd.DataFrame(problems, index=df.index).fillna(False).astype(bool)
+        bad = problem_frame.any(axis=1)
+        # bool x str concatenation builds every row's reason list without a Python loop
+        labels = np.array([f'{name}; ' for name in problem_frame.columns], dtype=object)
+        reasons = pd.Series(problem_frame.to_numpy(dtype=object).dot(labels), index=df.index)
+    else:
+        bad = pd.Series(False, index=df.index)
+        reasons = pd.Series('', index=df.index)
+
+    rejected = raw[bad].copy()
+    rejected['_reject_reason'] = reasons[bad].str.rstrip('; ')
+    return compact(typed[~bad], kind), rejected, voided_count
+
+
+def compact(df, kind):
+    """Applies the in-memory dtypes of SCHEMAS[kind] to validated rows.
+
+    Category columns become categoricals and whole-dollar amounts Int64 (a column
+    with e.g. 499.5 stays Float64). Also used on rows read back from Parquet.
+    """
+    schema = SCHEMAS[kind]
+    dtypes = {col: 'category' for col in schema['categories']
+              if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype)}
+    for col in schema['amounts']:
+        if col in df.columns and pd.api.types.is_float_dtype(df[col]):
+            values = df[col].dropna()
+            if len(values) and (values % 1 == 0).all():
+                dtypes[col] = 'Int64'
+    return df.astype(dtypes) if dtypes else df
+
+
+def concat_frames(frames):
+    """pd.concat for validated frames that keeps categorical columns categorical.
+
+    A plain concat falls back to plain strings when the frames' categories differ,
+    so every frame is first given the union of the categories.
+    """
+    frames = list(frames)
+    columns = {col for df in frames for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)}
+    union = {}
+    for col in columns:
+        values = [df[col].cat.categories if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].dropna().unique()
+                  for df in frames if col in df.columns]
+        union[col] = pd.CategoricalDtype(pd.Index(np.concatenate([np.asarray(v, dtype=object) for v in values])).unique().sort_values())
+    frames = [df.astype({col: dtype for col, dtype in union.items() if col in df.columns}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def recode(series, func):
+    """Applies `func` (Index -> Index) to the distinct values only and returns a categorical.
+
+    Values that end up equal share one category, so e.g. '*牛角貝' and '牛角貝'
+    become the same item. Cost is per distinct value, not per row.
+    """
+    series = series.astype('category')
+    mapped = pd.Index(func(series.cat.categories))
+    categories = mapped.dropna().unique().sort_values()
+    codes = series.cat.codes.to_numpy()
+    new_codes = np.where(codes >= 0, categories.get_indexer(mapped)[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories), index=series.index, name=series.name)
+
+
+def clean_item_names(series):
+    """商品名稱 without the leading '*' iCHEF puts on modified items (the master sheet's spelling)."""
+    return recode(series, lambda names: names.astype(str).str.replace(r'^\*', '', regex=True).str.strip())
+
+
+def item_categories(names, category_map, default='未分類'):
+    """大分類 of each cleaned item name; names missing from the master get `default`."""
+    return recode(names, lambda values: values.map(category_map).fillna(default))
+
+
+def fill_category(series, value=''):
+    """fillna for a (possibly categorical) column; adds `value` as a category when needed."""
+    series = series.astype('category')
+    if series.isna().any() and value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    return series.fillna(value)
+
+
+def to_sheet_frame(df):
+    """Converts a typed frame to the string cells written to Google Sheets.
+
+    Timestamps and amounts are formatted; text columns are written as they are.
+    """
+    out = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            out[col] = s.dt.strftime(TIMESTAMP_FORMAT).fillna('')
+        elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            whole = s.notna() & (s % 1 == 0)
+            text = s.astype(object).astype(str)
+            text[whole] = s[whole].astype('int64').astype(str)
+            out[col] = text.where(s.notna(), '')
+        else:
+            out[col] = s.astype(object).where(s.notna(), '').astype(str)
+    return out
+
+
+def quarantine(rejected, source_path):
+    """Writes rejected rows to downloads/quarantine so they can be fixed and re-dropped."""
+    if rejected.empty:
+        return None
+    if not os.path.exists(QUARANTINE_DIR):
+        os.makedirs(QUARANTINE_DIR)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    base = os.path.splitext(os.path.basename(source_path))[0]
+    dest_path = os.path.join(QUARANTINE_DIR, f"{timestamp}_{base}.csv")
+    rejected.to_csv(dest_path, index=False, encoding='utf-8-sig')
+
+    summary = rejected['_reject_reason'].str.split('; ').explode().value_counts()
+    print(f"Quarantined {len(rejected)} invalid rows to: {os.path.relpath(dest_path, BASE_DIR)}")
+    for reason, count in summary.items():
+        print(f"  - {reason}: {count}")
+    return dest_path
+
+
+def ingest(df, kind, source_path):
+    """Validates an export, quarantines bad rows and returns the clean, typed rows."""
+    clean, rejected, voided_count = validate(df, kind)
+    if voided_count:
+        print(f"Filtered out {voided_count} voided (已作廢) rows.")
+    quarantine(rejected, source_path)
+    return clean
+
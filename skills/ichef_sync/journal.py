@@ -0,0 +1,186 @@
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOURNAL_PATH = os.path.join(BASE_DIR, 'downloads', 'sync_journal.jsonl')
+
+# Rows per append_rows call; each chunk is journaled (and committed) on its own
+CHUNK_SIZE = 500
+
+# Batch states, in order
+PLANNED = 'planned'
+COMMITTED = 'committed'
+ARCHIVED = 'archived'
+
+
+class JournalMismatch(RuntimeError):
+    """The rows read back from a journaled range are neither the batch's rows nor empty."""
+
+
+def file_id(file_path):
+    """Content hash of a source export (stable across archive renames)."""
+    h = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def row_hash(row):
+    values = [str(v).strip() for v in row]
+    # The Sheets API drops trailing empty cells when reading rows back
+    while values and values[-1] == '':
+        values.pop()
+    return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()
+
+
+def _write(entries):
+    """Appends entries to the journal and fsyncs before returning (write-ahead)."""
+    with open(JOURNAL_PATH, 'a', encoding='utf-8') as f:
+        for entry in entries:
+            entry['ts'] = datetime.now().isoformat(timespec='seconds')
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load():
+    """Replays the journal. Returns {batch_id: latest entry}."""
+    batches = {}
+    if not os.path.exists(JOURNAL_PATH):
+        return batches
+    with open(JOURNAL_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line from a crash mid-write; the batch it belonged to stays in its previous state
+                continue
+            merged = batches.get(entry['batch_id'], {})
+            merged.update(entry)
+            batches[entry['batch_id']] = merged
+    return batches
+
+
+def file_batches(fid, target):
+    return sorted(
+        (b for b in load().values() if b['file_id'] == fid and b['target'] == target),
+        key=lambda b: b['chunk'],
+    )
+
+
+def file_status(fid, target):
+    """None (never planned), 'planned' (resume needed) or 'committed' (all rows landed)."""
+    batches = file_batches(fid, target)
+    if not batches:
+        return None
+    if all(b['state'] in (COMMITTED, ARCHIVED) for b in batches):
+        return COMMITTED
+    return PLANNED
+
+
+def plan(fid, file_path, target, start_row, rows):
+    """Records the planned chunks (rows, hashes, target range) before anything is sent."""
+    entries = []
+    for i in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[i:i + CHUNK_SIZE]
+        entries.append({
+            'batch_id': f"{fid}:{target}:{i // CHUNK_SIZE}",
+            'file_id': fid,
+            'file': os.path.basename(file_path),
+            'target': target,
+            'chunk': i // CHUNK_SIZE,
+            'start_row': start_row + i,
+            'end_row': start_row + i + len(chunk) - 1,
+            'row_hashes': [row_hash(r) for r in chunk],
+            'rows': chunk,
+            'state': PLANNED,
+        })
+    if not entries:
+        # Nothing new to upload still counts as done for this file
+        entries.append({
+            'batch_id': f"{fid}:{target}:0", 'file_id': fid, 'file': os.path.basename(file_path),
+            'target': target, 'chunk': 0, 'start_row': start_row, 'end_row': start_row - 1,
+            'row_hashes': [], 'rows': [], 'state': COMMITTED,
+        })
+    _write(entries)
+    return entries
+
+
+def mark(batch, state, **extra):
+    entry = {'batch_id': batch['batch_id'], 'state': state}
+    entry.update(extra)
+    _write([entry])
+    batch.update(entry)
+
+
+def range_rows(updated_range):
+    """(first, last) sheet row of an A1 range as returned by Sheets, e.g. "'Orders'!A12:K511"."""
+    rows = [int(n) for n in re.findall(r'[A-Z]*(\d+)', updated_range.split('!')[-1])]
+    if not rows:
+        return None
+    return rows[0], rows[-1]
+
+
+def landing_range(batch, batches):
+    """Rows a planned batch was (or will be) appended to.
+
+    Sheets appends after the last row it finds, which need not be the planned start_row
+    if the sheet changed after planning. The chunk before this one recorded where it
+    actually landed, so this one follows it; the plan is only used for the first chunk.
+    """
+    start = batch['start_row']
+    for prev in batches:
+        if prev['chunk'] >= batch['chunk']:
+            break
+        landed = range_rows(prev.get('updated_range') or '')
+        if landed:
+            start = landed[1] + 1
+        elif prev['rows'] or prev['row_hashes']:
+            start = prev['start_row'] + len(prev['row_hashes'])
+    return start, start + len(batch['row_hashes']) - 1
+
+
+def landed_state(batch, landed_rows):
+    """True if the batch's rows are in its range, False if the range is empty.
+
+    Anything else (other rows, part of the batch) raises JournalMismatch: appending
+    again could duplicate rows that landed somewhere else.
+    """
+    landed = Counter(row_hash(r) for r in landed_rows if any(str(v).strip() for v in r))
+    if not landed:
+        return False
+    if landed == Counter(batch['row_hashes']):
+        return True
+    extra = sum((landed - Counter(batch['row_hashes'])).values())
+    missing = sum((Counter(batch['row_hashes']) - landed).values())
+    raise JournalMismatch(
+        f"{batch['file']} chunk {batch['chunk']} ({batch['target']}): the journaled range holds "
+        f"{extra} other row(s) and lacks {missing} of the batch's {len(batch['row_hashes'])}. "
+        "Check the sheet by hand, then remove the batch from the journal."
+    )
+
+
+def mark_archived(fid):
+    for batch in load().values():
+        if batch['file_id'] == fid and batch['state'] == COMMITTED:
+            _write([{'batch_id': batch['batch_id'], 'state': ARCHIVED}])
+
+
+def compact():
+    """Rewrites the journal without archived batches once every batch is settled."""
+    batches = load()
+    if not batches or any(b['state'] == PLANNED for b in batches.values()):
+        return
+    keep = [b for b in batches.values() if b['state'] != ARCHIVED]
+    tmp_path = JOURNAL_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for entry in keep:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, JOURNAL_PATH)
@@ -0,0 +1,197 @@
+import os
+import sys
+import time
+import threading
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+from sync_service import (
+    DOWNLOADS_DIR, REWARD_DIR, load_config, get_google_client,
+    classify_file, find_excel_files, sync_files,
+)
+
+# A file is ready once its size/mtime have not changed for this long (or it was closed after writing)
+STABLE_SECONDS = 3
+# Everything that arrives within this quiet window is synced together
+COALESCE_SECONDS = 10
+# Re-read the target sheets after this long, in case they were edited by hand
+CACHE_TTL_SECONDS = 6 * 60 * 60
+# Failed files are retried after 1, 2, 4, ... minutes, then left for the next restart
+RETRY_BASE_SECONDS = 60
+MAX_RETRIES = 5
+
+class ExportHandler(FileSystemEventHandler):
+    """Records new/changed exports; the main loop decides when they are ready."""
+    def __init__(self, pending, lock):
+        self.pending = pending
+        self.lock = lock
+
+    def touch(self, path, closed=False):
+        # archive_file moves files into downloads/processed; those must not come back
+        if os.path.dirname(os.path.abspath(path)) not in (DOWNLOADS_DIR, REWARD_DIR):
+            return
+        if not classify_file(path):
+            return
+        with self.lock:
+            entry = self.pending.setdefault(path, {'stat': None, 'changed_at': time.time(), 'closed': False})
+            entry['changed_at'] = time.time()
+            entry['closed'] = closed
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.touch(event.src_path)
+
+    def on_moved(self, event):
+        # Browsers download to a temp name and rename when done
+        if not event.is_directory:
+            self.touch(event.dest_path)
+
+    def on_closed(self, event):
+        # inotify close-after-write (Linux only); elsewhere the stable-size check applies
+        if not event.is_directory:
+            self.touch(event.src_path, closed=True)
+
+def is_ready(path, entry, now):
+    """True once the file has stopped changing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    stat = (st.st_size, st.st_mtime)
+    if stat != entry['stat']:
+        entry['stat'] = stat
+        entry['changed_at'] = now
+        return entry['closed'] and st.st_size > 0
+    return st.st_size > 0 and (entry['closed'] or now - entry['changed_at'] >= STABLE_SECONDS)
+
+def take_batch(pending, lock):
+    """Returns the ready files once the folder has been quiet for COALESCE_SECONDS."""
+    now = time.time()
+    with lock:
+        if not pending:
+            return []
+        for path in list(pending):
+            if is_ready(path, pending[path], now) is None:
+                # Moved away or deleted before we got to it
+                del pending[path]
+        if not pending:
+            return []
+        last_change = max(e['changed_at'] for e in pending.values())
+        if now - last_change < COALESCE_SECONDS:
+            return []
+        ready = [p for p, e in pending.items() if e.get('retry_at', 0) <= now and is_ready(p, e, now)]
+        for p in ready:
+            del pending[p]
+        return ready
+
+def requeue(pending, lock, files, retries):
+    """Puts failed files back in pending with an exponential backoff.
+
+    `retries` counts the attempts per file across batches; files that synced are dropped from it.
+    """
+    now = time.time()
+    with lock:
+        for f in files:
+            attempts = retries.get(f, 0) + 1
+            if attempts > MAX_RETRIES:
+                print(f"[Daemon] Giving up on {os.path.basename(f)} after {MAX_RETRIES} retries.")
+                retries.pop(f, None)
+                continue
+            try:
+                st = os.stat(f)
+            except FileNotFoundError:
+                retries.pop(f, None)
+                continue
+            retries[f] = attempts
+            entry = pending.get(f) or {'stat': None, 'changed_at': 0, 'closed': False}
+            delay = RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            # The current size/mtime count as settled, so a retry does not hold back other files
+            entry.update(stat=(st.st_size, st.st_mtime), closed=True, retry_at=now + delay)
+            pending[f] = entry
+            print(f"[Daemon] Retrying {os.path.basename(f)} in {delay}s (attempt {attempts}/{MAX_RETRIES}).")
+
+def run_batch(state, config, files):
+    """One coalesced sync pass, grouped by target sheet, on the warm client and caches.
+
+    Returns the files that still failed after re-authorizing and retrying them once.
+    """
+    prod_files = sorted(f for f in files if classify_file(f) == 'product')
+    order_files = sorted(f for f in files if classify_file(f) in ('order', 'reward'))
+    print(f"\n[Daemon] Syncing {len(prod_files)} product and {len(order_files)} order/reward files...")
+
+    if time.time() - state['cache_loaded_at'] > CACHE_TTL_SECONDS:
+        state['cache'].clear()
+        state['cache_loaded_at'] = time.time()
+
+    failed = sync_files(state['client'], config, prod_files, order_files, state['cache'])
+    if failed:
+        # Most likely an expired/revoked session; re-authorize and retry the failed files once
+        print(f"[Daemon] {len(failed)} file(s) failed, re-authorizing...")
+        state['client'] = get_google_client(config['google_credentials_path'])
+        state['cache'].clear()
+        state['cache_loaded_at'] = time.time()
+        failed = sync_files(state['client'], config,
+                            [f for f in prod_files if f in failed],
+                            [f for f in order_files if f in failed], state['cache'])
+    if failed:
+        print(f"[Daemon] Batch completed with {len(failed)} failed file(s). Waiting for new files...")
+    else:
+        print("[Daemon] Batch completed. Waiting for new files...")
+    return failed
+
+def main():
+    print("Starting iCHEF Sync Daemon...")
+    try:
+        config = load_config()
+        client = get_google_client(config['google_credentials_path'])
+    except Exception as e:
+        print(f"Initialization Error: {e}")
+        sys.exit(1)
+
+    state = {'client': client, 'cache': {}, 'cache_loaded_at': time.time()}
+    pending = {}
+    retries = {}
+    lock = threading.Lock()
+
+    # Pick up whatever is already waiting; it goes through the same readiness checks
+    prod_files, order_files = find_excel_files()
+    for f in prod_files + order_files:
+        pending[f] = {'stat': None, 'changed_at': 0, 'closed': False}
+
+    handler = ExportHandler(pending, lock)
+    observer = Observer()
+    observer.schedule(handler, DOWNLOADS_DIR, recursive=False)
+    watched = [DOWNLOADS_DIR]
+    if os.path.exists(REWARD_DIR):
+        observer.schedule(handler, REWARD_DIR, recursive=False)
+        watched.append(REWARD_DIR)
+    observer.start()
+
+    for path in watched:
+        print(f"Monitoring directory: {path}")
+    print("Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            time.sleep(1)
+            files = take_batch(pending, lock)
+            if files:
+                try:
+                    failed = run_batch(state, config, files)
+                except Exception as e:
+                    print(f"[Daemon] Batch failed: {repr(e)}.")
+                    failed = files
+                for f in files:
+                    if f not in failed:
+                        retries.pop(f, None)
+                requeue(pending, lock, failed, retries)
+    except KeyboardInterrupt:
+        observer.stop()
+    observer.join()
+
+if __name__ == "__main__":
+    main()
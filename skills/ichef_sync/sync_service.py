@@ -1,17 +1,32 @@
 import os
+import sys
 import json
 import glob
+import argparse
 import pandas as pd
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
 from dotenv import load_dotenv
+from ingest import ingest, to_sheet_frame, is_missing
+import journal
+# profiling.py is shared with the other skills
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import profiling
+import aggregates
+import customers
+import basket
+import heatmap
+import catalog
 
 # Setup Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_PATH = os.path.join(BASE_DIR, 'config.json')
 DOWNLOADS_DIR = os.path.join(BASE_DIR, 'downloads')
 ARCHIVE_DIR = os.path.join(DOWNLOADS_DIR, 'processed')
+REWARD_DIR = os.path.join(os.path.dirname(os.path.dirname(DOWNLOADS_DIR)), 'reward_cards')
+# Placeholder left in config.json until the orders sheet is set up
+UNCONFIGURED_ORDER_SHEET = 'REPLACE_WITH_ORDER_SHEET_ID_HERE'
 
 if not os.path.exists(ARCHIVE_DIR):
     os.makedirs(ARCHIVE_DIR)
@@ -35,6 +50,23 @@ def get_google_client(credentials_env_path):
     creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
     return gspread.authorize(creds)
 
+def classify_file(file_path):
+    """'product', 'order', 'reward' or None for files the sync does not handle."""
+    filename = os.path.basename(file_path)
+    if filename.startswith('.') or filename.startswith('~$'):
+        return None
+    if filename.lower().endswith('.csv'):
+        if '_cards_' in filename or '_points_' in filename:
+            return 'reward'
+        return None
+    if '.xls' not in filename.lower():
+        return None
+    if '商品' in filename or 'Product' in filename or '結帳品項紀錄' in filename:
+        return 'product'
+    elif '訂單' in filename or 'Order' in filename or '作廢紀錄' in filename:
+        return 'order'
+    return None
+
 def find_excel_files():
     # Look for .xls and .xlsx files
     files = glob.glob(os.path.join(DOWNLOADS_DIR, "*.xls*"))
@@ -42,24 +74,22 @@ def find_excel_files():
     order_files = []
 
     for f in files:
-        filename = os.path.basename(f)
-        if '商品' in filename or 'Product' in filename or '結帳品項紀錄' in filename:
+        kind = classify_file(f)
+        if kind == 'product':
             product_files.append(f)
-        elif '訂單' in filename or 'Order' in filename or '作廢紀錄' in filename:
+        elif kind == 'order':
             order_files.append(f)
     
     # Also look in reward_cards subdirectory
-    reward_dir = os.path.join(os.path.dirname(os.path.dirname(DOWNLOADS_DIR)), 'reward_cards')
-    if os.path.exists(reward_dir):
-        csv_files = glob.glob(os.path.join(reward_dir, "*.csv"))
+    if os.path.exists(REWARD_DIR):
+        csv_files = glob.glob(os.path.join(REWARD_DIR, "*.csv"))
         for f in csv_files:
-            filename = os.path.basename(f)
-            if '_cards_' in filename or '_points_' in filename:
+            if classify_file(f) == 'reward':
                 order_files.append(f) # Reusing list or handle separately
     
     return product_files, order_files
 
-def sync_products(client, config, file_path):
+def sync_products(client, config, file_path, cache=None, sinks=None):
     print(f"Processing Product File: {file_path}")
     
     # Read Excel
@@ -70,11 +100,16 @@ def sync_products(client, config, file_path):
         return False
 
     # 1. Sync Raw Data to 'Product Sales List'
-    raw_success = sync_product_sales_raw(client, config, file_path, df_new)
-    if not raw_success:
+    sinks = sinks or build_sinks(client, config, cache)
+    clean = sync_product_sales_raw(client, config, file_path, df_new, cache, sinks)
+    if clean is None:
         print("Skipping Product Master check due to Raw Sync failure.")
         return False
 
+    if not any(sink.name == 'sheets' for sink in sinks):
+        # e.g. a SQL-only history load; the master sheet is left alone
+        return True
+
     # 2. Check for New Products in Master Sheet
     print("Checking for new products in Master Sheet...")
 
@@ -82,7 +117,7 @@ def sync_products(client, config, file_path):
     # Assuming the first column is often the product name or we look for specific headers
     # iCHEF export usually has '商品名稱' or 'Product Name'
     name_col = None
-    for col in df_new.columns:
+    for col in clean.columns:
         if '商品名稱' in str(col) or 'Product' in str(col):
             name_col = col
             break
@@ -91,34 +126,41 @@ def sync_products(client, config, file_path):
         print("Could not find 'Product Name' column in Excel.")
         return
 
-    # Connect to Google Sheet
-    sheet_id = config['sheets']['product_master']['id']
-    sheet_name = config['sheets']['product_master']['sheet_name']
-    
-    try:
-        sh = client.open_by_key(sheet_id)
-        worksheet = sh.worksheet(sheet_name)
-    except Exception as e:
-        print(f"Error accessing Google Sheet (Product Master): {repr(e)}")
-        return False
+    if cache is not None and 'product_master' in cache:
+        worksheet, existing_names = cache['product_master']
+    else:
+        # Connect to Google Sheet
+        sheet_id = config['sheets']['product_master']['id']
+        sheet_name = config['sheets']['product_master']['sheet_name']
+        
+        try:
+            sh = client.open_by_key(sheet_id)
+            worksheet = sh.worksheet(sheet_name)
+        except Exception as e:
+            print(f"Error accessing Google Sheet (Product Master): {repr(e)}")
+            return False
 
-    # Read existing data
-    existing_data = worksheet.get_all_records()
-    existing_df = pd.DataFrame(existing_data)
-    
-    existing_names = set()
-    master_col_name = config['sheets']['product_master']['columns']['name']
-    
-    if not existing_df.empty and master_col_name in existing_df.columns:
-        existing_names = set(existing_df[master_col_name].astype(str).str.strip())
+        # Read existing data
+        existing_data = worksheet.get_all_records()
+        existing_df = pd.DataFrame(existing_data)
+        
+        existing_names = set()
+        master_col_name = config['sheets']['product_master']['columns']['name']
+        
+        if not existing_df.empty and master_col_name in existing_df.columns:
+            existing_names = set(existing_df[master_col_name].astype(str).str.strip())
+
+        if cache is not None:
+            cache['product_master'] = (worksheet, existing_names)
     
     # Find new products
     new_products = []
     current_date = datetime.now().strftime('%Y-%m-%d')
     
-    for index, row in df_new.iterrows():
-        p_name = str(row[name_col]).strip()
-        if p_name and p_name not in existing_names:
+    batch_names = set()
+    # Only validated rows: voided and quarantined lines must not add products
+    for p_name in clean[name_col].dropna().astype(str).str.strip():
+        if p_name and p_name not in existing_names and p_name not in batch_names:
             # Prepare row based on Master Sheet structure
             # [Original Name, New Name, Category, Small Category, ...Date]
             new_row = [
@@ -129,252 +171,348 @@ def sync_products(client, config, file_path):
                 current_date
             ]
             new_products.append(new_row)
-            existing_names.add(p_name) # Prevent duplicates in same batch
+            batch_names.add(p_name) # Prevent duplicates in same batch
 
     if new_products:
         print(f"Found {len(new_products)} new products. Appending...")
         worksheet.append_rows(new_products)
+        existing_names |= batch_names
         print("Done.")
     else:
         print("No new products found.")
     
     return True
 
-def sync_product_sales_raw(client, config, file_path, df_new):
-    print(f"Syncing Raw Product Sales to Sheet...")
-    sheet_id = config['sheets']['product_sales']['id']
-    sheet_name = config['sheets']['product_sales']['sheet_name']
-    
-    try:
-        sh = client.open_by_key(sheet_id)
-        worksheet = sh.worksheet(sheet_name)
-        
-        df_new = df_new.fillna('').astype(str)
-        
-        # Normalize Column Names (Fix mismatches)
-        df_new = df_new.rename(columns={
-            '載具／捐贈碼': '載具/捐贈碼',  # Full-width slash to half-width
-            '發票金額': '結帳金額',        # Invoice Amount to Checkout Amount
-            '支付模組': '支付方式',        # Payment Module to Payment Method
-            '訂單標籤與備註': '訂單備註'    # Tags to Notes
-        })
+# Column aliases to handle mismatches between sheet headers and export columns
+ALIASES = {
+    '發票金額': '結帳金額',
+    '結帳金額': '發票金額',
+    '支付模組': '支付方式',
+    '支付方式': '支付模組',
+    '載具／捐贈碼': '載具/捐贈碼',
+    '載具/捐贈碼': '載具／捐贈碼',
+    '訂單標籤與備註': '訂單備註',
+    '訂單備註': '訂單標籤與備註'
+}
+
+def open_target(client, config, target, cache=None):
+    """Opens a target sheet and reads its headers, dedupe keys and next free row.
+
+    With a cache (daemon mode) the sheet is read once and the state stays warm
+    between batches; successful appends update it in place.
+    """
+    if cache is not None and target in cache:
+        return cache[target]
+
+    sh = client.open_by_key(config['sheets'][target]['id'])
+    worksheet = sh.worksheet(config['sheets'][target]['sheet_name'])
+    existing_data = worksheet.get_all_values()
+    state = {
+        'worksheet': worksheet,
+        'headers': existing_data[0] if existing_data else [],
+        'keys': existing_keys(existing_data),
+        'next_row': len(existing_data) + 1,
+    }
+    if cache is not None:
+        cache[target] = state
+    return state
+
+def existing_keys(existing_data):
+    # Prevent Duplicates: Get existing invoice numbers & times to skip
+    keys = set()
+    if existing_data:
+        inv_idx = -1
+        time_idx = -1
+        for i, h in enumerate(existing_data[0]):
+            if '發票號碼' in h: inv_idx = i
+            if '結帳時間' in h: time_idx = i
         
-        # Filter out voided transactions (目前概況 contains '已作廢')
-        if '目前概況' in df_new.columns:
-            before_count = len(df_new)
-            df_new = df_new[~df_new['目前概況'].str.contains('已作廢', na=False)]
-            after_count = len(df_new)
-            if before_count > after_count:
-                print(f"Filtered out {before_count - after_count} voided (已作廢) rows.")
-
-        # Check if empty to add headers
-        existing_data = worksheet.get_all_values()
-        if not existing_data:
-            header = df.columns.tolist()
-            worksheet.append_row(header)
-            target_headers = header
-        else:
-            target_headers = worksheet.row_values(1)
-        
-        if not existing_data:
+        if inv_idx != -1 and time_idx != -1:
+            # Use (InvoiceNumber, Time) as a unique key
+            for r in existing_data[1:]:
+                if len(r) > max(inv_idx, time_idx):
+                    keys.add((r[inv_idx].strip(), r[time_idx].strip()))
+    return keys
+
+def align_rows(df, state):
+    """Strict alignment to the sheet headers with alias support & deduplication.
+
+    Returns (rows, new_keys); new_keys are only added to the state once the rows have landed.
+    """
+    aligned_rows = []
+    new_keys = set()
+    inv_col = '發票號碼'
+    time_col = '結帳時間'
+
+    for _, row in df.iterrows():
+        # Check if exists
+        current_key = (str(row.get(inv_col, '')).strip(), str(row.get(time_col, '')).strip())
+        if current_key[0] and (current_key in state['keys'] or current_key in new_keys):
+            continue
+
+        new_row = []
+        for h in state['headers']:
+            target_h = h.strip()
+            if target_h in df.columns:
+                new_row.append(row[target_h])
+            elif target_h in ALIASES and ALIASES[target_h] in df.columns:
+                new_row.append(row[ALIASES[target_h]])
+            else:
+                new_row.append("") 
+        aligned_rows.append(new_row)
+        new_keys.add(current_key) # Prevent duplicates WITHIN the same file
+    return aligned_rows, new_keys
+
+def sync_target(client, config, target, file_path, df, cache=None):
+    """Sheet-string frame -> deduplicated, journaled append to a target sheet."""
+    # A previous run may have planned (or already sent) this file's rows
+    fid = journal.file_id(file_path)
+    status = journal.file_status(fid, target)
+    if status == journal.COMMITTED:
+        print("Journal: rows from this file were already uploaded. Skipping.")
+        return True
+
+    try:
+        state = open_target(client, config, target, cache)
+        if status == journal.PLANNED:
+            # Only the journaled ranges are checked; the sheet is not re-read.
+            # The warm state no longer knows the next row, so drop it.
+            if cache is not None:
+                cache.pop(target, None)
+            return resume_journal(state['worksheet'], fid, target)
+
+        # Check if sheet is empty (has headers?)
+        if not state['headers']:
             header = df.columns.tolist()
-            worksheet.append_row(header)
-            target_headers = header
-        else:
-            target_headers = worksheet.row_values(1)
-        
-        # Define column aliases to handle mismatches
-        aliases = {
-            '發票金額': '結帳金額',
-            '結帳金額': '發票金額',
-            '支付模組': '支付方式',
-            '支付方式': '支付模組',
-            '載具／捐贈碼': '載具/捐贈碼',
-            '載具/捐贈碼': '載具／捐贈碼',
-            '訂單標籤與備註': '訂單備註',
-            '訂單備註': '訂單標籤與備註'
-        }
-
-        # Prevent Duplicates: Get existing invoice numbers & times to skip
-        existing_keys = set()
-        if existing_data:
-            inv_idx = -1
-            time_idx = -1
-            for i, h in enumerate(target_headers):
-                if '發票號碼' in h: inv_idx = i
-                if '結帳時間' in h: time_idx = i
-            
-            if inv_idx != -1 and time_idx != -1:
-                # Use (InvoiceNumber, Time) as a unique key
-                for r in existing_data[1:]:
-                    if len(r) > max(inv_idx, time_idx):
-                        existing_keys.add((r[inv_idx].strip(), r[time_idx].strip()))
-
-        # Strict Alignment with Alias Support & Deduplication: 
-        aligned_rows = []
-        inv_col = '發票號碼'
-        time_col = '結帳時間'
-
-        for _, row in df_new.iterrows():
-            # Check if exists
-            current_key = (str(row.get(inv_col, '')).strip(), str(row.get(time_col, '')).strip())
-            if current_key[0] and current_key in existing_keys:
-                continue
-
-            new_row = []
-            for h in target_headers:
-                target_h = h.strip()
-                if target_h in df_new.columns:
-                    new_row.append(row[target_h])
-                elif target_h in aliases and aliases[target_h] in df_new.columns:
-                    new_row.append(row[aliases[target_h]])
-                else:
-                    new_row.append("") 
-            aligned_rows.append(new_row)
-            existing_keys.add(current_key) # Prevent duplicates WITHIN the same file
+            state['worksheet'].append_row(header)
+            state['headers'] = header
+            state['next_row'] = 2
 
+        aligned_rows, new_keys = align_rows(df, state)
         if not aligned_rows:
             print("No NEW data to upload after deduplication.")
+            journal.plan(fid, file_path, target, state['next_row'], [])
             return True # Not a failure, just nothing new
 
-        print(f"Appending {len(aligned_rows)} NEW rows to Product Sales sheet...")
-        worksheet.append_rows(aligned_rows)
-        print("Raw Product Sales Synced.")
+        print(f"Appending {len(aligned_rows)} NEW rows to {target} sheet...")
+        append_journaled(state['worksheet'], fid, file_path, target, aligned_rows, state['next_row'])
+        state['keys'] |= new_keys
+        state['next_row'] += len(aligned_rows)
         return True
+
+    except Exception:
+        # Whatever is cached may not match the sheet any more
+        if cache is not None:
+            cache.pop(target, None)
+        raise
+
+# --- Sinks -----------------------------------------------------------------
+# A sink receives the same validated, typed batch (see ingest.py) per target.
+# Sheets is the default; the SQL sink does bulk upserts for history loads.
+
+class SheetsSink:
+    name = 'sheets'
+
+    def __init__(self, client, config, cache=None):
+        self.client = client
+        self.config = config
+        self.cache = cache
+
+    def write(self, target, file_path, df):
+        # Strings only at the Sheets boundary
+        return sync_target(self.client, self.config, target, file_path, to_sheet_frame(df), self.cache)
+
+    def close(self):
+        pass
+
+class SqlSink:
+    """Bulk upserts into SQLite or Postgres, using the column names of full-schema.sql.
+
+    Orders are keyed on (invoice_number, checkout_time). Product sales share
+    that key per invoice, so line_no (position within the invoice) is added.
+    Upserts are idempotent, so this sink needs no journal.
+    """
+    name = 'sql'
+
+    COLUMNS = {
+        'orders': {
+            '原始單號': 'order_number',
+            '外部單號': 'external_order_number',
+            '發票號碼': 'invoice_number',
+            '載具/捐贈碼': 'carrier_code',
+            '結帳時間': 'checkout_time',
+            '訂單來源': 'order_source',
+            '訂單種類': 'order_type',
+            '桌號': 'table_number',
+            '服務費': 'service_fee',
+            '運費': 'shipping_fee',
+            '折扣金額細項': 'discount_amount',
+            '結帳金額': 'invoice_amount',
+            '支付方式': 'payment_module',
+            '付款資訊': 'payment_info',
+            '支付備註': 'payment_note',
+            '目前概況': 'current_status',
+            '顧客姓名': 'customer_name',
+            '顧客電話': 'customer_phone',
+            '訂單備註': 'order_note',
+            '品項': 'items',
+            '訂購人': 'orderer',
+            '訂購人電話': 'orderer_phone',
+        },
+        'product_sales': {
+            '商品名稱': 'product_original_name',
+            '發票號碼': 'invoice_number',
+            '載具/捐贈碼': 'carrier_code',
+            '結帳時間': 'checkout_time',
+            '原始單號': 'order_number',
+            '外部單號': 'external_order_number',
+            '訂單來源': 'order_source',
+            '訂單種類': 'order_type',
+            '桌號': 'table_number',
+            '結帳金額': 'invoice_amount',
+            '目前概況': 'current_status',
+        },
+    }
+    KEYS = {
+        'orders': ['invoice_number', 'checkout_time'],
+        'product_sales': ['invoice_number', 'checkout_time', 'line_no'],
+    }
+    NUMERIC = {'service_fee', 'shipping_fee', 'discount_amount', 'invoice_amount', 'line_no'}
+    PAGE_SIZE = 1000
+
+    def __init__(self, url):
+        self.url = url
+        if url.startswith('postgres'):
+            import psycopg2  # Optional dependency, only needed for Postgres
+            self.conn = psycopg2.connect(url)
+            self.dialect = 'postgres'
+        else:
+            path = url[len('sqlite:///'):] if url.startswith('sqlite:///') else url
+            self.conn = aggregates.connect_store(path)
+            self.dialect = 'sqlite'
+        self.ensure_tables()
+
+    def ensure_tables(self):
+        id_col = 'id BIGSERIAL PRIMARY KEY' if self.dialect == 'postgres' else 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+        cur = self.conn.cursor()
+        for target, mapping in self.COLUMNS.items():
+            cols = list(mapping.values())
+            if target == 'product_sales':
+                cols.append('line_no')
+            defs = []
+            for c in cols:
+                if c == 'checkout_time':
+                    defs.append(f'{c} TIMESTAMP')
+                elif c in self.NUMERIC:
+                    defs.append(f'{c} DECIMAL(10,2)')
+                else:
+                    defs.append(f'{c} TEXT')
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {target} ({id_col}, {', '.join(defs)})")
+            keys = self.KEYS[target]
+            cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {target}_upsert_key ON {target} ({', '.join(keys)})")
+        self.conn.commit()
+
+    def rows(self, target, df):
+        """Typed frame -> (columns, list of tuples) with NULLs for missing values."""
+        mapping = {k: v for k, v in self.COLUMNS[target].items() if k in df.columns}
+        frame = pd.DataFrame(index=df.index)
+        for src, dest in mapping.items():
+            s = df[src]
+            if pd.api.types.is_datetime64_any_dtype(s):
+                frame[dest] = s.dt.strftime('%Y-%m-%d %H:%M:%S')
+            elif pd.api.types.is_numeric_dtype(s):
+                frame[dest] = s.astype('float64')
+            else:
+                frame[dest] = s.mask(is_missing(s.astype('string')))
+        if target == 'product_sales':
+            frame['line_no'] = df.groupby(['發票號碼', '結帳時間'], sort=False).cumcount()
+        # Postgres rejects a statement that upserts the same key twice
+        frame = frame.drop_duplicates(subset=self.KEYS[target], keep='last')
+        frame = frame.astype(object).where(frame.notna(), None)
+        return list(frame.columns), list(frame.itertuples(index=False, name=None))
+
+    def write(self, target, file_path, df):
+        if target not in self.COLUMNS:
+            return False
+        cols, rows = self.rows(target, df)
+        if not rows:
+            return True
+        keys = self.KEYS[target]
+        updates = ', '.join(f'{c} = excluded.{c}' for c in cols if c not in keys)
+        sql = (f"INSERT INTO {target} ({', '.join(cols)}) VALUES %s "
+               f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}")
+
+        cur = self.conn.cursor()
+        if self.dialect == 'postgres':
+            from psycopg2.extras import execute_values
+            execute_values(cur, sql, rows, page_size=self.PAGE_SIZE)
+        else:
+            placeholders = '(' + ', '.join('?' for _ in cols) + ')'
+            cur.executemany(sql.replace('%s', placeholders), rows)
+        self.conn.commit()
+        print(f"Upserted {len(rows)} rows into SQL table {target}.")
+        return True
+
+    def close(self):
+        self.conn.close()
+
+def build_sinks(client, config, cache=None, names=None):
+    """Sinks named in config['sinks'] (default: sheets only)."""
+    sinks = []
+    for name in names or config.get('sinks', ['sheets']):
+        if name == 'sheets':
+            sinks.append(SheetsSink(client, config, cache))
+        elif name == 'sql':
+            sinks.append(SqlSink(config['sql']['url']))
+        else:
+            raise ValueError(f"Unknown sink: {name}")
+    return sinks
+
+def write_sinks(sinks, target, file_path, df):
+    """Sends the same validated batch to every sink; a failing sink fails the file."""
+    for sink in sinks:
+        sink.write(target, file_path, df)
+
+def sync_product_sales_raw(client, config, file_path, df_new, cache=None, sinks=None):
+    """Validates and writes the item lines. Returns the validated rows, or None on failure."""
+    print(f"Syncing Raw Product Sales...")
+    try:
+        # Validate, drop voided rows and quarantine bad rows before anything is uploaded
+        df_new = ingest(df_new, 'product_sales', file_path)
+        write_sinks(sinks or build_sinks(client, config, cache), 'product_sales', file_path, df_new)
+        print("Raw Product Sales Synced.")
+        return df_new
         
     except Exception as e:
         print(f"Error syncing raw product sales: {repr(e)}")
-        return False
+        return None
 
-def sync_orders(client, config, file_path):
+def sync_orders(client, config, file_path, cache=None, sinks=None):
     print(f"Processing Order File: {file_path}")
-    
-    sheet_id = config['sheets']['orders']['id']
-    if sheet_id == "REPLACE_WITH_ORDER_SHEET_ID_HERE":
-        print("Skipping Orders: Sheet ID not configured in config.json")
-        return
+
+    sinks = sinks or build_sinks(client, config, cache)
+    sheet_id = config.get('sheets', {}).get('orders', {}).get('id', UNCONFIGURED_ORDER_SHEET)
+    if sheet_id == UNCONFIGURED_ORDER_SHEET:
+        # Only the Sheets sink needs the sheet; a SQL-only setup still loads the orders
+        sinks = [sink for sink in sinks if sink.name != 'sheets']
+        if not any(sink.name != aggregates.BatchCollector.name for sink in sinks):
+            print("Skipping Orders: Sheet ID not configured in config.json")
+            return
+        print("Orders Sheet ID not configured in config.json; writing to the other sinks only.")
 
     try:
         df = pd.read_excel(file_path)
-        # Convert all to string to avoid JSON serialization errors with dates/NaNs
-        df = df.fillna('').astype(str)
-        
-        # Normalize Column Names for Orders (Fix mismatches)
-        df = df.rename(columns={
-            '載具／捐贈碼': '載具/捐贈碼',  # Full-width slash to half-width
-            '發票金額': '結帳金額',        # Invoice Amount to Checkout Amount
-            '支付模組': '支付方式',        # Payment Module to Payment Method
-            '訂單標籤與備註': '訂單備註'    # Tags to Notes
-        })
-        
-        # Filter out voided transactions (目前概況 contains '已作廢')
-        if '目前概況' in df.columns:
-            before_count = len(df)
-            df = df[~df['目前概況'].str.contains('已作廢', na=False)]
-            after_count = len(df)
-            if before_count > after_count:
-                print(f"Filtered out {before_count - after_count} voided (已作廢) rows.")
-
-        # CLEAN PHONE NUMBERS (Strip leading '0' to match legacy data)
-        # e.g. '0912345678' -> '912345678'
-        phone_cols = ['顧客電話', '訂購人電話']
-        for col in phone_cols:
-            if col in df.columns:
-                # Convert to string, strip whitespace, then strip leading '0'
-                # But keep non-empty values that might not be numbers just in case? 
-                # User specifically asked for this matching.
-                # Use apply to handle individual cells safely
-                df[col] = df[col].astype(str).apply(lambda x: x.strip().lstrip('0') if x and x.strip().startswith('0') else x)
+        # Validate types/required fields, drop voided rows, normalize phones
+        # (strip leading '0' to match legacy data) and quarantine bad rows.
+        # Values stay typed until the Sheets boundary (SheetsSink).
+        df = ingest(df, 'orders', file_path)
 
     except Exception as e:
         print(f"Error reading Order Excel: {repr(e)}")
         return False
 
     try:
-        sh = client.open_by_key(sheet_id)
-        worksheet = sh.worksheet(config['sheets']['orders']['sheet_name'])
-        
-        # Check if sheet is empty (has headers?)
-        # If we assume we are appending daily logs, we might just append.
-        # But if headers are missing, we should add them.
-        existing_data = worksheet.get_all_values()
-        
-        # Check if empty
-        existing_data = worksheet.get_all_values()
-        
-        if not existing_data:
-            # Empty sheet, add headers from Excel
-            header = df.columns.tolist()
-            worksheet.append_row(header)
-            target_headers = header
-        else:
-            # Sheet exists, get headers
-            target_headers = worksheet.row_values(1)
-            
-        if not existing_data:
-            # Empty sheet, add headers from Excel
-            header = df.columns.tolist()
-            worksheet.append_row(header)
-            target_headers = header
-        else:
-            # Sheet exists, get headers
-            target_headers = worksheet.row_values(1)
-            
-        # Define column aliases to handle mismatches
-        aliases = {
-            '發票金額': '結帳金額',
-            '結帳金額': '發票金額',
-            '支付模組': '支付方式',
-            '支付方式': '支付模組',
-            '載具／捐贈碼': '載具/捐贈碼',
-            '載具/捐贈碼': '載具／捐贈碼',
-            '訂單標籤與備註': '訂單備註',
-            '訂單備註': '訂單標籤與備註'
-        }
-
-        # Prevent Duplicates for Orders
-        existing_keys = set()
-        if existing_data:
-            inv_idx = -1
-            time_idx = -1
-            for i, h in enumerate(target_headers):
-                if '發票號碼' in h: inv_idx = i
-                if '結帳時間' in h: time_idx = i
-            
-            if inv_idx != -1 and time_idx != -1:
-                for r in existing_data[1:]:
-                    if len(r) > max(inv_idx, time_idx):
-                        existing_keys.add((r[inv_idx].strip(), r[time_idx].strip()))
-
-        # Strict Alignment for Orders with Alias Support & Deduplication
-        aligned_rows = []
-        inv_col = '發票號碼'
-        time_col = '結帳時間'
-
-        for _, row in df.iterrows():
-            # Check if exists
-            current_key = (str(row.get(inv_col, '')).strip(), str(row.get(time_col, '')).strip())
-            if current_key[0] and current_key in existing_keys:
-                continue
-
-            new_row = []
-            for h in target_headers:
-                target_h = h.strip()
-                if target_h in df.columns:
-                    new_row.append(row[target_h])
-                elif target_h in aliases and aliases[target_h] in df.columns:
-                    new_row.append(row[aliases[target_h]])
-                else:
-                    new_row.append("") 
-            aligned_rows.append(new_row)
-            existing_keys.add(current_key)
-
-        if not aligned_rows:
-            print("No NEW order data to upload.")
-            return True
-
-        print(f"Appending {len(aligned_rows)} NEW rows to Orders sheet...")
-        worksheet.append_rows(aligned_rows)
+        write_sinks(sinks, 'orders', file_path, df)
         print("Done.")
 
     except Exception as e:
@@ -398,9 +536,15 @@ def sync_reward_data(client, config, file_path):
     file_date_str = date_match.group(1) if date_match else "Unknown"
 
     try:
+        fid = journal.file_id(file_path)
+        status = journal.file_status(fid, sheet_type)
+        if status == journal.COMMITTED:
+            print(f"Journal: {filename} was already synced to {sheet_name}. Skipping.")
+            return True
+
         # Load CSV
         df = pd.read_csv(file_path, encoding='utf-8-sig') # Handle BOM
-        df = df.fillna('').astype(str)
+        df = to_sheet_frame(ingest(df, sheet_type, file_path))
         
         # Add 'Data_Date' column to the beginning
         df.insert(0, 'Data_Date', file_date_str)
@@ -414,17 +558,21 @@ def sync_reward_data(client, config, file_path):
             worksheet = sh.add_worksheet(title=sheet_name, rows="100", cols="20")
             worksheet.append_row(df.columns.tolist())
 
+        if status == journal.PLANNED:
+            return resume_journal(worksheet, fid, sheet_type)
+
         # Check for existing data for THIS date to prevent duplicates
         existing_data = worksheet.get_all_values()
         if existing_data:
             existing_dates = set([r[0] for r in existing_data[1:]])
             if file_date_str in existing_dates:
                 print(f"Data for {file_date_str} already exists in {sheet_name}. Skipping.")
+                journal.plan(fid, file_path, sheet_type, len(existing_data) + 1, [])
                 return True
 
         # Append data
         data_to_append = df.values.tolist()
-        worksheet.append_rows(data_to_append)
+        append_journaled(worksheet, fid, file_path, sheet_type, data_to_append, max(len(existing_data), 1) + 1)
         print(f"Successfully synced {len(data_to_append)} rows to {sheet_name}.")
         return True
         
@@ -432,7 +580,45 @@ def sync_reward_data(client, config, file_path):
         print(f"Error syncing reward data: {repr(e)}")
         return False
 
-def archive_file(file_path):
+def append_journaled(worksheet, fid, file_path, target, rows, start_row):
+    """Appends rows in chunks, journaling each chunk before it is sent (see journal.py)."""
+    for batch in journal.plan(fid, file_path, target, start_row, rows):
+        if batch['state'] == journal.PLANNED:
+            commit_batch(worksheet, batch, batch['rows'])
+
+def commit_batch(worksheet, batch, rows):
+    updated_range = ''
+    if rows:
+        response = worksheet.append_rows(rows)
+        updated_range = (response or {}).get('updates', {}).get('updatedRange', '')
+    # Rows are no longer needed once they have landed
+    journal.mark(batch, journal.COMMITTED, rows=[], updated_range=updated_range)
+
+def resume_journal(worksheet, fid, target):
+    """Finishes an interrupted upload by reading back only the journaled row ranges."""
+    print(f"Journal: resuming interrupted upload to {target}...")
+    batches = journal.file_batches(fid, target)
+    for batch in batches:
+        if batch['state'] != journal.PLANNED:
+            continue
+        start_row, end_row = journal.landing_range(batch, batches)
+        landed = worksheet.get(f"{start_row}:{end_row}")
+        # Raises JournalMismatch rather than appending rows that may already be in the sheet
+        if journal.landed_state(batch, landed):
+            print(f"  Chunk {batch['chunk']} (rows {start_row}-{end_row}): already landed.")
+            journal.mark(batch, journal.COMMITTED, rows=[], updated_range=f"A{start_row}:A{end_row}")
+        else:
+            print(f"  Chunk {batch['chunk']} (rows {start_row}-{end_row}): appending {len(batch['rows'])} rows.")
+            commit_batch(worksheet, batch, batch['rows'])
+    return True
+
+def archive_file(file_path, config=None, batch=None):
+    """Moves a synced export into downloads/processed and records it in the export catalog.
+
+    `batch` is the (target, validated rows) pair from this run, so the catalog
+    entry does not need the workbook to be read again.
+    """
+    fid = journal.file_id(file_path)
     filename = os.path.basename(file_path)
     # Add timestamp to filename to prevent overwrite in archive
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -442,39 +628,128 @@ def archive_file(file_path):
     try:
         os.rename(file_path, dest_path)
         print(f"Archived file to: {new_name}")
+        journal.mark_archived(fid)
     except Exception as e:
         print(f"Error archiving file: {e}")
+        return
+    try:
+        target, df = batch or (None, None)
+        store = catalog.open_catalog(config, refresh=False)
+        try:
+            store.record(dest_path, clean=df, kind=target)
+        finally:
+            store.close()
+    except Exception as e:
+        print(f"Error cataloging {new_name}: {repr(e)}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Sync iCHEF exports to Google Sheets and/or SQL.")
+    parser.add_argument('files', nargs='*', help="Exports to load instead of scanning downloads/ (e.g. a multi-year history report)")
+    parser.add_argument('--sinks', help="Comma-separated sinks overriding config.json, e.g. 'sql' or 'sheets,sql'")
+    parser.add_argument('--profile', action='store_true', help="Write cProfile/tracemalloc/RSS per stage to profiles/")
+    args = parser.parse_args()
+    with profiling.profiled('sync_service', args.profile):
+        run(args)
+
+def run(args):
+    """One sync run for the parsed command line."""
     print("Starting iCHEF Data Sync...")
     
     try:
         config = load_config()
-        client = get_google_client(config['google_credentials_path'])
+        sink_names = args.sinks.split(',') if args.sinks else config.get('sinks', ['sheets'])
+        client = get_google_client(config['google_credentials_path']) if 'sheets' in sink_names else None
     except Exception as e:
         print(f"Initialization Error: {e}")
         return
 
-    prod_files, order_files = find_excel_files()
+    if args.files:
+        prod_files = [f for f in args.files if classify_file(f) == 'product']
+        order_files = [f for f in args.files if classify_file(f) in ('order', 'reward')]
+    else:
+        prod_files, order_files = find_excel_files()
     
     if not prod_files and not order_files:
         print("No Excel files found in 'downloads' folder.")
         return
 
-    for f in prod_files:
-        if sync_products(client, config, f):
-            archive_file(f)
-        
-    for f in order_files:
-        if f.endswith('.csv'):
-            if sync_reward_data(client, config, f):
-                # We don't archive reward cards yet to keep them as a record locally, 
-                # but we could. For now let's just mark as done.
-                print(f"Marked {f} as synced.")
-        elif sync_orders(client, config, f):
-            archive_file(f)
-
-    print("Sync completed.")
+    failed = sync_files(client, config, prod_files, order_files, sink_names=sink_names)
+    if failed:
+        print(f"Sync completed; {len(failed)} file(s) failed and were left in place:")
+        for f in failed:
+            print(f"  {f}")
+    else:
+        print("Sync completed.")
+
+def sync_files(client, config, prod_files, order_files, cache=None, sink_names=None):
+    """One sync pass: product files first, then orders and reward data.
+
+    Returns the files that failed (False from their sync step), so a caller can retry them.
+    """
+    sinks = build_sinks(client, config, cache, sink_names)
+    # Keeps this run's validated batches for the aggregation stage below
+    collector = aggregates.BatchCollector()
+    sinks.append(collector)
+    failed = []
+    try:
+        for f in prod_files:
+            with profiling.stage('products'):
+                result = sync_products(client, config, f, cache, sinks)
+                if result and is_download(f):
+                    archive_file(f, config, collector.files.get(f))
+                elif result is False:
+                    failed.append(f)
+            
+        for f in order_files:
+            if f.endswith('.csv'):
+                if client is None:
+                    continue # Reward data only goes to Sheets
+                with profiling.stage('rewards'):
+                    if sync_reward_data(client, config, f):
+                        # We don't archive reward cards yet to keep them as a record locally, 
+                        # but we could. For now let's just mark as done.
+                        print(f"Marked {f} as synced.")
+                    else:
+                        failed.append(f)
+            else:
+                with profiling.stage('orders'):
+                    result = sync_orders(client, config, f, cache, sinks)
+                    if result and is_download(f):
+                        archive_file(f, config, collector.files.get(f))
+                    elif result is False:
+                        failed.append(f)
+    finally:
+        for sink in sinks:
+            sink.close()
+
+    journal.compact()
+
+    # Aggregation stage: refresh dashboard summaries for the days touched by this run
+    try:
+        with profiling.stage('summaries'):
+            aggregates.update_summaries(collector.batches, config, client)
+    except Exception as e:
+        print(f"Error updating summaries: {repr(e)}")
+    try:
+        with profiling.stage('customers'):
+            customers.update_customers(collector.batches['orders'], config)
+    except Exception as e:
+        print(f"Error updating customer table: {repr(e)}")
+    try:
+        with profiling.stage('baskets'):
+            basket.update_baskets(collector.batches['product_sales'], config)
+    except Exception as e:
+        print(f"Error updating basket counts: {repr(e)}")
+    try:
+        with profiling.stage('heatmaps'):
+            heatmap.update_heatmaps(collector.batches, config, client)
+    except Exception as e:
+        print(f"Error updating heatmaps: {repr(e)}")
+    return failed
+
+def is_download(file_path):
+    """Only files picked up from downloads/ are archived; explicitly passed history files stay put."""
+    return os.path.dirname(os.path.abspath(file_path)) == DOWNLOADS_DIR
 
 if __name__ == "__main__":
     main()
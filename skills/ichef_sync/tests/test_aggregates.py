@@ -0,0 +1,166 @@
+import pandas as pd
+import pytest
+
+import aggregates
+from aggregates import SummaryStore, publish_tabs, update_summaries
+
+
+class FakeWorksheet:
+    def __init__(self, title):
+        self.title = title
+        self.cells = []
+        self.calls = []
+
+    def row_values(self, row):
+        return [str(v) for v in self.cells[row - 1]] if len(self.cells) >= row else []
+
+    def col_values(self, col):
+        return [str(r[col - 1]) for r in self.cells]
+
+    def clear(self):
+        self.calls.append('clear')
+        self.cells = []
+
+    def update(self, values, range_name):
+        self.calls.append('update')
+        self.cells = [list(r) for r in values]
+
+    def batch_update(self, data):
+        self.calls.append('batch_update')
+        for part in data:
+            start = int(part['range'][1:]) - 1
+            self.cells[start:start + len(part['values'])] = [list(r) for r in part['values']]
+
+    def append_rows(self, values):
+        self.calls.append('append_rows')
+        self.cells.extend(list(r) for r in values)
+
+
+class FakeSpreadsheet:
+    def __init__(self):
+        self.tabs = {}
+
+    def worksheets(self):
+        return list(self.tabs.values())
+
+    def add_worksheet(self, title, rows, cols):
+        self.tabs[title] = FakeWorksheet(title)
+        return self.tabs[title]
+
+
+class FakeClient:
+    def __init__(self):
+        self.sheet = FakeSpreadsheet()
+
+    def open_by_key(self, key):
+        return self.sheet
+
+
+CONFIG = {'summaries': {'id': 'sheet', 'tab_prefix': 'Summary_', 'store': ':memory:'}}
+
+
+def orders(rows):
+    df = pd.DataFrame(rows, columns=['發票號碼', '結帳時間', '結帳金額', '訂單種類', '支付方式'])
+    df['結帳時間'] = pd.to_datetime(df['結帳時間'])
+    return df
+
+
+@pytest.fixture
+def store():
+    store = SummaryStore(':memory:')
+    yield store
+    store.close()
+
+
+def load(store, frame):
+    return store.replace(aggregates.order_facts(aggregates.latest_per_day([frame])), aggregates.ORDER_DIMENSIONS)
+
+
+def tab(client, name):
+    ws = client.sheet.tabs['Summary_' + name]
+    return pd.DataFrame(ws.cells[1:], columns=ws.cells[0])
+
+
+def test_business_day_starts_at_five():
+    ts = pd.Series(pd.to_datetime(['2026-02-01 04:59:00', '2026-02-01 05:00:00', None]))
+    days = aggregates.business_date(ts)
+    assert days[:2].tolist() == ['2026-01-31', '2026-02-01'] and pd.isna(days[2])
+
+
+def test_later_file_replaces_the_days_it_covers_completely():
+    first = orders([('A1', '2026-02-01 12:00', 100, '內用', '現金'), ('A2', '2026-02-02 12:00', 50, '內用', '現金'),
+                    ('A3', '2026-02-03 12:00', 30, '內用', '現金')])
+    second = orders([('A1', '2026-02-01 12:00', 120, '內用', '現金'), ('B2', '2026-02-02 13:00', 70, '外帶', '現金'),
+                     ('B3', '2026-02-03 13:00', 40, '外帶', '現金')])
+    df = aggregates.latest_per_day([first, second])
+    # 02-02 lies inside the second file; on its first and last day invoices are merged
+    assert sorted(df['發票號碼']) == ['A1', 'A3', 'B2', 'B3']
+    assert df.loc[df['發票號碼'] == 'A1', '結帳金額'].tolist() == [120]
+
+
+def test_exports_split_at_midnight_add_up_to_the_whole_business_day(tmp_path):
+    config = {'summaries': {'store': str(tmp_path / 'summaries.db')}}
+    # 01-26~01-31 ends at midnight; the night of 01-31 continues in 02-01~02-19
+    january = orders([('A1', '2026-01-30 19:00', 500, '內用', '現金'), ('A2', '2026-01-31 19:00', 300, '內用', '現金'),
+                      ('A3', '2026-01-31 23:30', 200, '內用', '現金')])
+    february = orders([('B1', '2026-02-01 00:01', 80, '內用', '現金'), ('B2', '2026-02-01 18:00', 60, '外帶', '現金'),
+                       ('B3', '2026-02-02 18:00', 90, '內用', '現金')])
+    update_summaries({'orders': [january], 'product_sales': []}, config)
+    update_summaries({'orders': [february], 'product_sales': []}, config)
+    # Re-syncing the February file does not count its invoices twice
+    update_summaries({'orders': [february], 'product_sales': []}, config)
+
+    store = SummaryStore(config['summaries']['store'])
+    totals = store.read().query("dimension == 'total'").set_index('date')
+    store.close()
+    assert totals['orders'].to_dict() == {'2026-01-30': 1, '2026-01-31': 3, '2026-02-01': 1, '2026-02-02': 1}
+    assert totals.loc['2026-01-31', 'revenue'] == 580
+
+
+def test_no_business_days_returns_early(monkeypatch):
+    monkeypatch.setattr(aggregates, 'SummaryStore', lambda path: SummaryStore(':memory:'))
+    empty = orders([('A1', None, 100, '內用', '現金')])
+    # Used to raise in min() on an empty set
+    assert update_summaries({'orders': [empty], 'product_sales': []}, CONFIG, FakeClient()) is None
+
+
+def test_publish_updates_only_touched_rows(store):
+    client = FakeClient()
+    load(store, orders([('A1', '2026-01-10 12:00', 100, '內用', '現金'),
+                        ('A2', '2026-02-01 12:00', 200, '內用', '現金'),
+                        ('A3', '2026-02-02 12:00', 300, '外帶', '現金')]))
+    publish_tabs(client, CONFIG, store)
+    assert set(client.sheet.tabs) == {'Summary_' + name for name in aggregates.TABS}
+    for ws in client.sheet.tabs.values():
+        ws.calls.clear()
+
+    # Re-synced day with the same keys: rows patched in place
+    touched = load(store, orders([('A4', '2026-02-02 12:30', 500, '外帶', '現金')]))
+    publish_tabs(client, CONFIG, store, touched)
+    daily = client.sheet.tabs['Summary_Daily']
+    assert daily.calls == ['batch_update']
+    assert tab(client, 'Daily')['revenue'].tolist() == [100.0, 200.0, 500.0]
+    assert tab(client, 'Monthly')['revenue'].tolist() == [100.0, 700.0]
+    assert all('clear' not in ws.calls for ws in client.sheet.tabs.values())
+
+    # A new month is appended after the existing rows
+    touched = load(store, orders([('A5', '2026-03-01 12:00', 80, '內用', '現金')]))
+    publish_tabs(client, CONFIG, store, touched)
+    assert tab(client, 'Daily')['date'].tolist() == ['2026-01-10', '2026-02-01', '2026-02-02', '2026-03-01']
+    assert tab(client, 'Monthly')['month'].tolist() == ['2026-01', '2026-02', '2026-03']
+
+
+def test_changed_row_count_rewrites_the_tab_from_all_facts(store):
+    client = FakeClient()
+    load(store, orders([('A1', '2026-01-10 12:00', 100, '內用', '現金'),
+                        ('A2', '2026-02-01 12:00', 200, '內用', '現金')]))
+    publish_tabs(client, CONFIG, store)
+
+    # February gains an order type: its rows no longer fit in place
+    touched = load(store, orders([('A2', '2026-02-01 12:00', 200, '內用', '現金'),
+                                  ('A3', '2026-02-01 12:30', 50, '外帶', '現金')]))
+    publish_tabs(client, CONFIG, store, touched)
+    order_type = tab(client, 'OrderType')
+    assert client.sheet.tabs['Summary_OrderType'].calls[-2:] == ['clear', 'update']
+    assert order_type[['month', 'order_type']].values.tolist() == [['2026-01', '內用'], ['2026-02', '內用'], ['2026-02', '外帶']]
+    assert client.sheet.tabs['Summary_Daily'].calls[-1] == 'batch_update'
@@ -0,0 +1,125 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import analyze
+from analyze import AnalysisCache
+
+
+def write_items(folder, name, amount=100):
+    df = pd.DataFrame({
+        '商品名稱': ['牛角貝', '啤酒'],
+        '發票號碼': ['AB1', 'AB1'],
+        '結帳時間': ['2026/02/02 12:00:00', '2026/02/02 12:00:00'],
+        '結帳金額': [amount, 80],
+    })
+    path = folder / name
+    df.to_excel(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Counts workbook reads and analysis runs."""
+    calls = {'read_excel': 0, 'compute': 0}
+    read_excel = pd.read_excel
+
+    def counting_read(*args, **kwargs):
+        calls['read_excel'] += 1
+        return read_excel(*args, **kwargs)
+
+    def compute(data, params):
+        calls['compute'] += 1
+        return {'rows': len(data['items'])}
+
+    monkeypatch.setattr(analyze.pd, 'read_excel', counting_read)
+    monkeypatch.setitem(analyze.ANALYSES, 'variety', (compute, lambda result, args: None, ['blackboard']))
+    return calls
+
+
+def run(tmp_path, *extra):
+    analyze.run(analyze.build_parser().parse_args(
+        ['variety', '--source', str(tmp_path / '*.xlsx'), '--cache', str(tmp_path / 'cache.db'), *extra]))
+
+
+def test_same_inputs_and_parameters_are_served_from_cache(tmp_path, counted):
+    write_items(tmp_path, '1_商品.xlsx')
+    run(tmp_path)
+    run(tmp_path)
+    assert counted == {'read_excel': 1, 'compute': 1}
+    # Other parameters: recomputed, but the export is not read again
+    run(tmp_path, '--blackboard', '黑')
+    assert counted == {'read_excel': 1, 'compute': 2}
+    run(tmp_path, '--refresh')
+    assert counted['compute'] == 3
+
+
+def test_new_export_is_the_only_one_read(tmp_path, counted):
+    write_items(tmp_path, '1_商品.xlsx')
+    run(tmp_path)
+    write_items(tmp_path, '2_商品.xlsx', amount=120)
+    run(tmp_path)
+    assert counted == {'read_excel': 2, 'compute': 2}
+
+
+def test_changed_file_is_rehashed_and_unchanged_one_is_not(tmp_path, monkeypatch):
+    path = write_items(tmp_path, '1_商品.xlsx')
+    cache = AnalysisCache(':memory:')
+    first = cache.digest(path)
+    monkeypatch.setattr(analyze.journal, 'file_id', lambda p: pytest.fail('re-hashed'))
+    assert cache.digest(path) == first
+    monkeypatch.undo()
+    write_items(tmp_path, '1_商品.xlsx', amount=999)
+    assert cache.digest(path) != first
+    cache.close()
+
+
+def test_cached_frame_keeps_compact_dtypes(tmp_path):
+    path = write_items(tmp_path, '1_商品.xlsx')
+    cache = AnalysisCache(':memory:')
+    digest = cache.digest(path)
+    cache.frame(path, digest)
+    kind, clean, head, rejected = cache.frame(path, digest)
+    assert kind == 'product_sales'
+    assert isinstance(clean['商品名稱'].dtype, pd.CategoricalDtype)
+    assert str(clean['結帳金額'].dtype) == 'Int64'
+    cache.close()
+
+
+def write_history(folder):
+    """Order and item history reports spanning 2024-2026, with Excel date cells like 訂單銷售列表.xlsx."""
+    stamps = [datetime(2024, 5, 1, 18, 4, 5), datetime(2025, 3, 18, 18, 24, 24), '2026-01-20 19:00:00']
+    pd.DataFrame({
+        '發票號碼': ['AB1', 'AB2', 'AB3', 'AB4'],
+        '結帳時間': stamps + ['not a time'],
+        '發票金額': [100, 200, 300, 400],
+        '訂單種類': ['內用', '外帶', '內用', '內用'],
+    }).to_excel(folder / '訂單銷售列表.xlsx', index=False)
+    pd.DataFrame({
+        '商品名稱': ['牛角貝', '啤酒', '牛角貝'],
+        '發票號碼': ['AB1', 'AB2', 'AB3'],
+        '結帳時間': stamps,
+        '結帳金額': [100, 200, 300],
+    }).to_excel(folder / '商品銷售報表.xlsx', index=False)
+
+
+def test_trends_cover_every_year_of_the_history_reports(tmp_path, capsys):
+    write_history(tmp_path)
+    analyze.main(['trends', '--source', str(tmp_path / '*.xlsx'), '--cache', str(tmp_path / 'cache.db'),
+                  '--from', '2024-01-01', '--to', '2026-12-31'])
+    out = capsys.readouterr().out
+    annual = out.split('--- A. Annual Performance Overview ---')[1].split('---')[0]
+    assert [line.split()[0] for line in annual.strip().splitlines()[2:]] == ['2024', '2025', '2026']
+    # The one bad row is reported, not silently dropped
+    assert 'Warning: 訂單銷售列表.xlsx' in out and 'bad timestamp 結帳時間: 1' in out
+
+
+def test_rejected_rows_are_reported_from_the_cache_too(tmp_path, capsys):
+    write_history(tmp_path)
+    cache = AnalysisCache(':memory:')
+    path = str(tmp_path / '訂單銷售列表.xlsx')
+    analyze.load_inputs(cache, [path], None, {'start': None, 'end': None})
+    analyze.load_inputs(cache, [path], None, {'start': None, 'end': None})
+    cache.close()
+    assert capsys.readouterr().out.count('Warning: 訂單銷售列表.xlsx') == 2
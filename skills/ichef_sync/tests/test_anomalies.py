@@ -0,0 +1,49 @@
+import pandas as pd
+
+from analyze_category_impact import scan_anomalies
+
+
+def sales(days, lines):
+    """Item lines for each day: lines(date) -> [(item, category, amount), ...]."""
+    rows = []
+    for date in pd.date_range('2026-01-05', periods=days).strftime('%Y-%m-%d'):
+        rows.extend((date, item, category, amount) for item, category, amount in lines(date))
+    return pd.DataFrame(rows, columns=['_date', 'CleanName', 'Category', '結帳金額'])
+
+
+def usual(date, items=10, drinks=3):
+    lines = [(f'item{i}', 'food', 100 + i) for i in range(items)]
+    return lines + [(f'drink{i}', 'drinks', 50) for i in range(drinks)]
+
+
+def scan(last_day_lines, days=35):
+    last = pd.Timestamp('2026-01-05') + pd.Timedelta(days=days - 1)
+    df = sales(days, lambda d: last_day_lines(d) if d == last.strftime('%Y-%m-%d') else usual(d))
+    scores = scan_anomalies(df, weeks=4)['scores']
+    return scores.set_index('date').loc[last.strftime('%Y-%m-%d')], scores
+
+
+def test_revenue_drop_is_flagged():
+    day, _ = scan(lambda d: usual(d)[:4])
+    assert day['flagged'] and 'revenue' in day['signals']
+
+
+def test_fewer_items_at_the_same_revenue_is_flagged_by_variety():
+    # Same revenue from half the items
+    day, _ = scan(lambda d: [(f'item{i}', 'food', 2 * (100 + i)) for i in range(5)] + usual(d)[10:])
+    assert abs(day['revenue_z']) < 1
+    assert day['flagged'] and day['signals'] == 'variety'
+
+
+def test_shifted_category_mix_is_flagged_by_mix():
+    # Same items, but drinks carry most of the revenue. The shift needs its own
+    # same-weekday history on top of the share baseline, hence the longer span.
+    day, _ = scan(lambda d: [(f'item{i}', 'food', 40) for i in range(10)] + [(f'drink{i}', 'drinks', 400) for i in range(3)],
+                  days=63)
+    assert day['flagged'] and 'mix' in day['signals']
+
+
+def test_days_are_ranked_by_the_largest_signal():
+    _, scores = scan(lambda d: usual(d)[:4])
+    assert scores['score'].dropna().is_monotonic_decreasing
+    assert not scores.loc[scores['score'] < 2, 'flagged'].any()
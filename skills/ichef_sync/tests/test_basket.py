@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+from aggregates import latest_per_day
+from basket import BasketStore, association_rules, item_summary, update_baskets
+
+
+def lines(rows):
+    """(invoice, time, item) rows -> validated-style item lines with _date."""
+    df = pd.DataFrame(rows, columns=['發票號碼', '結帳時間', '商品名稱'])
+    df['結帳時間'] = pd.to_datetime(df['結帳時間'])
+    df['結帳金額'] = 100
+    return latest_per_day([df])
+
+
+@pytest.fixture
+def store():
+    store = BasketStore(':memory:')
+    yield store
+    store.close()
+
+
+def pair(store, counts, a, b):
+    names = list(store.item_names())
+    return counts[names.index(a), names.index(b)]
+
+
+def test_pairs_count_invoices_not_units(store):
+    store.replace(lines([
+        ('A1', '2026-02-01 12:00', '牛角貝'), ('A1', '2026-02-01 12:00', '牛角貝'), ('A1', '2026-02-01 12:00', '啤酒'),
+        ('A2', '2026-02-01 13:00', '*牛角貝'), ('A2', '2026-02-01 13:00', '啤酒'),
+        ('A3', '2026-02-01 14:00', '啤酒'),
+    ]))
+    counts, invoices = store.counts()
+    assert invoices == 3
+    # '*牛角貝' (modified item) is the same item
+    assert pair(store, counts, '牛角貝', '牛角貝') == 2
+    assert pair(store, counts, '牛角貝', '啤酒') == pair(store, counts, '啤酒', '牛角貝') == 2
+    assert pair(store, counts, '啤酒', '啤酒') == 3
+
+
+def test_resynced_day_replaces_its_counts_and_ranges_add_up(store):
+    store.replace(lines([('A1', '2026-02-01 12:00', 'a'), ('A1', '2026-02-01 12:00', 'b'),
+                         ('B1', '2026-02-02 12:00', 'a'), ('B1', '2026-02-02 12:00', 'b')]))
+    store.replace(lines([('A9', '2026-02-01 18:00', 'a')]))
+    counts, invoices = store.counts()
+    assert invoices == 2 and pair(store, counts, 'a', 'b') == 1
+    counts, invoices = store.counts(start='2026-02-02', end='2026-02-02')
+    assert invoices == 1 and pair(store, counts, 'a', 'a') == 1
+
+
+def test_rules_have_support_confidence_and_lift(store):
+    rows = []
+    for i in range(10):
+        rows.append((f'X{i}', '2026-02-01 12:00', 'a'))
+        if i < 6:
+            rows.append((f'X{i}', '2026-02-01 12:00', 'b'))
+    store.replace(lines(rows))
+    counts, invoices = store.counts()
+    rules = association_rules(counts, invoices, store.item_names(), min_count=5).set_index(['antecedent', 'consequent'])
+    b_to_a = rules.loc[('b', 'a')]
+    assert b_to_a['together'] == 6
+    assert b_to_a['support'] == pytest.approx(0.6)
+    assert b_to_a['confidence'] == pytest.approx(1.0)
+    assert b_to_a['lift'] == pytest.approx(1.0)
+    assert rules.loc[('a', 'b'), 'confidence'] == pytest.approx(0.6)
+    assert association_rules(counts, invoices, store.item_names(), min_count=7).empty
+    summary = item_summary(counts, invoices, store.item_names())
+    assert summary['item'].tolist() == ['a', 'b']
+
+
+def test_exports_split_at_midnight_count_the_whole_business_day(tmp_path):
+    config = {'baskets': {'store': str(tmp_path / 'baskets.db')}}
+
+    def export(rows):
+        return lines(rows).drop(columns=['_date', '_file'])
+
+    january = export([('A1', '2026-01-31 19:00', 'a'), ('A1', '2026-01-31 19:00', 'b'),
+                      ('A2', '2026-01-31 23:00', 'a'), ('A2', '2026-01-31 23:00', 'b')])
+    # After midnight, still business day 01-31
+    february = export([('B1', '2026-02-01 01:00', 'a'), ('B1', '2026-02-01 01:00', 'c'),
+                       ('B2', '2026-02-01 18:00', 'a')])
+    update_baskets([january], config)
+    update_baskets([february], config)
+    update_baskets([february], config)
+
+    store = BasketStore(config['baskets']['store'])
+    counts, invoices = store.counts('2026-01-31', '2026-01-31')
+    assert invoices == 3
+    assert pair(store, counts, 'a', 'b') == 2 and pair(store, counts, 'a', 'c') == 1
+    assert store.counts('2026-02-01', '2026-02-01')[1] == 1
+    store.close()
@@ -0,0 +1,97 @@
+import os
+
+import pandas as pd
+import pytest
+
+import catalog
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, 'ARCHIVE_DIR', str(tmp_path))
+    monkeypatch.setattr(catalog, 'TWIN_DIR', str(tmp_path / 'parquet'))
+    return tmp_path
+
+
+def write_orders(folder, name, times):
+    df = pd.DataFrame({
+        '發票號碼': [f'AB{i:08d}' for i in range(len(times))],
+        '結帳時間': times,
+        '發票金額': [100] * len(times),
+        '訂單種類': ['內用'] * len(times),
+    })
+    path = folder / name
+    df.to_excel(path, index=False)
+    return str(path)
+
+
+def open_store(twins):
+    return catalog.ExportCatalog(':memory:', twins=twins)
+
+
+def test_scan_records_business_days_and_selects_by_range(archive):
+    write_orders(archive, '1_訂單_jan.xlsx', ['2026/01/10 12:00:00', '2026/01/11 03:00:00'])
+    write_orders(archive, '2_訂單_feb.xlsx', ['2026/02/01 12:00:00'])
+    store = open_store(twins=False)
+    assert store.scan() == (2, 0)
+    entries = store.entries().set_index('name')
+    # 03:00 belongs to the previous business day
+    assert entries.loc['1_訂單_jan.xlsx', ['kind', 'first_date', 'last_date']].tolist() == ['orders', '2026-01-10', '2026-01-10']
+    assert [os.path.basename(p) for p in store.files('orders', start='2026-01-15')] == ['2_訂單_feb.xlsx']
+    # Renamed columns give the same signature
+    assert entries['header_signature'].nunique() == 1
+    assert '結帳金額' in entries['columns'].iloc[0]
+
+
+def test_unchanged_files_are_not_reopened_and_deleted_ones_dropped(archive, monkeypatch):
+    write_orders(archive, '1_訂單.xlsx', ['2026/01/10 12:00:00'])
+    second = write_orders(archive, '2_訂單.xlsx', ['2026/01/11 12:00:00'])
+    store = open_store(twins=False)
+    store.scan()
+    os.remove(second)
+    monkeypatch.setattr(catalog.pd, 'read_excel', lambda path: pytest.fail('workbook reopened'))
+    assert store.scan() == (0, 1)
+    assert store.entries()['name'].tolist() == ['1_訂單.xlsx']
+
+
+def test_twin_is_loaded_instead_of_the_workbook(archive, monkeypatch):
+    pytest.importorskip('pyarrow')
+    path = write_orders(archive, '1_訂單.xlsx', ['2026/01/10 12:00:00', '2026/01/10 13:00:00'])
+    entry = open_store(twins=True).record(path)
+    assert entry['twin'] == os.path.join('parquet', '1_訂單.xlsx.parquet')
+    from_workbook = catalog.load(path)
+
+    monkeypatch.setattr(catalog.pd, 'read_excel', lambda path: pytest.fail('workbook read'))
+    from_twin = catalog.load(path)
+    pd.testing.assert_frame_equal(from_twin, from_workbook.reset_index(drop=True), check_dtype=False)
+    assert isinstance(from_twin['訂單種類'].dtype, pd.CategoricalDtype)
+
+
+def test_without_pyarrow_no_twin_is_written_or_read(archive, monkeypatch):
+    path = write_orders(archive, '1_訂單.xlsx', ['2026/01/10 12:00:00'])
+    if catalog.parquet_available():
+        open_store(twins=True).record(path)
+    monkeypatch.setattr(catalog, 'parquet_available', lambda: False)
+    assert open_store(twins=True).record(path)['twin'] is None
+    # An earlier twin is ignored rather than failing the load
+    monkeypatch.setattr(catalog.pd, 'read_parquet', lambda path: pytest.fail('twin read'))
+    assert len(catalog.load(path)) == 1
+
+
+@pytest.mark.parametrize('columns, kind', [
+    (['商品名稱', '發票號碼', '結帳時間', '結帳金額'], 'product_sales'),
+    (['發票號碼', '結帳時間', '發票金額'], 'orders'),
+    # The product master has 商品名稱 but no sales columns
+    (['商品名稱', '新商品名稱', '大分類', '小分類'], None),
+    (['商品名稱', '數量'], None),
+])
+def test_export_kind_needs_the_sales_columns(columns, kind):
+    assert catalog.export_kind(columns) == kind
+
+
+def test_product_master_is_not_cataloged_as_sales(archive):
+    pd.DataFrame({'商品名稱': ['牛角貝'], '大分類': ['1壽司刺身']}).to_excel(archive / '商品主檔.xlsx', index=False)
+    store = open_store(twins=False)
+    store.scan()
+    assert store.entries()['kind'].tolist() == [None]
+    assert store.files('product_sales') == []
@@ -0,0 +1,89 @@
+import pandas as pd
+
+from customers import CustomerStore, customer_days, rfm_scores, update_customers
+
+
+def orders(rows):
+    df = pd.DataFrame(rows, columns=['發票號碼', '結帳時間', '結帳金額', '顧客電話', '顧客姓名', '訂購人電話', '訂購人'])
+    df['結帳時間'] = pd.to_datetime(df['結帳時間'])
+    df['_date'] = df['結帳時間'].dt.strftime('%Y-%m-%d')
+    return df
+
+
+def test_equal_frequency_gets_equal_f_score():
+    customers = pd.DataFrame({
+        'phone': [f'9{i:08d}' for i in range(10)],
+        'last_visit': ['2026-02-01'] * 10,
+        'frequency': [1, 1, 1, 1, 1, 1, 1, 2, 5, 9],
+        'monetary': [100] * 10,
+    })
+    scored = rfm_scores(customers, '2026-02-28')
+    one_visit = scored[scored['frequency'] == 1]
+    assert one_visit['f_score'].nunique() == 1
+    assert one_visit['f_score'].iloc[0] == 1
+    assert scored.loc[scored['frequency'] == 9, 'f_score'].iloc[0] == 5
+    # Same recency and monetary for everyone: one score each
+    assert scored['r_score'].nunique() == 1 and scored['m_score'].nunique() == 1
+
+
+def test_scores_do_not_depend_on_row_order():
+    customers = pd.DataFrame({
+        'phone': list('abcdefgh'),
+        'last_visit': ['2026-02-01', '2026-02-20', '2026-02-01', '2026-01-05'] * 2,
+        'frequency': [1, 3, 1, 2, 1, 1, 4, 2],
+        'monetary': [300, 900, 300, 500, 100, 100, 1200, 500],
+    })
+    forward = rfm_scores(customers, '2026-02-28').set_index('phone')
+    backward = rfm_scores(customers.iloc[::-1], '2026-02-28').set_index('phone').loc[forward.index]
+    pd.testing.assert_frame_equal(forward, backward)
+
+
+def test_orderer_phone_is_used_when_customer_phone_is_empty():
+    df = orders([
+        ('A1', '2026-02-01 12:00:00', 300, '912345678', '王先生', pd.NA, pd.NA),
+        ('A2', '2026-02-01 13:00:00', 200, pd.NA, pd.NA, '987654321', '林小姐'),
+        ('A3', '2026-02-01 14:00:00', 100, '--', pd.NA, pd.NA, pd.NA),
+    ])
+    days = customer_days(df).set_index('phone')
+    assert sorted(days.index) == ['912345678', '987654321']
+    assert days.loc['987654321', 'name'] == '林小姐'
+    assert days.loc['987654321', 'revenue'] == 200
+
+
+def test_resynced_day_replaces_its_rows():
+    store = CustomerStore(':memory:')
+    first = customer_days(orders([
+        ('A1', '2026-02-01 12:00:00', 300, '912345678', '王先生', pd.NA, pd.NA),
+        ('A2', '2026-02-01 13:00:00', 200, '912345678', '王先生', pd.NA, pd.NA),
+    ]))
+    store.replace(first, ['2026-02-01'])
+    again = customer_days(orders([('A1', '2026-02-01 12:00:00', 300, '912345678', '王先生', pd.NA, pd.NA)]))
+    store.replace(again, ['2026-02-01'])
+    store.rescore()
+    top = store.top(5)
+    store.close()
+    assert top[['frequency', 'monetary']].values.tolist() == [[1, 300]]
+
+
+def test_exports_split_at_midnight_keep_the_whole_business_day(tmp_path):
+    config = {'customers': {'store': str(tmp_path / 'customers.db')}}
+    # The night of 01-31 ends in the 02-01~02-19 export
+    january = orders([
+        ('A1', '2026-01-30 19:00:00', 500, '912345678', '王先生', pd.NA, pd.NA),
+        ('A2', '2026-01-31 19:00:00', 300, '912345678', '王先生', pd.NA, pd.NA),
+    ])
+    february = orders([
+        ('B1', '2026-02-01 00:30:00', 80, '912345678', '王先生', pd.NA, pd.NA),
+        ('B2', '2026-02-01 18:00:00', 60, '987654321', pd.NA, pd.NA, pd.NA),
+        ('B3', '2026-02-02 18:00:00', 90, '987654321', pd.NA, pd.NA, pd.NA),
+    ])
+    update_customers([january.drop(columns='_date')], config)
+    update_customers([february.drop(columns='_date')], config)
+    update_customers([february.drop(columns='_date')], config)
+
+    store = CustomerStore(config['customers']['store'])
+    customers = store.top(5).set_index('phone')
+    store.close()
+    assert customers.loc['912345678', ['frequency', 'monetary']].tolist() == [3, 880]
+    assert customers.loc['912345678', 'last_visit'] == '2026-01-31'
+    assert customers.loc['987654321', ['frequency', 'monetary']].tolist() == [2, 150]
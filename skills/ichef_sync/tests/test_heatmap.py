@@ -0,0 +1,87 @@
+import pandas as pd
+import pytest
+
+from aggregates import latest_per_day
+from heatmap import HeatmapStore, business_minutes, item_slots, order_slots, update_heatmaps
+
+
+def orders(rows):
+    df = pd.DataFrame(rows, columns=['發票號碼', '結帳時間', '結帳金額', '訂單種類'])
+    df['結帳時間'] = pd.to_datetime(df['結帳時間'])
+    return latest_per_day([df])
+
+
+@pytest.fixture
+def store():
+    store = HeatmapStore(':memory:')
+    yield store
+    store.close()
+
+
+def test_business_minutes_run_past_midnight():
+    ts = pd.Series(pd.to_datetime(['2026-02-02 05:00', '2026-02-02 23:59', '2026-02-03 01:30']))
+    assert business_minutes(ts).tolist() == [0, 18 * 60 + 59, 20 * 60 + 30]
+
+
+def test_slots_sum_to_coarser_slots_and_nights_stay_on_their_day(store):
+    # 2026-02-02 is a Monday; 01:30 on the 3rd is still Monday's business day
+    store.replace('orders', order_slots(orders([
+        ('A1', '2026-02-02 12:05', 100, '內用'),
+        ('A2', '2026-02-02 12:20', 200, '外帶'),
+        ('A3', '2026-02-02 12:50', 300, '內用'),
+        ('A4', '2026-02-03 01:30', 400, '內用'),
+    ])))
+    quarter = store.heatmap(slot_minutes=15, average=False)
+    hourly = store.heatmap(slot_minutes=60, average=False)
+    assert quarter.loc['12:00', '一'] == 1 and quarter.loc['12:15', '一'] == 1
+    assert hourly.loc['12:00', '一'] == 3
+    assert hourly.loc['01:00', '一'] == 1 and hourly['二'].sum() == 0
+    assert store.heatmap(measure='revenue', average=False).loc['12:00', '一'] == 600
+    assert store.heatmap(dimension='order_type', key='外帶', average=False).loc['12:00', '一'] == 1
+    assert store.keys('orders', 'order_type') == ['內用', '外帶']
+
+
+def test_average_divides_by_open_days_of_that_weekday(store):
+    store.replace('orders', order_slots(orders([
+        ('A1', '2026-02-02 12:00', 100, '外帶'),
+        ('B1', '2026-02-09 12:00', 100, '內用'),
+        ('B2', '2026-02-09 12:30', 100, '內用'),
+    ])))
+    assert store.heatmap().loc['12:00', '一'] == pytest.approx(1.5)
+    # Takeout sold on one of the two Mondays: still averaged over both
+    assert store.heatmap(dimension='order_type', key='外帶').loc['12:00', '一'] == pytest.approx(0.5)
+
+
+def test_resynced_day_replaces_its_histograms(store):
+    store.replace('orders', order_slots(orders([('A1', '2026-02-02 12:00', 100, '內用'), ('A2', '2026-02-02 13:00', 100, '內用')])))
+    store.replace('orders', order_slots(orders([('A3', '2026-02-02 18:00', 100, '內用')])))
+    grid = store.heatmap(average=False)
+    assert grid['一'].sum() == 1 and grid.loc['18:00', '一'] == 1
+
+
+def test_item_lines_are_binned_per_category(store):
+    lines = orders([('A1', '2026-02-02 12:00', 100, '內用'), ('A1', '2026-02-02 12:00', 50, '內用')])
+    lines['商品名稱'] = ['*牛角貝', '啤酒']
+    store.replace('items', item_slots(lines, {'牛角貝': '2黑板料理'}))
+    assert store.keys('items', 'category') == ['2黑板料理', '未分類']
+    assert store.heatmap('items', 'category', '2黑板料理', average=False).loc['12:00', '一'] == 1
+
+
+def test_exports_split_at_midnight_bin_the_whole_business_day(tmp_path):
+    config = {'heatmaps': {'store': str(tmp_path / 'heatmaps.db')}}
+
+    def export(rows):
+        return orders(rows).drop(columns=['_date', '_file'])
+
+    # 2026-01-31 is a Saturday; its night runs on in the 02-01~02-19 export
+    january = export([('A1', '2026-01-31 19:10', 100, '內用'), ('A2', '2026-01-31 20:10', 100, '內用')])
+    february = export([('B1', '2026-02-01 01:10', 100, '內用'), ('B2', '2026-02-01 19:10', 100, '外帶')])
+    update_heatmaps({'orders': [january], 'product_sales': []}, config)
+    update_heatmaps({'orders': [february], 'product_sales': []}, config)
+    update_heatmaps({'orders': [february], 'product_sales': []}, config)
+
+    store = HeatmapStore(config['heatmaps']['store'])
+    grid = store.heatmap(average=False)
+    store.close()
+    assert grid.loc[['19:00', '20:00', '01:00'], '六'].tolist() == [1, 1, 1]
+    assert grid['日'].sum() == 1
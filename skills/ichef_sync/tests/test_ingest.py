@@ -0,0 +1,113 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import ingest
+import sync_service
+from ingest import concat_frames, to_sheet_frame, validate
+
+
+def orders(**extra):
+    rows = {
+        '發票號碼': ['AB00000001', 'AB00000002', 'AB00000003', 'AB00000004'],
+        '結帳時間': ['2026/02/01 12:00:00', '2026/02/01 12:05:00', 'yesterday', '2026/02/01 12:20:00'],
+        '結帳金額': [100, '1,200', 50, 80],
+        '目前概況': ['已結帳', '已結帳', '已結帳', '已作廢'],
+        '顧客電話': ['0912345678', None, None, None],
+    }
+    rows.update(extra)
+    return pd.DataFrame(rows)
+
+
+def test_bad_rows_are_rejected_with_a_reason_and_voided_rows_dropped():
+    clean, rejected, voided = validate(orders(), 'orders')
+    assert voided == 1
+    assert clean['發票號碼'].tolist() == ['AB00000001', 'AB00000002']
+    assert rejected['_reject_reason'].tolist() == ['bad timestamp 結帳時間']
+    assert clean['結帳金額'].tolist() == [100, 1200]
+    assert str(clean['結帳金額'].dtype) == 'Int64'
+    assert clean['顧客電話'].iloc[0] == '912345678'
+
+
+def test_datetime_cells_and_iso_text_are_accepted():
+    # History reports hand back most timestamps as Excel date cells, some as ISO text
+    stamps = [datetime(2024, 5, 1, 18, 4, 5), '2025-03-18 18:24:24', '2026/02/01 12:00:00', 'yesterday']
+    clean, rejected, _ = validate(orders(結帳時間=stamps, 目前概況=['已結帳'] * 4), 'orders')
+    assert clean['結帳時間'].tolist() == [pd.Timestamp('2024-05-01 18:04:05'), pd.Timestamp('2025-03-18 18:24:24'),
+                                       pd.Timestamp('2026-02-01 12:00:00')]
+    assert rejected['_reject_reason'].tolist() == ['bad timestamp 結帳時間']
+
+
+def test_missing_required_column_rejects_every_row():
+    clean, rejected, _ = validate(orders().drop(columns=['結帳金額']), 'orders')
+    assert clean.empty
+    assert rejected['_reject_reason'].str.startswith('missing column 結帳金額').all()
+
+
+def test_quarantine_writes_rejected_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, 'QUARANTINE_DIR', str(tmp_path))
+    clean = ingest.ingest(orders(), 'orders', '/somewhere/訂單.xlsx')
+    assert len(clean) == 2
+    [written] = os.listdir(tmp_path)
+    assert written.endswith('_訂單.csv')
+    quarantined = pd.read_csv(tmp_path / written, encoding='utf-8-sig')
+    assert quarantined['發票號碼'].tolist() == ['AB00000003']
+
+
+def test_sheet_frame_keeps_original_text_of_untyped_columns():
+    df = orders(桌號=[' 3', '--', 'A1', None], 訂單備註=['--', 2.0, None, 'x'])
+    clean, _, _ = validate(df, 'orders')
+    out = to_sheet_frame(clean)
+    assert out['桌號'].tolist() == [' 3', '--']
+    assert out['訂單備註'].tolist() == ['--', '2.0']
+    assert out['結帳時間'].tolist() == ['2026/02/01 12:00:00', '2026/02/01 12:05:00']
+    assert out['結帳金額'].tolist() == ['100', '1200']
+    # Fractional amounts keep their decimals
+    clean, _, _ = validate(orders(結帳金額=[499.5, 100, 1, 1]), 'orders')
+    assert to_sheet_frame(clean)['結帳金額'].tolist() == ['499.5', '100']
+
+
+def test_concat_keeps_categoricals():
+    first, _, _ = validate(orders(訂單種類=['內用'] * 4), 'orders')
+    second, _, _ = validate(orders(訂單種類=['外帶'] * 4), 'orders')
+    both = concat_frames([first, second])
+    assert isinstance(both['訂單種類'].dtype, pd.CategoricalDtype)
+    assert both['訂單種類'].tolist() == ['內用', '內用', '外帶', '外帶']
+
+
+class RecordingSink:
+    name = 'sheets'
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, target, file_path, df):
+        self.written.append((target, df))
+
+
+class MasterSheet:
+    def __init__(self):
+        self.appended = []
+
+    def append_rows(self, rows):
+        self.appended.extend(rows)
+
+
+def test_only_validated_items_are_added_to_the_product_master(monkeypatch):
+    items = pd.DataFrame({
+        '商品名稱': ['牛角貝', '新品', '作廢品', '壞資料'],
+        '發票號碼': ['AB1', 'AB1', 'AB2', 'AB3'],
+        '結帳時間': ['2026/02/01 12:00:00', '2026/02/01 12:00:00', '2026/02/01 12:05:00', 'bad'],
+        '結帳金額': [100, 50, 70, 10],
+        '目前概況': ['已結帳', '已結帳', '已作廢', '已結帳'],
+    })
+    monkeypatch.setattr(sync_service.pd, 'read_excel', lambda path: items)
+    monkeypatch.setattr(ingest, 'quarantine', lambda rejected, path: None)
+    master = MasterSheet()
+    cache = {'product_master': (master, {'牛角貝'})}
+    config = sync_service.load_config()
+
+    assert sync_service.sync_products(None, config, '商品.xlsx', cache, [RecordingSink()])
+    assert [row[0] for row in master.appended] == ['新品']
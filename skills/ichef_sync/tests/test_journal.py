@@ -0,0 +1,123 @@
+import pytest
+
+import journal
+import sync_service
+
+
+class FakeWorksheet:
+    """Rows of a sheet, appended the way Sheets does: after the last row."""
+
+    def __init__(self, rows):
+        self.rows = [list(r) for r in rows]
+        self.appends = 0
+
+    def append_rows(self, rows):
+        self.appends += 1
+        start = len(self.rows) + 1
+        self.rows.extend(list(r) for r in rows)
+        return {'updates': {'updatedRange': f"'Orders'!A{start}:C{len(self.rows)}"}}
+
+    def get(self, a1):
+        first, last = (int(n) for n in a1.split(':'))
+        return self.rows[first - 1:last]
+
+
+@pytest.fixture(autouse=True)
+def journal_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, 'JOURNAL_PATH', str(tmp_path / 'sync_journal.jsonl'))
+    monkeypatch.setattr(journal, 'CHUNK_SIZE', 2)
+
+
+def rows(n, tag='r'):
+    return [[f'{tag}{i}', str(i), ''] for i in range(n)]
+
+
+def plan(tmp_path, sheet_rows, start_row):
+    export = tmp_path / 'orders.xlsx'
+    export.write_bytes(b'export')
+    fid = journal.file_id(str(export))
+    return fid, journal.plan(fid, str(export), 'orders', start_row, sheet_rows)
+
+
+def test_commit_records_range_sheets_returned(tmp_path):
+    ws = FakeWorksheet([['h1', 'h2', 'h3']])
+    fid, batches = plan(tmp_path, rows(3), 2)
+    for batch in batches:
+        sync_service.commit_batch(ws, batch, batch['rows'])
+    stored = journal.file_batches(fid, 'orders')
+    assert [b['updated_range'] for b in stored] == ["'Orders'!A2:C3", "'Orders'!A4:C4"]
+    assert all(b['rows'] == [] for b in stored)
+    assert journal.file_status(fid, 'orders') == journal.COMMITTED
+
+
+def test_resume_appends_only_what_did_not_land(tmp_path):
+    ws = FakeWorksheet([['h1', 'h2', 'h3']])
+    fid, batches = plan(tmp_path, rows(5), 2)
+    sync_service.commit_batch(ws, batches[0], batches[0]['rows'])
+    # Crash after the second chunk was sent but before it was marked
+    ws.append_rows(batches[1]['rows'])
+    ws.appends = 0
+
+    assert sync_service.resume_journal(ws, fid, 'orders')
+    assert ws.appends == 1
+    assert ws.rows[1:] == rows(5)
+    assert journal.file_status(fid, 'orders') == journal.COMMITTED
+
+
+def test_resume_follows_recorded_range_not_plan(tmp_path):
+    ws = FakeWorksheet([['h1', 'h2', 'h3']])
+    fid, batches = plan(tmp_path, rows(4), 2)
+    # Someone appended a row between planning and sending
+    ws.append_rows([['other', '0', '']])
+    sync_service.commit_batch(ws, batches[0], batches[0]['rows'])
+    assert journal.range_rows(batches[0]['updated_range']) == (3, 4)
+    ws.append_rows(batches[1]['rows'])
+    ws.appends = 0
+
+    # The plan says rows 4-5 (the first chunk's tail), the sheet says 5-6
+    assert journal.landing_range(batches[1], journal.file_batches(fid, 'orders')) == (5, 6)
+    sync_service.resume_journal(ws, fid, 'orders')
+    assert ws.appends == 0
+    assert journal.file_status(fid, 'orders') == journal.COMMITTED
+
+
+def test_resume_fails_on_foreign_rows(tmp_path):
+    ws = FakeWorksheet([['h1', 'h2', 'h3']])
+    fid, batches = plan(tmp_path, rows(2), 2)
+    ws.append_rows([['other', '0', ''], ['other', '1', '']])
+    ws.appends = 0
+
+    with pytest.raises(journal.JournalMismatch):
+        sync_service.resume_journal(ws, fid, 'orders')
+    assert ws.appends == 0
+    assert journal.file_status(fid, 'orders') == journal.PLANNED
+
+
+def test_resume_fails_on_partly_landed_batch(tmp_path):
+    ws = FakeWorksheet([['h1', 'h2', 'h3']])
+    fid, batches = plan(tmp_path, rows(2), 2)
+    ws.append_rows(batches[0]['rows'][:1])
+
+    with pytest.raises(journal.JournalMismatch):
+        sync_service.resume_journal(ws, fid, 'orders')
+
+
+def test_trailing_empty_cells_do_not_change_row_hash():
+    assert journal.row_hash(['a', '1', '']) == journal.row_hash(['a', '1'])
+    assert journal.row_hash(['a', '', '1']) != journal.row_hash(['a', '1'])
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    fid, batches = plan(tmp_path, rows(2), 2)
+    with open(journal.JOURNAL_PATH, 'a', encoding='utf-8') as f:
+        f.write('{"batch_id": "' + batches[0]['batch_id'] + '", "sta')
+    assert journal.file_status(fid, 'orders') == journal.PLANNED
+
+
+def test_compact_drops_archived_batches(tmp_path):
+    ws = FakeWorksheet([['h1', 'h2', 'h3']])
+    fid, batches = plan(tmp_path, rows(2), 2)
+    sync_service.commit_batch(ws, batches[0], batches[0]['rows'])
+    journal.mark_archived(fid)
+    journal.compact()
+    assert journal.load() == {}
@@ -0,0 +1,43 @@
+import json
+import os
+import sys
+
+import pytest
+
+# profiling.py is shared with the other skills
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '..', 'shared'))
+import profiling
+
+
+def test_stages_are_a_no_op_without_profiling():
+    with profiling.stage('orders'):
+        pass
+    assert profiling.stop() is None
+
+
+def test_profiled_run_writes_stage_numbers(tmp_path):
+    with profiling.profiled('sync_service', directory=str(tmp_path)):
+        for _ in range(2):
+            with profiling.stage('orders'):
+                data = [str(i) for i in range(50000)]
+        with profiling.stage('summaries'):
+            del data
+    [run] = os.listdir(tmp_path)
+    assert run.startswith('sync_service_')
+    files = set(os.listdir(tmp_path / run))
+    assert {'profile.pstats', 'stages.json', 'summary.txt'} <= files
+    with open(tmp_path / run / 'stages.json', encoding='utf-8') as f:
+        stages = json.load(f)['stages']
+    assert list(stages) == ['orders', 'summaries']
+    assert stages['orders']['calls'] == 2
+    assert stages['orders']['python_peak_mb'] > 0
+
+
+def test_results_are_written_when_the_run_fails(tmp_path):
+    with pytest.raises(RuntimeError):
+        with profiling.profiled('analyze_trends', directory=str(tmp_path)):
+            with profiling.stage('load'):
+                raise RuntimeError('bad export')
+    [run] = os.listdir(tmp_path)
+    assert os.path.exists(tmp_path / run / 'summary.txt')
+    assert profiling.stop() is None
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pandas as pd
+
+import aggregates
+import sync_service
+from ingest import validate
+from sync_service import SqlSink
+
+
+def items(amounts):
+    df = pd.DataFrame({
+        '商品名稱': ['牛角貝', '牛角貝', '啤酒'],
+        '發票號碼': ['AB1', 'AB1', 'AB2'],
+        '結帳時間': ['2026/02/01 12:00:00', '2026/02/01 12:00:00', '2026/02/01 12:05:00'],
+        '結帳金額': amounts,
+        '桌號': ['--', '3', None],
+    })
+    return validate(df, 'product_sales')[0]
+
+
+def test_reloading_a_file_updates_rows_instead_of_duplicating():
+    sink = SqlSink('sqlite:///:memory:')
+    sink.write('product_sales', 'a.xlsx', items([100, 100, 80]))
+    sink.write('product_sales', 'a.xlsx', items([120, 100, 80]))
+    rows = sink.conn.execute(
+        "SELECT invoice_number, line_no, invoice_amount, table_number, checkout_time FROM product_sales ORDER BY invoice_number, line_no"
+    ).fetchall()
+    # Same item twice on one invoice: two lines, told apart by line_no
+    assert rows == [('AB1', 0, 120, None, '2026-02-01 12:00:00'),
+                    ('AB1', 1, 100, '3', '2026-02-01 12:00:00'),
+                    ('AB2', 0, 80, None, '2026-02-01 12:05:00')]
+    sink.close()
+
+
+def test_orders_are_keyed_on_invoice_and_time():
+    sink = SqlSink('sqlite:///:memory:')
+    orders = validate(pd.DataFrame({
+        '發票號碼': ['AB1', 'AB1'],
+        '結帳時間': ['2026/02/01 12:00:00', '2026/02/01 12:00:00'],
+        '結帳金額': [100, 150],
+        '顧客電話': ['0912345678', '0912345678'],
+    }), 'orders')[0]
+    sink.write('orders', 'o.xlsx', orders)
+    assert sink.conn.execute("SELECT invoice_amount, customer_phone FROM orders").fetchall() == [(150, '912345678')]
+    assert sink.write('reward_cards', 'r.csv', orders) is False
+    sink.close()
+
+
+def test_sql_only_config_loads_orders_without_an_orders_sheet(tmp_path):
+    path = tmp_path / 'history.xlsx'
+    pd.DataFrame({
+        '發票號碼': ['AB1', 'AB2'],
+        # History reports hold Excel date cells
+        '結帳時間': [datetime(2024, 5, 1, 18, 4, 5), datetime(2025, 3, 18, 18, 24, 24)],
+        '結帳金額': [100, 150],
+    }).to_excel(path, index=False)
+    config = {'sheets': {'orders': {'id': sync_service.UNCONFIGURED_ORDER_SHEET}}}
+    sink = SqlSink('sqlite:///:memory:')
+
+    assert sync_service.sync_orders(None, config, str(path), sinks=[sink]) is True
+    assert sink.conn.execute("SELECT invoice_number, checkout_time FROM orders ORDER BY 1").fetchall() == [
+        ('AB1', '2024-05-01 18:04:05'), ('AB2', '2025-03-18 18:24:24')]
+    sink.close()
+
+
+def test_orders_are_skipped_when_no_sink_can_take_them(tmp_path):
+    config = {'sheets': {'orders': {'id': sync_service.UNCONFIGURED_ORDER_SHEET}}}
+    sinks = [sync_service.SheetsSink(None, config), aggregates.BatchCollector()]
+    assert sync_service.sync_orders(None, config, str(tmp_path / 'o.xlsx'), sinks=sinks) is None
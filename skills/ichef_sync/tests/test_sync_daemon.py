@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+import sync_daemon
+
+
+@pytest.fixture
+def exports(tmp_path):
+    paths = []
+    for name in ('商品銷售報表.xlsx', '訂單銷售列表.xlsx'):
+        path = tmp_path / name
+        path.write_bytes(b'export')
+        paths.append(str(path))
+    return paths
+
+
+def test_failed_files_are_retried_once_on_a_new_client(exports, monkeypatch):
+    calls = []
+
+    def sync_files(client, config, prod_files, order_files, cache=None):
+        calls.append((client, prod_files, order_files))
+        # The old session fails the order file only
+        return list(order_files) if client == 'expired' else []
+
+    monkeypatch.setattr(sync_daemon, 'sync_files', sync_files)
+    monkeypatch.setattr(sync_daemon, 'get_google_client', lambda path: 'fresh')
+    state = {'client': 'expired', 'cache': {'orders': 'stale'}, 'cache_loaded_at': 0}
+
+    failed = sync_daemon.run_batch(state, {'google_credentials_path': ''}, exports)
+    assert failed == []
+    assert state['client'] == 'fresh' and state['cache'] == {}
+    assert calls[1] == ('fresh', [], [exports[1]])
+
+
+def test_still_failing_files_are_returned(exports, monkeypatch):
+    monkeypatch.setattr(sync_daemon, 'sync_files', lambda client, config, p, o, cache=None: list(o))
+    monkeypatch.setattr(sync_daemon, 'get_google_client', lambda path: 'fresh')
+    state = {'client': 'c', 'cache': {}, 'cache_loaded_at': 0}
+    assert sync_daemon.run_batch(state, {'google_credentials_path': ''}, exports) == [exports[1]]
+
+
+def test_requeue_backs_off_then_gives_up(exports, monkeypatch):
+    pending, retries = {}, {}
+    lock = sync_daemon.threading.Lock()
+    now = 1000.0
+    monkeypatch.setattr(sync_daemon.time, 'time', lambda: now)
+
+    sync_daemon.requeue(pending, lock, [exports[0]], retries)
+    assert pending[exports[0]]['retry_at'] == now + sync_daemon.RETRY_BASE_SECONDS
+    # Not ready before its retry time, even though the folder is quiet
+    now += sync_daemon.COALESCE_SECONDS
+    assert sync_daemon.take_batch(pending, lock) == []
+    now += sync_daemon.RETRY_BASE_SECONDS
+    assert sync_daemon.take_batch(pending, lock) == [exports[0]]
+
+    sync_daemon.requeue(pending, lock, [exports[0]], retries)
+    assert pending[exports[0]]['retry_at'] == now + 2 * sync_daemon.RETRY_BASE_SECONDS
+    for _ in range(sync_daemon.MAX_RETRIES - 2):
+        sync_daemon.requeue(pending, lock, [exports[0]], retries)
+    pending.clear()
+    sync_daemon.requeue(pending, lock, [exports[0]], retries)
+    assert pending == {} and retries == {}
+
+
+def test_retry_does_not_hold_back_other_files(exports, monkeypatch):
+    pending, retries = {}, {}
+    lock = sync_daemon.threading.Lock()
+    now = 1000.0
+    monkeypatch.setattr(sync_daemon.time, 'time', lambda: now)
+    sync_daemon.requeue(pending, lock, [exports[0]], retries)
+    st = os.stat(exports[1])
+    pending[exports[1]] = {'stat': (st.st_size, st.st_mtime), 'changed_at': now, 'closed': True}
+    now += sync_daemon.COALESCE_SECONDS
+    assert sync_daemon.take_batch(pending, lock) == [exports[1]]
+    assert exports[0] in pending
@@ -0,0 +1,31 @@
+import pandas as pd
+
+import analyze_variety_vs_revenue
+from ingest import validate
+
+
+def items(rows):
+    df = pd.DataFrame(rows, columns=['商品名稱', '發票號碼', '結帳時間', '發票金額', '目前概況'])
+    return validate(df, 'product_sales')[0]
+
+
+def test_reads_validated_frames_from_the_catalog(monkeypatch, capsys):
+    january = items([
+        ('牛角貝', 'A1', '2026/01/31 19:00:00', 100, '已開立'),
+        ('啤酒', 'A1', '2026/01/31 19:00:00', 80, '已開立'),
+        ('啤酒', 'A2', '2026/01/31 20:00:00', 999, '已作廢'),
+    ])
+    # The night of 01-31 continues in the next export
+    february = items([
+        ('牛角貝', 'B1', '2026/02/01 01:00:00', 100, '已開立'),
+        ('虎蝦', 'B2', '2026/02/01 19:00:00', 300, '已開立'),
+    ])
+    requested = []
+    monkeypatch.setattr(analyze_variety_vs_revenue.catalog, 'load_frames',
+                        lambda kind: requested.append(kind) or [january, february])
+    analyze_variety_vs_revenue.analyze()
+    out = capsys.readouterr().out
+    assert requested == ['product_sales']
+    daily = out.split('--- Daily Analysis Results ---')[1].split('---')[0].split()
+    # Date, Revenue, UniqueItems, TotalItemsSold per business day; the voided line is left out
+    assert daily[4:] == ['2026-01-31', '280', '2', '3', '2026-02-01', '300', '1', '1']
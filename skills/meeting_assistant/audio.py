@@ -0,0 +1,321 @@
+import os
+import re
+import json
+import math
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Above this bitrate an existing audio track is re-encoded rather than reused (speech needs far less)
+MAX_SPEECH_BITRATE = 64000
+
+# Default: mono 16 kHz Opus, plenty for speech recognition and ~10x smaller than -q:a 0 MP3
+SPEECH_PROFILE = {
+    'name': 'speech-opus',
+    'args': ['-ac', '1', '-ar', '16000', '-c:a', 'libopus', '-b:a', '24k', '-application', 'voip'],
+    'ext': '.ogg',
+    'mime': 'audio/ogg',
+}
+# For ffmpeg builds without libopus
+FALLBACK_PROFILE = {
+    'name': 'speech-mp3',
+    'args': ['-ac', '1', '-ar', '16000', '-c:a', 'libmp3lame', '-b:a', '32k'],
+    'ext': '.mp3',
+    'mime': 'audio/mp3',
+}
+# Silence trimming: stretches quieter than SILENCE_DB for at least MIN_SILENCE_SECONDS are cut
+# down to 2 x KEEP_SILENCE_SECONDS, unless that would save less than MIN_TRIM_RATIO of the audio
+SILENCE_DB = -35
+MIN_SILENCE_SECONDS = 3.0
+KEEP_SILENCE_SECONDS = 0.5
+MIN_TRIM_RATIO = 0.05
+
+# Audio longer than this (after trimming) is split at silences into roughly equal segments,
+# each summarized on its own; SEGMENT_ENCODERS ffmpeg processes encode them side by side
+SEGMENT_SECONDS = 25 * 60
+SEGMENT_ENCODERS = 2
+
+# Codecs Gemini accepts as-is: codec -> (extension, mime type, muxer)
+COPY_FORMATS = {
+    'mp3': ('.mp3', 'audio/mp3', 'mp3'),
+    'aac': ('.aac', 'audio/aac', 'adts'),
+    'opus': ('.ogg', 'audio/ogg', 'ogg'),
+    'vorbis': ('.ogg', 'audio/ogg', 'ogg'),
+}
+# Audio-only files that can be uploaded without touching them
+UPLOADABLE_EXTENSIONS = {'.mp3': ('mp3',), '.aac': ('aac',), '.ogg': ('opus', 'vorbis')}
+
+
+def probe(path):
+    """Returns duration, size and the first audio stream's codec/bitrate/layout, or None without ffprobe."""
+    cmd = ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path]
+    try:
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    except (FileNotFoundError, subprocess.CalledProcessError) as e:
+        print(f"ffprobe unavailable or failed ({e}); using the default speech profile.")
+        return None
+
+    data = json.loads(out)
+    streams = data.get('streams', [])
+    fmt = data.get('format', {})
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    info = {
+        'duration': float(fmt.get('duration') or 0),
+        'size': int(fmt.get('size') or os.path.getsize(path)),
+        'has_video': any(s.get('codec_type') == 'video' and not s.get('disposition', {}).get('attached_pic')
+                         for s in streams),
+        'has_audio': audio is not None,
+        'codec': None, 'channels': None, 'sample_rate': None, 'bit_rate': None,
+    }
+    if audio:
+        info['codec'] = audio.get('codec_name')
+        info['channels'] = audio.get('channels')
+        info['sample_rate'] = int(audio.get('sample_rate') or 0)
+        # Opus-in-Ogg and some MOVs carry no per-stream bitrate; the container's is close enough
+        info['bit_rate'] = int(audio.get('bit_rate') or fmt.get('bit_rate') or 0)
+    return info
+
+
+def choose_profile(path, info):
+    """'skip' (upload the file itself), 'copy' (demux the audio track) or 'transcode'."""
+    if not info or not info['has_audio']:
+        return 'transcode'
+    fits = info['codec'] in COPY_FORMATS and 0 < info['bit_rate'] <= MAX_SPEECH_BITRATE
+    if not fits:
+        return 'transcode'
+    expected = UPLOADABLE_EXTENSIONS.get(os.path.splitext(path)[1].lower(), ())
+    if not info['has_video'] and info['codec'] in expected:
+        return 'skip'
+    return 'copy'
+
+
+def run_ffmpeg(args):
+    subprocess.run(['ffmpeg', '-hide_banner', '-nostdin', '-y'] + args, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def detect_silences(path, duration):
+    """[(start, end)] of long silences, via ffmpeg silencedetect (one decode pass, nothing written)."""
+    cmd = ['ffmpeg', '-hide_banner', '-nostdin', '-i', path, '-vn', '-map', '0:a:0',
+           '-af', f'silencedetect=noise={SILENCE_DB}dB:d={MIN_SILENCE_SECONDS}', '-f', 'null', '-']
+    stderr = subprocess.run(cmd, check=True, capture_output=True, text=True).stderr
+    starts = [float(x) for x in re.findall(r'silence_start: (-?[\d.]+)', stderr)]
+    ends = [float(x) for x in re.findall(r'silence_end: ([\d.]+)', stderr)]
+    # A recording that ends in silence has no final silence_end
+    ends += [duration] * (len(starts) - len(ends))
+    return [(max(s, 0.0), e) for s, e in zip(starts, ends)]
+
+
+def speech_intervals(duration, silences):
+    """Parts of the recording to keep: everything except the middle of each long silence."""
+    kept = []
+    position = 0.0
+    for start, end in silences:
+        cut_start = start + KEEP_SILENCE_SECONDS if start > 0 else 0.0
+        cut_end = end - KEEP_SILENCE_SECONDS if end < duration else duration
+        if cut_end <= cut_start:
+            continue
+        if cut_start > position:
+            kept.append((position, cut_start))
+        position = cut_end
+    if position < duration:
+        kept.append((position, duration))
+    return kept
+
+
+def time_map(intervals):
+    """[(trimmed_start, original_start, length)] for mapping trimmed timestamps back to the recording."""
+    mapping = []
+    offset = 0.0
+    for start, end in intervals:
+        mapping.append((round(offset, 3), round(start, 3), round(end - start, 3)))
+        offset += end - start
+    return mapping
+
+
+def to_original(t, mapping):
+    """Converts a timestamp in the trimmed audio to the original recording's timeline."""
+    for trimmed_start, original_start, length in reversed(mapping):
+        if t >= trimmed_start:
+            return original_start + min(t - trimmed_start, length)
+    return t
+
+
+def cut_at_silences(duration, silences):
+    """Splits the untrimmed recording at the middle of each silence (nothing is removed)."""
+    cuts = [(start + end) / 2 for start, end in silences if 0 < (start + end) / 2 < duration]
+    bounds = [0.0] + cuts + [duration]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def group_intervals(intervals, max_seconds=SEGMENT_SECONDS):
+    """Groups consecutive intervals into segments of about equal length, none above max_seconds.
+
+    Segments only break between intervals, i.e. inside a silence, unless a single
+    stretch of speech is longer than max_seconds.
+    """
+    pieces = []
+    for start, end in intervals:
+        while end - start > max_seconds:
+            pieces.append((start, start + max_seconds))
+            start += max_seconds
+        pieces.append((start, end))
+    edges = []
+    total = 0.0
+    for start, end in pieces:
+        total += end - start
+        edges.append(total)
+
+    count = max(1, math.ceil(total / max_seconds))
+    while True:
+        # Cut at the interval edge nearest to each ideal boundary
+        cuts = []
+        for k in range(1, count):
+            ideal = total * k / count
+            first = cuts[-1] + 1 if cuts else 0
+            candidates = range(first, len(pieces) - 1)
+            if candidates:
+                cuts.append(min(candidates, key=lambda i: abs(edges[i] - ideal)))
+        bounds = [0] + [i + 1 for i in cuts] + [len(pieces)]
+        segments = [pieces[a:b] for a, b in zip(bounds, bounds[1:]) if b > a]
+        if count >= len(pieces) or all(sum(end - start for start, end in seg) <= max_seconds for seg in segments):
+            return segments
+        count += 1
+
+
+def merge_contiguous(intervals):
+    merged = []
+    for start, end in intervals:
+        if merged and abs(merged[-1][1] - start) < 1e-6:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def select_filter(intervals):
+    """Audio filter keeping only the given intervals, with timestamps closed up."""
+    keep = '+'.join(f'between(t,{start:.3f},{end:.3f})' for start, end in intervals)
+    return f"aselect='{keep}',asetpts=N/SR/TB"
+
+
+def transcode(path, out_base, profile=SPEECH_PROFILE, intervals=None):
+    """Encodes `path` (or only the given intervals of it) with the profile."""
+    out_path = out_base + profile['ext']
+    window, trim = [], []
+    if intervals:
+        # Input seeking limits decoding to this segment; filter times are then relative to its start
+        start, end = intervals[0][0], intervals[-1][1]
+        window = ['-ss', f'{start:.3f}', '-to', f'{end:.3f}']
+        shifted = merge_contiguous([(a - start, b - start) for a, b in intervals])
+        if len(shifted) > 1:
+            trim = ['-af', select_filter(shifted)]
+    run_ffmpeg(window + ['-i', path, '-vn', '-map', '0:a:0'] + trim + profile['args'] + [out_path])
+    return out_path, profile['mime']
+
+
+def encode(path, out_base, intervals=None):
+    """Speech-profile encode with the MP3 fallback. Returns (audio_path, mime_type)."""
+    try:
+        return transcode(path, out_base, SPEECH_PROFILE, intervals)
+    except subprocess.CalledProcessError as e:
+        print(f"Opus encode failed ({e}); falling back to {FALLBACK_PROFILE['name']}.")
+        return transcode(path, out_base, FALLBACK_PROFILE, intervals)
+
+
+def find_silences(path, info):
+    if not info or not info['has_audio'] or info['duration'] <= 0:
+        return []
+    try:
+        return detect_silences(path, info['duration'])
+    except subprocess.CalledProcessError as e:
+        print(f"Silence detection failed ({e}); keeping the full recording.")
+        return []
+
+
+def plan_trim(info, silences):
+    """Kept intervals when trimming silence is worth it, else None."""
+    if not silences:
+        return None
+    intervals = speech_intervals(info['duration'], silences)
+    kept = sum(end - start for start, end in intervals)
+    saved = info['duration'] - kept
+    if not intervals or saved < info['duration'] * MIN_TRIM_RATIO:
+        return None
+    print(f"Trimming {len(silences)} silences: {format_duration(info['duration'])} -> {format_duration(kept)} "
+          f"({saved / info['duration']:.0%} less audio).")
+    return intervals
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def prepare_whole(path, out_base, info):
+    """Single-segment preparation: upload as-is, stream copy or transcode, by choose_profile."""
+    mode = choose_profile(path, info)
+
+    if mode == 'skip':
+        _, mime, _ = COPY_FORMATS[info['codec']]
+        print(f"Input is already {info['codec']} at {info['bit_rate'] // 1000} kbps; uploading it as-is.")
+        return path, mime
+
+    if mode == 'copy':
+        ext, mime, muxer = COPY_FORMATS[info['codec']]
+        out_path = out_base + ext
+        try:
+            run_ffmpeg(['-i', path, '-vn', '-map', '0:a:0', '-c:a', 'copy', '-f', muxer, out_path])
+            print(f"Copied the {info['codec']} audio track without re-encoding.")
+            return out_path, mime
+        except subprocess.CalledProcessError as e:
+            print(f"Stream copy failed ({e}); transcoding instead.")
+
+    return encode(path, out_base)
+
+
+def prepare_audio(path, out_base):
+    """Produces the smallest files Gemini can use for speech.
+
+    out_base is the output path without extension. Returns (segments, info), where each
+    segment is {'path', 'mime', 'time_map'}; time_map maps the segment's own timeline back
+    to the recording (see to_original). A short recording is one segment, and its path is
+    `path` itself when the input can be uploaded unchanged.
+    """
+    info = probe(path)
+    silences = find_silences(path, info)
+    intervals = plan_trim(info, silences)
+    trimmed = intervals is not None
+    if not trimmed and info and info['duration'] > 0:
+        intervals = cut_at_silences(info['duration'], silences)
+    chunks = group_intervals(intervals) if intervals else [None]
+
+    if info:
+        info['trimmed_seconds'] = info['duration'] - sum(end - start for start, end in intervals) if intervals else 0.0
+        info['time_map'] = time_map(intervals) if intervals else []
+
+    if len(chunks) == 1 and not trimmed:
+        audio_path, mime = prepare_whole(path, out_base, info)
+        return [{'path': audio_path, 'mime': mime, 'time_map': info['time_map'] if info else []}], info
+
+    if len(chunks) > 1:
+        print(f"Splitting into {len(chunks)} segments at silences.")
+    bases = [out_base if len(chunks) == 1 else f"{out_base}.part{i + 1}" for i in range(len(chunks))]
+    with ThreadPoolExecutor(max_workers=SEGMENT_ENCODERS) as pool:
+        encoded = list(pool.map(lambda args: encode(path, *args), zip(bases, chunks)))
+    segments = [{'path': audio_path, 'mime': mime, 'time_map': time_map(chunk)}
+                for (audio_path, mime), chunk in zip(encoded, chunks)]
+    return segments, info
+
+
+def segment_span(segment):
+    """(start, end) of the segment in the original recording, in seconds."""
+    mapping = segment['time_map']
+    if not mapping:
+        return None
+    return mapping[0][1], mapping[-1][1] + mapping[-1][2]
+
+
+def describe_savings(path, audio_paths):
+    before = os.path.getsize(path)
+    after = sum(os.path.getsize(p) for p in audio_paths)
+    return f"{before / 1e6:.1f} MB -> {after / 1e6:.1f} MB ({before / max(after, 1):.1f}x smaller)"
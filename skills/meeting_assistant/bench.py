@@ -0,0 +1,299 @@
+"""Local benchmark for the meeting pipeline.
+
+Generates synthetic recordings with ffmpeg, replaces google.generativeai with an
+in-process fake (upload / get_file / generate_content with configurable latency,
+429s and botched fields) and points API_ENDPOINT at a local HTTP stub, then runs
+1..N recordings concurrently through process.STAGES and reports per-stage timings, bytes and
+throughput. Nothing leaves the machine; caches and outbox live in a temp dir.
+
+    python3 bench.py --lengths 300,1800 --max-concurrency 4 --rate-429 0.1
+    python3 bench.py --startup      # only check the watcher's import-time budget
+"""
+import os
+import sys
+import json
+import time
+import types
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+import subprocess
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# watch.py must be ready to accept files well under a second after launch
+IMPORT_BUDGET_SECONDS = 0.5
+# Modules that should only be imported once the first job runs
+LAZY_MODULES = ('google.generativeai', 'requests')
+
+STARTUP_PROBE = """
+import sys, time
+start = time.perf_counter()
+import watch
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(','.join(name for name in %r if name in sys.modules))
+"""
+
+FAKE_MINUTES = {
+    "meeting_date": None,
+    "summary": "測試會議摘要。",
+    "content": "- 討論事項一\n- 討論事項二",
+    "tags": ["benchmark"],
+    "action_items": [{"content": "整理報表", "assignee": "Allen", "dueDate": None}],
+}
+
+
+def make_recording(path, seconds, index, fmt):
+    """Tone bursts of 30 s separated by 8 s of silence; the pitch differs per recording so hashes do too."""
+    audio = f"sine=frequency={200 + index * 7}:sample_rate=44100:duration={seconds}"
+    gate = "volume='if(lt(mod(t,38),30),1,0)':eval=frame"
+    if fmt == 'mp4':
+        args = ['-f', 'lavfi', '-i', audio, '-f', 'lavfi', '-i', f'color=c=black:s=320x240:r=5:d={seconds}',
+                '-af', gate, '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-b:a', '128k', '-shortest']
+    elif fmt == 'm4a':
+        args = ['-f', 'lavfi', '-i', audio, '-af', gate, '-c:a', 'aac', '-b:a', '128k']
+    elif fmt == 'mp3':
+        args = ['-f', 'lavfi', '-i', audio, '-af', gate, '-c:a', 'libmp3lame', '-b:a', '128k']
+    else:
+        args = ['-f', 'lavfi', '-i', audio, '-af', gate]
+    subprocess.run(['ffmpeg', '-hide_banner', '-nostdin', '-y'] + args + [path], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class FakeGemini:
+    """Stand-in for the google.generativeai calls process.py makes."""
+
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.files = {}
+        self.stats = {'uploads': 0, 'uploaded_bytes': 0, 'get_file': 0, 'generate': 0, 'throttled': 0, 'invalid': 0}
+
+        self.module = types.ModuleType('google.generativeai')
+        self.module.configure = lambda **kwargs: None
+        self.module.upload_file = self.upload_file
+        self.module.get_file = self.get_file
+        self.module.GenerativeModel = lambda model_name=None: types.SimpleNamespace(generate_content=self.generate_content)
+        self.module.list_models = lambda: []
+        self.types = types.ModuleType('google.generativeai.types')
+        self.types.HarmCategory = types.SimpleNamespace()
+        self.types.HarmBlockThreshold = types.SimpleNamespace()
+        self.module.types = self.types
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def _maybe_throttle(self):
+        if random.random() < self.args.rate_429:
+            self._count('throttled')
+            raise Exception(f"429 Resource has been exhausted. Please retry in {self.args.retry_hint}s.")
+
+    def _file(self, name):
+        ready = time.monotonic() >= self.files[name]['ready_at']
+        return types.SimpleNamespace(
+            name=name, uri=f"https://fake.local/{name}", display_name=name,
+            state=types.SimpleNamespace(name="ACTIVE" if ready else "PROCESSING"),
+            expiration_time=datetime.now(timezone.utc) + timedelta(hours=48),
+        )
+
+    def upload_file(self, path, mime_type=None):
+        size = os.path.getsize(path)
+        time.sleep(self.args.upload_latency + size * 8 / (self.args.upload_mbps * 1e6))
+        with self.lock:
+            name = f"files/bench-{len(self.files) + 1}"
+            self.files[name] = {'size': size, 'ready_at': time.monotonic() + self.args.processing}
+            self.stats['uploads'] += 1
+            self.stats['uploaded_bytes'] += size
+        return self._file(name)
+
+    def get_file(self, name):
+        self._count('get_file')
+        return self._file(name)
+
+    def generate_content(self, contents, generation_config=None, request_options=None):
+        self._count('generate')
+        self._maybe_throttle()
+        if isinstance(contents, str):
+            # Text-only summary merge
+            time.sleep(self.args.gen_latency / 2)
+            return types.SimpleNamespace(text="合併後的測試摘要。")
+        size_mb = self.files[contents[0].name]['size'] / 1e6
+        time.sleep(self.args.gen_latency + self.args.gen_per_mb * size_mb)
+        # Answer only the fields the schema asks for, sometimes botching one of them
+        fields = list((generation_config or {}).get('response_schema', {}).get('properties') or FAKE_MINUTES)
+        answer = {name: FAKE_MINUTES[name] for name in fields}
+        if random.random() < self.args.rate_invalid:
+            self._count('invalid')
+            answer[random.choice(fields)] = None
+        return types.SimpleNamespace(text=json.dumps(answer, ensure_ascii=False))
+
+
+def start_stub(latency):
+    """Local /api/meeting-records stand-in. Returns (server, received list)."""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            received.append(len(body))
+            payload = json.dumps({'id': len(received), 'syncError': None}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, received
+
+
+def measure_startup(runs=3):
+    """Imports watch.py in fresh interpreters; returns (best seconds, eagerly loaded lazy modules)."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    best, eager = None, set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', STARTUP_PROBE % (LAZY_MODULES,)], cwd=here,
+                             capture_output=True, text=True, check=True).stdout.splitlines()
+        seconds = float(out[0])
+        best = seconds if best is None else min(best, seconds)
+        eager.update(name for name in out[1].split(',') if name)
+    return best, sorted(eager)
+
+
+def run_level(process, recordings, workdir, endpoint, args):
+    """Pushes the recordings through the pipeline at once; returns the measurements."""
+    from pipeline import Pipeline
+    from outbox import Outbox
+    from result_cache import ResultCache
+    from fingerprint import FingerprintIndex
+    from scheduler import GeminiScheduler
+
+    n = len(recordings)
+    # Fresh quota, caches and outbox, so every level does the full work
+    process._scheduler = GeminiScheduler(args.rpm, args.tpm, args.concurrency)
+    process._cache = ResultCache(os.path.join(workdir, f'cache_{n}.db'))
+    process._outbox = Outbox(endpoint, os.path.join(workdir, f'outbox_{n}'))
+    process._fingerprints = FingerprintIndex(os.path.join(workdir, f'fingerprints_{n}.db'))
+
+    jobs = []
+    pipeline = Pipeline(process.STAGES, lambda job: (process.cleanup(job), jobs.append(job)))
+    start = time.monotonic()
+    output = sys.stdout if args.verbose else open(os.devnull, 'w')
+    with contextlib.redirect_stdout(output):
+        pipeline.start()
+        for path in recordings:
+            pipeline.submit(process.new_job(path))
+        pipeline.stop()
+    wall = time.monotonic() - start
+
+    ok = [job for job in jobs if 'error' not in job]
+    audio_seconds = sum((job.get('audio_info') or {}).get('duration', 0) for job in ok)
+    stage_names = [stage.name for stage in pipeline.stages]
+    return {
+        'recordings': n,
+        'succeeded': len(ok),
+        'wall_seconds': round(wall, 2),
+        'recordings_per_hour': round(len(ok) * 3600 / wall, 1),
+        'audio_hours_per_hour': round(audio_seconds / wall, 1),
+        'source_mb': round(sum(job.get('source_bytes', 0) for job in jobs) / 1e6, 2),
+        'uploaded_mb': round(sum(job.get('audio_bytes', 0) for job in jobs) / 1e6, 2),
+        'segments': sum(len(job.get('segments') or []) for job in jobs),
+        'avg_stage_seconds': {
+            name: round(sum(job['timings'].get(name, 0) for job in jobs) / max(len(jobs), 1), 2) for name in stage_names
+        },
+        'avg_total_seconds': round(sum(job['timings']['total'] for job in jobs) / max(len(jobs), 1), 2),
+        'pipeline': pipeline.report(),
+        'scheduler': process.get_scheduler().report(),
+        'errors': [job['error'] for job in jobs if 'error' in job],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the meeting pipeline against local stand-ins.")
+    parser.add_argument('--lengths', default='300', help="Recording lengths in seconds, comma separated (cycled)")
+    parser.add_argument('--format', default='mp4', choices=['mp4', 'm4a', 'mp3', 'wav'])
+    parser.add_argument('--max-concurrency', type=int, default=3, help="Run 1..N recordings at once")
+    parser.add_argument('--upload-mbps', type=float, default=20.0, help="Fake upload bandwidth")
+    parser.add_argument('--upload-latency', type=float, default=0.3)
+    parser.add_argument('--processing', type=float, default=1.0, help="Seconds a fake upload stays PROCESSING")
+    parser.add_argument('--gen-latency', type=float, default=2.0, help="Base generate_content latency")
+    parser.add_argument('--gen-per-mb', type=float, default=1.0, help="Extra generate latency per MB of audio")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Probability of a 429 per generate call")
+    parser.add_argument('--rate-invalid', type=float, default=0.0, help="Probability of a botched field per generate call")
+    parser.add_argument('--retry-hint', type=float, default=2.0, help="Retry delay suggested by fake 429s")
+    parser.add_argument('--endpoint-latency', type=float, default=0.1)
+    parser.add_argument('--rpm', type=int, default=1000)
+    parser.add_argument('--tpm', type=int, default=10 ** 8)
+    parser.add_argument('--concurrency', type=int, default=8, help="Scheduler concurrency")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own output")
+    parser.add_argument('--startup', action='store_true', help="Only measure watch.py import time and exit")
+    args = parser.parse_args()
+
+    seconds, eager = measure_startup()
+    ok = seconds <= IMPORT_BUDGET_SECONDS and not eager
+    print(f"Startup: import watch took {seconds * 1000:.0f} ms (budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)"
+          + (f"; loaded eagerly: {', '.join(eager)}" if eager else "") + (" OK" if ok else " OVER BUDGET"))
+    if args.startup:
+        sys.exit(0 if ok else 1)
+
+    lengths = [float(x) for x in args.lengths.split(',')]
+    workdir = tempfile.mkdtemp(prefix='meeting_bench_')
+    server, received = start_stub(args.endpoint_latency)
+    endpoint = f"http://127.0.0.1:{server.server_port}/api/meeting-records"
+
+    fake = FakeGemini(args)
+    sys.modules['google.generativeai'] = fake.module
+    sys.modules['google.generativeai.types'] = fake.types
+    config_path = os.path.join(workdir, 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump({'GOOGLE_API_KEY': 'bench', 'API_ENDPOINT': endpoint}, f)
+    os.environ['MEETING_ASSISTANT_CONFIG'] = config_path
+    import process
+
+    print(f"Generating {args.max_concurrency} synthetic {args.format} recordings in {workdir}...")
+    recordings = []
+    for i in range(args.max_concurrency):
+        path = os.path.join(workdir, f"2026-01-{i + 1:02d}_bench_{i + 1}.{args.format}")
+        make_recording(path, lengths[i % len(lengths)], i, args.format)
+        recordings.append(path)
+
+    results = []
+    for n in range(1, args.max_concurrency + 1):
+        before = dict(fake.stats)
+        result = run_level(process, recordings[:n], workdir, endpoint, args)
+        result['gemini'] = {k: fake.stats[k] - before[k] for k in fake.stats}
+        results.append(result)
+
+        print(f"\n=== {n} concurrent recording(s): {result['succeeded']}/{n} ok in {result['wall_seconds']}s "
+              f"({result['recordings_per_hour']}/h, {result['audio_hours_per_hour']} audio-h/h)")
+        print(f"bytes: {result['source_mb']} MB source -> {result['uploaded_mb']} MB uploaded "
+              f"in {result['segments']} segment(s)")
+        print("avg per recording: " + ", ".join(f"{k} {v}s" for k, v in result['avg_stage_seconds'].items())
+              + f", total {result['avg_total_seconds']}s")
+        print(f"gemini: {result['gemini']}")
+        print(result['pipeline'])
+        print(result['scheduler'])
+        for error in result['errors']:
+            print(f"error: {error}")
+
+    print(f"\nStub endpoint received {len(received)} records.")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'startup': {'seconds': round(seconds, 3), 'eager_modules': eager}, 'levels': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.json}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
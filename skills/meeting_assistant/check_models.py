@@ -1,18 +1,17 @@
-import google.generativeai as genai
-import os
-import json
+import sys
+from process import ConfigError, get_genai
 
-# Load Config
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_PATH = os.path.join(BASE_DIR, 'config.json')
+def main():
+    try:
+        genai = get_genai()
+    except ConfigError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
-with open(CONFIG_PATH, 'r') as f:
-    config = json.load(f)
+    print("Listing supported models...")
+    for m in genai.list_models():
+        if 'generateContent' in m.supported_generation_methods:
+            print(m.name)
 
-GOOGLE_API_KEY = config.get('GOOGLE_API_KEY')
-genai.configure(api_key=GOOGLE_API_KEY)
-
-print("Listing supported models...")
-for m in genai.list_models():
-    if 'generateContent' in m.supported_generation_methods:
-        print(m.name)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import time
+import sqlite3
+import threading
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(BASE_DIR, 'fingerprints.db')
+
+# Only the opening minutes are decoded: enough to recognise a meeting, cheap next to a full extract
+FINGERPRINT_SECONDS = 4 * 60
+SAMPLE_RATE = 8000
+FRAME = 2048          # 256 ms window
+HOP = 1024            # ~7.8 frames per second
+# 33 log-spaced bands over the speech range give 32 bits per frame
+BAND_EDGES_HZ = (300, 3400)
+BANDS = 33
+
+# Phone and laptop copies rarely start at the same moment; search this far either way
+MAX_OFFSET_SECONDS = 90
+MIN_OVERLAP_SECONDS = 45
+# Fraction of differing (reliable) bits below which two recordings are the same meeting;
+# unrelated audio sits near 0.5
+MATCH_BIT_ERROR = 0.30
+# Bits whose band-energy difference is this close to zero are noise (silence, steady tones)
+RELIABLE_DELTA = 0.5
+MIN_RELIABLE_BITS = 4000
+
+
+def decode(path, seconds=FINGERPRINT_SECONDS):
+    """First `seconds` of the audio as mono float32 samples at SAMPLE_RATE."""
+    import numpy as np
+    cmd = ['ffmpeg', '-hide_banner', '-nostdin', '-t', str(seconds), '-i', path, '-vn', '-map', '0:a:0',
+           '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', '-']
+    raw = subprocess.run(cmd, check=True, capture_output=True).stdout
+    return np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def band_matrix(np):
+    """(bins, BANDS) matrix summing FFT power into log-spaced bands."""
+    freqs = np.fft.rfftfreq(FRAME, 1.0 / SAMPLE_RATE)
+    edges = np.geomspace(BAND_EDGES_HZ[0], BAND_EDGES_HZ[1], BANDS + 1)
+    index = np.searchsorted(edges, freqs, side='right') - 1
+    matrix = np.zeros((len(freqs), BANDS), dtype=np.float32)
+    inside = (index >= 0) & (index < BANDS)
+    matrix[np.nonzero(inside)[0], index[inside]] = 1.0
+    return matrix
+
+
+def compute(samples):
+    """Packed 32-bit fingerprint per frame plus a mask of the bits worth comparing.
+
+    Each bit is the sign of the change, between consecutive frames, of the energy
+    difference between two neighbouring bands (Haitsma-Kalker). It survives gain,
+    codec and bitrate changes, which is what separates a phone copy from a laptop one.
+    """
+    import numpy as np
+    if len(samples) < FRAME * 2:
+        return None
+    count = 1 + (len(samples) - FRAME) // HOP
+    frames = np.lib.stride_tricks.as_strided(
+        samples, shape=(count, FRAME), strides=(samples.strides[0] * HOP, samples.strides[0]))
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME).astype(np.float32), axis=1)) ** 2
+    energy = np.log10(spectrum @ band_matrix(np) + 1e-10)
+
+    delta = np.diff(np.diff(energy, axis=1), axis=0)  # (frames - 1, 32)
+    weights = (1 << np.arange(32, dtype=np.uint64)).astype(np.uint64)
+    bits = ((delta > 0).astype(np.uint64) * weights).sum(axis=1).astype(np.uint32)
+    reliable = ((np.abs(delta) > RELIABLE_DELTA).astype(np.uint64) * weights).sum(axis=1).astype(np.uint32)
+    return bits, reliable
+
+
+def fingerprint_file(path):
+    """(bits, reliable) arrays for a recording, or None when it is too short or too quiet to judge."""
+    result = compute(decode(path))
+    if result is None:
+        return None
+    bits, reliable = result
+    import numpy as np
+    if int(np.bitwise_count(reliable).sum()) < MIN_RELIABLE_BITS:
+        return None
+    return result
+
+
+def compare(a, b):
+    """Lowest bit error rate over the allowed offsets, with the offset in seconds; (1.0, None) if no overlap."""
+    import numpy as np
+    bits_a, mask_a = a
+    bits_b, mask_b = b
+    fps = SAMPLE_RATE / HOP
+    min_overlap = int(MIN_OVERLAP_SECONDS * fps)
+    max_offset = int(MAX_OFFSET_SECONDS * fps)
+    best = (1.0, None)
+    for offset in range(-max_offset, max_offset + 1):
+        # offset > 0: recording b starts `offset` frames into recording a
+        start_a, start_b = max(offset, 0), max(-offset, 0)
+        length = min(len(bits_a) - start_a, len(bits_b) - start_b)
+        if length < min_overlap:
+            continue
+        mask = mask_a[start_a:start_a + length] & mask_b[start_b:start_b + length]
+        compared = int(np.bitwise_count(mask).sum())
+        if compared < MIN_RELIABLE_BITS:
+            continue
+        diff = (bits_a[start_a:start_a + length] ^ bits_b[start_b:start_b + length]) & mask
+        error = int(np.bitwise_count(diff).sum()) / compared
+        if error < best[0]:
+            best = (error, offset / fps)
+    return best
+
+
+class FingerprintIndex:
+    """Local index of fingerprints of recordings that went through the pipeline."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                " source_hash TEXT PRIMARY KEY, name TEXT NOT NULL, bits BLOB NOT NULL, reliable BLOB NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+
+    def find(self, fingerprint, exclude=None):
+        """(source_hash, name, bit_error, offset_seconds) of the closest indexed match, or None."""
+        import numpy as np
+        with self.lock:
+            rows = self.conn.execute("SELECT source_hash, name, bits, reliable FROM fingerprints").fetchall()
+        best = None
+        for source_hash, name, bits, reliable in rows:
+            if source_hash == exclude:
+                continue
+            other = (np.frombuffer(bits, dtype=np.uint32), np.frombuffer(reliable, dtype=np.uint32))
+            error, offset = compare(fingerprint, other)
+            if error <= MATCH_BIT_ERROR and (best is None or error < best[2]):
+                best = (source_hash, name, error, offset)
+        return best
+
+    def add(self, source_hash, name, fingerprint):
+        bits, reliable = fingerprint
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (source_hash, name, bits, reliable, created_at) VALUES (?, ?, ?, ?, ?)",
+                (source_hash, name, bits.tobytes(), reliable.tobytes(), time.time()))
+
+    def forget(self, source_hash):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM fingerprints WHERE source_hash = ?", (source_hash,))
@@ -0,0 +1,125 @@
+import os
+import time
+import sqlite3
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUEUE_PATH = os.path.join(BASE_DIR, 'jobs.db')
+
+# A recording is picked up once its size/mtime have not changed for this long
+STABLE_SECONDS = 5
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """SQLite-backed job queue shared by the watcher and the worker pool.
+
+    Jobs survive restarts: anything left 'running' by a crash goes back to
+    'pending' in recover().
+    """
+
+    def __init__(self, path=QUEUE_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " path TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " size INTEGER, mtime REAL,"
+            " not_before REAL NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def enqueue(self, file_path):
+        """Adds a job unless the file already has one waiting or running. Returns True if added."""
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT id FROM jobs WHERE path = ? AND status IN (?, ?)", (file_path, PENDING, RUNNING)
+            ).fetchone()
+            if row:
+                # Still being written: push the readiness check back
+                self.conn.execute("UPDATE jobs SET not_before = ?, updated_at = ? WHERE id = ? AND status = ?",
+                                  (now + STABLE_SECONDS, now, row[0], PENDING))
+                return False
+            self.conn.execute(
+                "INSERT INTO jobs (path, status, not_before, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (file_path, PENDING, now + STABLE_SECONDS, now, now),
+            )
+            return True
+
+    def claim(self):
+        """Returns the oldest pending job whose file has finished copying, marked running."""
+        now = time.time()
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT id, path, size, mtime FROM jobs WHERE status = ? AND not_before <= ? ORDER BY id",
+                (PENDING, now),
+            ).fetchall()
+            for job_id, path, size, mtime in rows:
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    self.conn.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                                      (FAILED, 'file disappeared', now, job_id))
+                    continue
+                if st.st_size == 0 or (st.st_size, st.st_mtime) != (size, mtime):
+                    # Still growing (or first look): check again after STABLE_SECONDS
+                    self.conn.execute(
+                        "UPDATE jobs SET size = ?, mtime = ?, not_before = ?, updated_at = ? WHERE id = ?",
+                        (st.st_size, st.st_mtime, now + STABLE_SECONDS, now, job_id),
+                    )
+                    continue
+                self.conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (RUNNING, now, job_id),
+                )
+                return {'id': job_id, 'path': path}
+        return None
+
+    def finish(self, job_id, success, error=None):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                              (DONE if success else FAILED, error, time.time(), job_id))
+
+    def retry(self, job_id):
+        """Puts a running job back to pending so the next dispatch picks it up again."""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET status = ?, not_before = 0, updated_at = ? WHERE id = ?",
+                              (PENDING, time.time(), job_id))
+
+    def recover(self):
+        """Requeues jobs that were running when the watcher stopped."""
+        with self.lock, self.conn:
+            cur = self.conn.execute("UPDATE jobs SET status = ?, not_before = 0, updated_at = ? WHERE status = ?",
+                                    (PENDING, time.time(), RUNNING))
+            return cur.rowcount
+
+    def counts(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+def dispatch_loop(queue, submit, stop_event, poll_seconds=1):
+    """Feeds ready jobs to submit(job) until stop_event is set.
+
+    submit may block (backpressure); whoever completes the job calls queue.finish().
+    """
+    while not stop_event.is_set():
+        job = queue.claim()
+        if job is None:
+            stop_event.wait(poll_seconds)
+            continue
+        try:
+            submit(job)
+        except Exception as e:
+            print(f"[Queue] Could not start {job['path']}: {e}")
+            queue.finish(job['id'], False, repr(e))
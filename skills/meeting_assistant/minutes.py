@@ -0,0 +1,200 @@
+import re
+import json
+import time
+
+from audio import format_duration
+
+FIELDS = ('meeting_date', 'summary', 'content', 'tags', 'action_items')
+
+# Response schema for Gemini's JSON mode (OpenAPI subset understood by google.generativeai)
+ACTION_ITEM_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'content': {'type': 'string', 'description': '待辦事項內容'},
+        'assignee': {'type': 'string', 'nullable': True, 'description': '負責人 (例如 Allen)'},
+        'dueDate': {'type': 'string', 'nullable': True, 'description': 'YYYY-MM-DD，若無明確時間請填 null'},
+    },
+    'required': ['content', 'assignee', 'dueDate'],
+}
+FIELD_SCHEMAS = {
+    'meeting_date': {'type': 'string', 'nullable': True, 'description': 'YYYY-MM-DD，若無法判斷請填 null'},
+    'summary': {'type': 'string', 'description': '100-200字摘要'},
+    'content': {'type': 'string', 'description': 'Markdown 條列式詳細內容 (不要用表格)'},
+    'tags': {'type': 'array', 'items': {'type': 'string'}},
+    'action_items': {'type': 'array', 'items': ACTION_ITEM_SCHEMA},
+}
+
+DATE_PATTERN = re.compile(r'^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})$')
+DEFAULT_ASSIGNEE = '待分配'
+
+
+def minutes_schema(fields=FIELDS):
+    """Schema asking for the given fields only (used to re-request just the invalid ones)."""
+    return {
+        'type': 'object',
+        'properties': {name: FIELD_SCHEMAS[name] for name in fields},
+        'required': list(fields),
+    }
+
+
+def parse_minutes(text):
+    """Parses Gemini's JSON answer (tolerating ```json fences and raw newlines in strings)."""
+    # Clean up JSON string if Gemini adds backticks
+    json_str = text.replace('```json', '').replace('```', '').strip()
+    try:
+        # Parse with strict=False to allow control characters (newlines) in strings
+        return json.loads(json_str, strict=False)
+    except json.JSONDecodeError:
+        # Text before the object, or trailing chatter after it
+        start = json_str.find('{')
+        if start < 0:
+            raise
+        return json.JSONDecoder(strict=False).raw_decode(json_str[start:])[0]
+
+
+def clean_date(value):
+    """'YYYY-MM-DD' for date-like values (2026/1/5 too), else None."""
+    if not isinstance(value, str):
+        return None
+    match = DATE_PATTERN.match(value.strip())
+    if not match:
+        return None
+    year, month, day = (int(x) for x in match.groups())
+    try:
+        time.strptime(f"{year:04d}-{month:02d}-{day:02d}", '%Y-%m-%d')
+    except ValueError:
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def clean_text(value):
+    if isinstance(value, list):
+        value = "\n".join(str(line) for line in value)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    return value.strip()
+
+
+def validate_minutes(data):
+    """Checks each field of a minutes dict (or raw answer text) against the schema.
+
+    Returns (minutes, invalid): fields that could be coerced (dates in other formats,
+    comma separated tags, content as a list of lines, items without an assignee) are
+    repaired in place; fields that are missing or unusable are listed in `invalid` so
+    only those need to be asked for again. Unparseable text makes every field invalid.
+    """
+    if isinstance(data, str):
+        try:
+            data = parse_minutes(data)
+        except ValueError:
+            data = None
+    if not isinstance(data, dict):
+        return {'meeting_date': None, 'summary': '', 'content': '', 'tags': [], 'action_items': []}, list(FIELDS)
+
+    minutes, invalid = {}, []
+    minutes['meeting_date'] = clean_date(data.get('meeting_date'))
+
+    for name in ('summary', 'content'):
+        minutes[name] = clean_text(data.get(name))
+        if minutes[name] is None:
+            minutes[name] = ''
+            invalid.append(name)
+
+    tags = data.get('tags')
+    if isinstance(tags, str):
+        tags = re.split(r'[,，、]', tags)
+    if isinstance(tags, list):
+        minutes['tags'] = [str(tag).strip() for tag in tags if str(tag).strip()]
+    else:
+        minutes['tags'] = []
+        invalid.append('tags')
+
+    items = data.get('action_items')
+    if isinstance(items, list):
+        minutes['action_items'] = []
+        for item in items:
+            if isinstance(item, str):
+                item = {'content': item}
+            if not isinstance(item, dict) or not clean_text(item.get('content')):
+                continue
+            minutes['action_items'].append({
+                'content': clean_text(item['content']),
+                'assignee': clean_text(item.get('assignee')),
+                'dueDate': clean_date(item.get('dueDate')),
+            })
+    else:
+        minutes['action_items'] = []
+        invalid.append('action_items')
+    return minutes, invalid
+
+
+def normalize_minutes(minutes, filename_date=None, today=None):
+    """Date and assignee fix-ups applied before a record is published.
+
+    - The date in the file name wins over the one the model heard.
+    - Items without an assignee go to DEFAULT_ASSIGNEE (the API rejects nulls).
+    - Items without a due date are due on the meeting date.
+    - Due dates in another year (the model guessing 2024/2025) move to the meeting's year.
+    today ('YYYY-MM-DD') stands in for a missing meeting date; defaults to the current date.
+    """
+    minutes = dict(minutes)
+    if filename_date:
+        minutes['meeting_date'] = filename_date
+    meeting_date = minutes.get('meeting_date') or today or time.strftime('%Y-%m-%d')
+    meeting_year = meeting_date[:4]
+
+    items = []
+    for item in minutes.get('action_items') or []:
+        item = dict(item)
+        item['assignee'] = item.get('assignee') or DEFAULT_ASSIGNEE
+        due = item.get('dueDate')
+        if not due:
+            item['dueDate'] = meeting_date
+        elif due.startswith('202') and due[:4] != meeting_year:
+            item['dueDate'] = meeting_year + due[4:]
+            print(f"Fixed date year: {due} -> {item['dueDate']}")
+        items.append(item)
+    minutes['action_items'] = items
+    return minutes
+
+
+def merge_minutes(parts, merge_summaries=None):
+    """Combines per-segment minutes into one record with the same JSON schema.
+
+    parts is [(minutes_dict, span)] in recording order, span being the segment's
+    (start, end) seconds in the original recording or None. merge_summaries(list)
+    may condense the segment summaries into one; otherwise they are joined.
+    """
+    merged = {'meeting_date': None, 'summary': '', 'content': '', 'tags': [], 'action_items': []}
+    summaries, sections, seen_items = [], [], set()
+
+    for i, (minutes, span) in enumerate(parts, 1):
+        if not merged['meeting_date'] and minutes.get('meeting_date'):
+            merged['meeting_date'] = minutes['meeting_date']
+        if minutes.get('summary'):
+            summaries.append(minutes['summary'].strip())
+
+        heading = f"#### 第 {i} 段"
+        if span:
+            heading += f"（{format_duration(span[0])} – {format_duration(span[1])}）"
+        sections.append(f"{heading}\n{minutes.get('content', '').strip()}")
+
+        for tag in minutes.get('tags') or []:
+            if tag not in merged['tags']:
+                merged['tags'].append(tag)
+
+        for item in minutes.get('action_items') or []:
+            # The same promise is often repeated around a segment boundary
+            key = ((item.get('content') or '').strip(), item.get('assignee'))
+            if key not in seen_items:
+                seen_items.add(key)
+                merged['action_items'].append(item)
+
+    merged['content'] = "\n\n".join(sections)
+    merged['summary'] = "\n".join(summaries)
+    if merge_summaries and len(summaries) > 1:
+        try:
+            merged['summary'] = merge_summaries(summaries)
+        except Exception as e:
+            print(f"Summary merge failed ({e}); keeping the per-segment summaries.")
+    return merged
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTBOX_DIR = os.path.join(BASE_DIR, 'outbox')
+
+# (connect, read) seconds; the API may call Gemini for a summary before answering
+TIMEOUT = (5, 60)
+RETRY_BASE = 5
+RETRY_MAX = 10 * 60
+IDLE_SECONDS = 60
+
+PENDING = 'pending'
+SENT = 'sent'
+REJECTED = 'rejected'
+
+
+def record_key(payload):
+    """Idempotency key: hash of the record's canonical JSON."""
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+class Outbox:
+    """Durable, ordered queue of meeting records for the website API.
+
+    Each record is written to outbox/ and indexed in outbox/index.db before any
+    network call. flush() posts pending records oldest first on one pooled session;
+    a transient failure stops the flush (keeping the order) and backs off, while a
+    4xx rejection is set aside so it cannot block the records behind it.
+    """
+
+    def __init__(self, endpoint, directory=OUTBOX_DIR):
+        self.endpoint = endpoint
+        self.directory = directory
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE NOT NULL, file TEXT NOT NULL,"
+                " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT, record_id TEXT,"
+                " created_at REAL NOT NULL, sent_at REAL)"
+            )
+        self.session = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def add(self, payload):
+        """Stores a record for delivery. The same record is only ever queued (and sent) once."""
+        key = record_key(payload)
+        with self.lock:
+            row = self.conn.execute("SELECT status FROM records WHERE key = ?", (key,)).fetchone()
+            if row:
+                print(f"Record {key[:10]} already in outbox ({row[0]}).")
+                return key
+            filename = f"{int(time.time())}_{key[:12]}.json"
+            path = os.path.join(self.directory, filename)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            with self.conn:
+                self.conn.execute("INSERT INTO records (key, file, status, created_at) VALUES (?, ?, ?, ?)",
+                                  (key, filename, PENDING, time.time()))
+        self.wakeup.set()
+        return key
+
+    def status(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT status FROM records WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def pending(self):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, key, file FROM records WHERE status = ? ORDER BY id", (PENDING,)
+            ).fetchall()
+
+    def _update(self, key, **values):
+        columns = ', '.join(f"{name} = ?" for name in values)
+        with self.lock, self.conn:
+            self.conn.execute(f"UPDATE records SET {columns}, attempts = attempts + 1 WHERE key = ?",
+                              (*values.values(), key))
+
+    def _session(self):
+        # requests is imported on the first delivery, not when the watcher starts
+        if self.session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            self.session = requests.Session()
+            self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        return self.session
+
+    def post(self, key, payload):
+        """One delivery attempt. Returns SENT, REJECTED or None (try again later)."""
+        import requests
+        try:
+            res = self._session().post(self.endpoint, json=payload, headers={'Idempotency-Key': key}, timeout=TIMEOUT)
+        except requests.RequestException as e:
+            print(f"Error uploading: {e}")
+            self._update(key, last_error=repr(e))
+            return None
+
+        if 200 <= res.status_code < 300:
+            # The record is stored once the API says so; a body we cannot read must not re-send it
+            try:
+                resp_json = res.json()
+            except ValueError:
+                resp_json = None
+            if not isinstance(resp_json, dict):
+                resp_json = {}
+            record_id = resp_json.get('id')
+            print("Successfully uploaded record!")
+            print(f"Record ID: {record_id}")
+            if resp_json.get('syncError'):
+                print(f"⚠️ Warning: Action Items Sync Failed! Error: {resp_json.get('syncError')}")
+            self._update(key, status=SENT, sent_at=time.time(),
+                         record_id=str(record_id) if record_id is not None else None, last_error=None)
+            return SENT
+
+        print(f"Failed to upload. Status: {res.status_code}")
+        print(f"Response: {res.text}")
+        error = f"HTTP {res.status_code}: {res.text[:500]}"
+        if 400 <= res.status_code < 500 and res.status_code not in (408, 429):
+            # The API will never accept this record as-is; keep it on disk for a manual fix
+            self._update(key, status=REJECTED, last_error=error)
+            return REJECTED
+        self._update(key, last_error=error)
+        return None
+
+    def flush(self, force=False):
+        """Sends pending records in order until done or the endpoint fails. Returns how many remain."""
+        with self.send_lock:
+            if not force and time.time() < self.retry_at:
+                return len(self.pending())
+            for _, key, filename in self.pending():
+                with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+                if self.post(key, payload) is None:
+                    self.failures += 1
+                    delay = min(RETRY_MAX, RETRY_BASE * 2 ** (self.failures - 1))
+                    self.retry_at = time.time() + delay
+                    remaining = len(self.pending())
+                    print(f"⚠️  Website unreachable; {remaining} record(s) kept in outbox, retrying in {delay}s.")
+                    return remaining
+                self.failures = 0
+                self.retry_at = 0.0
+            return 0
+
+    def _replay(self):
+        while True:
+            wait = max(1.0, self.retry_at - time.time()) if self.retry_at else IDLE_SECONDS
+            self.wakeup.wait(wait)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[Outbox] Replay failed: {e}")
+
+    def start(self):
+        """Starts the background replayer (once); new records wake it up immediately."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._replay, name='outbox', daemon=True)
+            self.thread.start()
+            self.wakeup.set()
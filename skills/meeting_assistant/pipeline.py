@@ -0,0 +1,120 @@
+import time
+import queue
+import threading
+
+# Items allowed to wait between two stages before the upstream stage blocks
+QUEUE_SIZE = 2
+
+_STOP = object()
+
+
+class Stage:
+    def __init__(self, name, func, workers=1, queue_size=QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.stats = {'done': 0, 'failed': 0, 'busy': 0.0, 'waited': 0.0, 'blocked': 0.0, 'max_depth': 0}
+
+    def add(self, **values):
+        with self.lock:
+            for key, value in values.items():
+                self.stats[key] += value
+
+    def put(self, job):
+        """Queues a job for this stage; returns how long the caller was blocked by a full queue."""
+        start = time.monotonic()
+        job['_queued_at'] = start
+        self.inbox.put(job)
+        blocked = time.monotonic() - start
+        with self.lock:
+            self.stats['max_depth'] = max(self.stats['max_depth'], self.inbox.qsize())
+        return blocked
+
+
+class Pipeline:
+    """Runs jobs through stages on their own threads, so stages overlap across recordings.
+
+    Each stage is func(job) on a job dict and raises to fail the job; a failed job
+    skips the remaining stages. on_done(job) is called for every job, with
+    job['error'] set when it failed.
+    """
+
+    def __init__(self, stages, on_done, queue_size=QUEUE_SIZE):
+        self.stages = [Stage(name, func, workers, queue_size) for name, func, workers in stages]
+        self.on_done = on_done
+        self.threads = []
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        for i, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                t = threading.Thread(target=self._run, args=(i,), name=f"{stage.name}-{n}", daemon=True)
+                t.start()
+                self.threads.append(t)
+
+    def submit(self, job):
+        """Feeds a job into the first stage (blocks while that stage is backed up)."""
+        job.setdefault('timings', {})
+        job['_submitted_at'] = time.monotonic()
+        self.stages[0].put(job)
+
+    def _run(self, i):
+        stage = self.stages[i]
+        next_stage = self.stages[i + 1] if i + 1 < len(self.stages) else None
+        while True:
+            job = stage.inbox.get()
+            if job is _STOP:
+                return
+            waited = time.monotonic() - job.pop('_queued_at')
+            start = time.monotonic()
+            try:
+                stage.func(job)
+                failed = False
+            except Exception as e:
+                print(f"[{stage.name}] {job.get('name', '')} failed: {e}")
+                job['error'] = f"{stage.name}: {e}"
+                failed = True
+            busy = time.monotonic() - start
+            job['timings'][stage.name] = busy
+            blocked = 0.0
+            if failed or next_stage is None:
+                self._finish(job)
+            else:
+                blocked = next_stage.put(job)
+            stage.add(done=0 if failed else 1, failed=1 if failed else 0, busy=busy, waited=waited, blocked=blocked)
+
+    def _finish(self, job):
+        job['timings']['total'] = time.monotonic() - job.pop('_submitted_at')
+        try:
+            self.on_done(job)
+        except Exception as e:
+            print(f"[Pipeline] Completion handler failed for {job.get('name', '')}: {e}")
+
+    def stop(self):
+        """Lets queued jobs drain, then stops every stage in order."""
+        for stage in self.stages:
+            for _ in range(stage.workers):
+                stage.inbox.put(_STOP)
+            for t in self.threads:
+                if t.name.startswith(f"{stage.name}-"):
+                    t.join()
+
+    def report(self):
+        """Per-stage throughput, busy/wait time and queue depth since start()."""
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        lines = [f"{'stage':<10}{'done':>6}{'failed':>8}{'per hour':>10}{'busy s':>10}{'util':>7}"
+                 f"{'avg wait s':>12}{'blocked s':>11}{'queue':>7}{'max q':>7}"]
+        for stage in self.stages:
+            with stage.lock:
+                s = dict(stage.stats)
+            handled = s['done'] + s['failed']
+            lines.append(
+                f"{stage.name:<10}{s['done']:>6}{s['failed']:>8}{s['done'] * 3600 / elapsed:>10.1f}"
+                f"{s['busy']:>10.1f}{s['busy'] / (elapsed * stage.workers):>7.0%}"
+                f"{(s['waited'] / handled if handled else 0):>12.1f}{s['blocked']:>11.1f}"
+                f"{stage.inbox.qsize():>7}{s['max_depth']:>7}"
+            )
+        return "\n".join(lines)
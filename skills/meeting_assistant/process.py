@@ -3,96 +3,75 @@ import sys
 import json
 import subprocess
 import time
-import requests
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
+import queue
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from audio import prepare_audio, describe_savings, segment_span
+from minutes import FIELDS, parse_minutes, merge_minutes, minutes_schema, validate_minutes, normalize_minutes
+from result_cache import ResultCache, content_hash
+from fingerprint import FingerprintIndex, fingerprint_file
+from outbox import Outbox, PENDING, REJECTED
+# profiling.py is shared with the other skills
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import profiling
+from scheduler import GeminiScheduler, estimate_tokens, DEFAULT_RPM, DEFAULT_TPM, DEFAULT_CONCURRENCY
 
-# Load Config
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_PATH = os.path.join(BASE_DIR, 'config.json')
+CONFIG_PATH = os.environ.get('MEETING_ASSISTANT_CONFIG', os.path.join(BASE_DIR, 'config.json'))
 
-if not os.path.exists(CONFIG_PATH):
-    print(f"Error: Config file not found at {CONFIG_PATH}")
-    print("Please copy config.json.example to config.json and fill in your API key.")
-    sys.exit(1)
+class ConfigError(Exception):
+    pass
 
-with open(CONFIG_PATH, 'r') as f:
-    config = json.load(f)
+# Config, SDK, scheduler and outbox are created on first use, so importing this
+# module (e.g. from watch.py) stays cheap; google.generativeai alone takes ~1 s to import.
+_init_lock = threading.Lock()
+_config = None
+_genai = None
+_scheduler = None
 
-GOOGLE_API_KEY = config.get('GOOGLE_API_KEY')
-API_ENDPOINT = config.get('API_ENDPOINT')
+def load_config():
+    """Reads and checks config.json (once). Raises ConfigError instead of exiting."""
+    global _config
+    if _config is None:
+        if not os.path.exists(CONFIG_PATH):
+            raise ConfigError(f"Config file not found at {CONFIG_PATH}\n"
+                              "Please copy config.json.example to config.json and fill in your API key.")
+        with open(CONFIG_PATH, 'r') as f:
+            config = json.load(f)
+        api_key = config.get('GOOGLE_API_KEY')
+        if not api_key or "YOUR_KEY" in api_key:
+            raise ConfigError("Invalid Google API Key in config.json")
+        _config = config
+    return _config
 
-if not GOOGLE_API_KEY or "YOUR_KEY" in GOOGLE_API_KEY:
-    print("Error: Invalid Google API Key in config.json")
-    sys.exit(1)
+def get_genai():
+    """The configured google.generativeai module, imported on the first Gemini call."""
+    global _genai
+    with _init_lock:
+        if _genai is None:
+            api_key = load_config()['GOOGLE_API_KEY']
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _genai = genai
+    return _genai
 
-genai.configure(api_key=GOOGLE_API_KEY)
-
-def extract_audio(video_path):
-    """Extracts audio from video using ffmpeg."""
-    filename = os.path.basename(video_path)
-    # Use hidden file to prevent watcher from triggering
-    audio_path = os.path.join(os.path.dirname(video_path), f".{os.path.splitext(filename)[0]}.mp3")
-    
-    print(f"Extracting audio to {audio_path}...")
-    
-    # Check if audio already exists to save time
-    if os.path.exists(audio_path):
-        print("Audio file already exists, skipping extraction.")
-        return audio_path
-
-    cmd = [
-        'ffmpeg', '-i', video_path,
-        '-q:a', '0', '-map', 'a',
-        '-y', # Overwrite without asking
-        audio_path
-    ]
-    
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        print("Audio extraction complete.")
-        return audio_path
-    except subprocess.CalledProcessError as e:
-        print(f"Error extracting audio: {e}")
-        # Try without -map a (sometimes videos don't have explicit audio streams in map 0)
-        try:
-             cmd = ['ffmpeg', '-i', video_path, '-vn', '-ab', '128k', '-y', audio_path]
-             subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-             return audio_path
-        except Exception as e2:
-             print(f"Retry failed: {e2}")
-             return None
-    except FileNotFoundError:
-        print("Error: ffmpeg not found. Please install ffmpeg using 'brew install ffmpeg'.")
-        sys.exit(1)
-
-def upload_to_gemini(path):
-    """Uploads file to Gemini."""
-    print(f"Uploading {path} to Gemini...")
-    file = genai.upload_file(path, mime_type="audio/mp3")
-    print(f"Uploaded file '{file.display_name}' as: {file.uri}")
-    return file
-
-def wait_for_files_active(files):
-    """Waits for the given files to be active."""
-    print("Waiting for file processing...")
-    for name in (file.name for file in files):
-        file = genai.get_file(name)
-        while file.state.name == "PROCESSING":
-            print(".", end="", flush=True)
-            time.sleep(5)
-            file = genai.get_file(name)
-        if file.state.name != "ACTIVE":
-            raise Exception(f"File {file.name} failed to process")
-    print("\nFile is ready.")
+def get_scheduler():
+    """One scheduler for every job and segment, so concurrent work shares the quota."""
+    global _scheduler
+    with _init_lock:
+        if _scheduler is None:
+            config = load_config()
+            _scheduler = GeminiScheduler(
+                rpm=config.get('GEMINI_RPM', DEFAULT_RPM),
+                tpm=config.get('GEMINI_TPM', DEFAULT_TPM),
+                concurrency=config.get('GEMINI_CONCURRENCY', DEFAULT_CONCURRENCY),
+            )
+    return _scheduler
 
-def generate_meeting_minutes(file):
-    """Generates meeting minutes using Gemini."""
-    print("Generating meeting minutes...")
-    # Update to available model
-    model = genai.GenerativeModel(model_name="gemini-flash-latest")
+MODEL_NAME = "gemini-flash-latest"
 
-    prompt = """
+MINUTES_PROMPT = """
     請分析這個會議音檔，並產出 JSON 格式的會議記錄。
 
     【重要規則】
@@ -125,163 +104,482 @@ def generate_meeting_minutes(file):
     }
     """
 
-    retry_count = 0
-    max_retries = 5
-    while retry_count < max_retries:
-        try:
-            response = model.generate_content(
-                [file, prompt],
-                request_options={"timeout": 600}
-            )
-            return response.text
-        except Exception as e:
-            if "429" in str(e) or "ResourceExhausted" in str(e):
-                print(f"Quota limit hit, waiting 60 seconds to retry... ({retry_count + 1}/{max_retries})")
-                time.sleep(60)
-                retry_count += 1
-            else:
-                raise e
-    
-    raise Exception("Max retries exceeded for API quota.")
-
-def upload_to_website(data, filename_date=None):
-    """Uploads the result to the website API."""
-    print(f"Uploading to {API_ENDPOINT}...")
-    
+# Cached model outputs are only reused for the same model, prompt and response schema
+PROMPT_VERSION = hashlib.sha1(
+    (MODEL_NAME + MINUTES_PROMPT + json.dumps(minutes_schema(), sort_keys=True)).encode('utf-8')
+).hexdigest()[:12]
+
+# Segments of a long meeting uploaded/summarized at once, and attempts per segment
+SEGMENT_CONCURRENCY = 3
+SEGMENT_ATTEMPTS = 3
+# Follow-up requests for fields that came back missing or malformed
+FIELD_ATTEMPTS = 2
+
+def extract_audio(video_path):
+    """Prepares speech-grade audio segments for upload. Returns (segments, info), see audio.prepare_audio."""
+    filename = os.path.basename(video_path)
+    # Use hidden file to prevent watcher from triggering
+    out_base = os.path.join(os.path.dirname(video_path), f".{os.path.splitext(filename)[0]}")
+
+    print(f"Extracting audio from {filename}...")
+
     try:
-        # Clean up JSON string if Gemini adds backticks
-        json_str = data.replace('```json', '').replace('```', '').strip()
-        # Parse with strict=False to allow control characters (newlines) in strings
-        payload = json.loads(json_str, strict=False)
-        
-        # Override meeting_date if provided from filename
-        if filename_date:
-            payload['meeting_date'] = filename_date
-            print(f"Using date from filename: {filename_date}")
-        
-        # Append Action Items to Content for display in record
-        if 'action_items' in payload and payload['action_items']:
-            action_items_md = "\n\n### 第三大項：待辦事項\n"
-            today_str = time.strftime('%Y-%m-%d')
-            meeting_date = payload.get('meeting_date') or today_str
-            meeting_year = meeting_date.split('-')[0]
-
-            for item in payload['action_items']:
-                # Sanitize values for API (DB likely rejects nulls)
-                if not item.get('assignee'):
-                    item['assignee'] = '待分配'
-                
-                if not item.get('dueDate'):
-                    item['dueDate'] = meeting_date
-                else:
-                    # Fix Hallucinated Years (e.g., AI says 2024/2025 but it is 2026)
-                    d_date = item['dueDate']
-                    if d_date and d_date.startswith('202') and not d_date.startswith(meeting_year):
-                         # Replace year with meeting year
-                         fixed_date = meeting_year + d_date[4:]
-                         print(f"Fixed date year: {d_date} -> {fixed_date}")
-                         item['dueDate'] = fixed_date
-
-
-                content = item.get('content', '')
-                assignee = item['assignee']
-                due_date = item['dueDate']
-                created_date = meeting_date
-                
-                # Format: 內容 ｜ 負責人 ｜ 預計完成時間 ｜ 建立時間
-                action_items_md += f"- {content} ｜ {assignee} ｜ {due_date} ｜ {created_date}\n"
-            
-            payload['content'] = payload.get('content', '') + action_items_md
-        
-        # Ensure payload has required fields
-        if 'content' not in payload:
-            print("Error: Generated JSON missing 'content' field.")
-            return False
-            
-        res = requests.post(API_ENDPOINT, json=payload)
-        
-        if res.status_code == 200:
-            resp_json = res.json()
-            print("Successfully uploaded record!")
-            print(f"Record ID: {resp_json.get('id')}")
-            
-            if resp_json.get('syncError'):
-                print(f"⚠️ Warning: Action Items Sync Failed! Error: {resp_json.get('syncError')}")
-            return True
-        else:
-            print(f"Failed to upload. Status: {res.status_code}")
-            print(f"Response: {res.text}")
-            return False
-            
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON from Gemini: {e}")
+        segments, info = prepare_audio(video_path, out_base)
+        print(f"Audio ready: {describe_savings(video_path, [seg['path'] for seg in segments])}")
+        return segments, info
+    except subprocess.CalledProcessError as e:
+        print(f"Error extracting audio: {e}")
+        return None, None
+    except FileNotFoundError:
+        print("Error: ffmpeg not found. Please install ffmpeg using 'brew install ffmpeg'.")
+        return None, None
+
+def upload_to_gemini(path, mime_type="audio/mp3"):
+    """Uploads file to Gemini."""
+    print(f"Uploading {path} to Gemini...")
+    genai = get_genai()
+    file = get_scheduler().call(lambda: genai.upload_file(path, mime_type=mime_type), label="Upload")
+    print(f"Uploaded file '{file.display_name}' as: {file.uri}")
+    return file
+
+def wait_for_files_active(files):
+    """Waits for the given files to be active."""
+    print("Waiting for file processing...")
+    genai = get_genai()
+    for name in (file.name for file in files):
+        # Short files are ready within seconds; long ones are polled less and less often
+        file = get_scheduler().poll(lambda: genai.get_file(name), lambda f: f.state.name == "PROCESSING")
+        if file.state.name != "ACTIVE":
+            raise Exception(f"File {file.name} failed to process")
+    print("\nFile is ready.")
+
+def generate_meeting_minutes(file, part=None, audio_seconds=0, fields=FIELDS):
+    """Generates meeting minutes using Gemini. part=(i, n) marks one segment of a longer meeting.
+
+    The answer is constrained to the minutes JSON schema; `fields` asks for a subset
+    (to redo only the fields an earlier answer got wrong).
+    """
+    print("Generating meeting minutes..." if not part else f"Generating meeting minutes for segment {part[0]}/{part[1]}...")
+    # Update to available model
+    model = get_genai().GenerativeModel(model_name=MODEL_NAME)
+
+    prompt = MINUTES_PROMPT
+    if part:
+        prompt += f"""
+    【分段說明】
+    這是同一場會議錄音的第 {part[0]}/{part[1]} 段，只需整理這一段聽到的內容；
+    其他段落會另外整理後再合併。
+    """
+    if tuple(fields) != FIELDS:
+        prompt += f"""
+    【補齊欄位】
+    先前的回覆中以下欄位缺漏或格式錯誤：{', '.join(fields)}。
+    請只重新整理這些欄位，依照指定的 JSON 結構回傳。
+    """
+    generation_config = {"response_mime_type": "application/json", "response_schema": minutes_schema(fields)}
+
+    # Quota errors are retried by the scheduler (retry hints, shared backoff)
+    response = get_scheduler().call(
+        lambda: model.generate_content([file, prompt], generation_config=generation_config,
+                                       request_options={"timeout": 600}),
+        tokens=estimate_tokens(audio_seconds),
+        label="Generation",
+    )
+    return response.text
+
+def generate_valid_minutes(file, part=None, audio_seconds=0):
+    """Minutes dict that passes validate_minutes; only invalid fields are requested again."""
+    minutes, invalid = validate_minutes(generate_meeting_minutes(file, part, audio_seconds))
+    for attempt in range(1, FIELD_ATTEMPTS + 1):
+        if not invalid:
+            break
+        print(f"Re-requesting invalid field(s) {', '.join(invalid)} ({attempt}/{FIELD_ATTEMPTS})...")
+        # The partial answer is validated too; fields it was not asked for come back "invalid"
+        fixed, still_invalid = validate_minutes(generate_meeting_minutes(file, part, audio_seconds, invalid))
+        for name in invalid:
+            if name not in still_invalid:
+                minutes[name] = fixed[name]
+        invalid = [name for name in invalid if name in still_invalid]
+    if 'tags' in invalid:
+        # Tags are nice to have; not worth failing the segment over
+        print("Giving up on tags for this segment.")
+        invalid.remove('tags')
+    if invalid:
+        raise Exception(f"Gemini returned invalid field(s): {', '.join(invalid)}")
+    return minutes
+
+def merge_summaries(summaries):
+    """Condenses the per-segment summaries of a long meeting into one summary (text-only call)."""
+    model = get_genai().GenerativeModel(model_name=MODEL_NAME)
+    parts = "\n".join(f"第 {i} 段：{s}" for i, s in enumerate(summaries, 1))
+    prompt = f"""
+    以下是同一場會議依時間順序分段整理的摘要。請合併成一段 100-200 字的繁體中文摘要，
+    如實陳述，不要加油添醋，只回傳摘要文字本身。
+
+    {parts}
+    """
+    response = get_scheduler().call(
+        lambda: model.generate_content(prompt, request_options={"timeout": 120}),
+        tokens=estimate_tokens(),
+        label="Summary merge",
+    )
+    return response.text.strip()
+
+def run_segments(segments, func, key, label):
+    """Runs func(segment) -> value into segment[key] for every segment still missing it.
+
+    Segments run in parallel (SEGMENT_CONCURRENCY); only failed ones are retried.
+    """
+    for attempt in range(1, SEGMENT_ATTEMPTS + 1):
+        todo = [seg for seg in segments if seg.get(key) is None]
+        if not todo:
+            return
+        if attempt > 1:
+            print(f"Retrying {label} for {len(todo)} failed segment(s) (attempt {attempt}/{SEGMENT_ATTEMPTS})...")
+
+        def run(seg):
+            try:
+                seg[key] = func(seg)
+            except Exception as e:
+                print(f"{label} failed for segment {seg['index']}: {e}")
+
+        with ThreadPoolExecutor(max_workers=SEGMENT_CONCURRENCY) as pool:
+            list(pool.map(run, todo))
+    failed = [seg['index'] for seg in segments if seg.get(key) is None]
+    if failed:
+        raise Exception(f"{label} failed for segment(s) {failed}")
+
+def build_payload(data, filename_date=None):
+    """Turns the minutes JSON into the record the website API expects (None if unusable)."""
+    minutes, invalid = validate_minutes(data)
+    # Ensure payload has required fields
+    if 'content' in invalid:
+        print(f"Error: Generated minutes have no usable 'content' (invalid: {', '.join(invalid)}).")
         print("Raw output:", data)
-        return False
-    except Exception as e:
-        print(f"Error uploading: {e}")
-        
-        # Failsafe: Save to local file if upload fails
-        try:
-            timestamp = int(time.time())
-            backup_file = f"backup_meeting_record_{timestamp}.json"
-            clean_data = data.replace('```json', '').replace('```', '').strip()
-            
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                f.write(clean_data)
-            print(f"⚠️  Backup: Saved meeting record to {backup_file} locally.")
-        except Exception as backup_error:
-            print(f"Failed to save backup: {backup_error}")
-            
+        return None
+
+    # Override meeting_date if provided from filename
+    if filename_date:
+        print(f"Using date from filename: {filename_date}")
+    payload = normalize_minutes(minutes, filename_date)
+
+    # Append Action Items to Content for display in record
+    if payload['action_items']:
+        action_items_md = "\n\n### 第三大項：待辦事項\n"
+        created_date = payload['meeting_date'] or time.strftime('%Y-%m-%d')
+        for item in payload['action_items']:
+            # Format: 內容 ｜ 負責人 ｜ 預計完成時間 ｜ 建立時間
+            action_items_md += f"- {item['content']} ｜ {item['assignee']} ｜ {item['dueDate']} ｜ {created_date}\n"
+        payload['content'] = payload['content'] + action_items_md
+    return payload
+
+_outbox = None
+
+def get_outbox():
+    global _outbox
+    with _init_lock:
+        if _outbox is None:
+            _outbox = Outbox(load_config().get('API_ENDPOINT'))
+    return _outbox
+
+def upload_to_website(data, filename_date=None, wait=True):
+    """Queues the result in the outbox for the website API.
+
+    With wait, delivers it (and anything queued before it) right away; otherwise the
+    background replayer sends it. Returns False only if the record is unusable or rejected.
+    """
+    payload = build_payload(data, filename_date)
+    if payload is None:
         return False
 
+    outbox = get_outbox()
+    key = outbox.add(payload)
+    if not wait:
+        return True
+
+    print(f"Uploading to {outbox.endpoint}...")
+    outbox.flush(force=True)
+    status = outbox.status(key)
+    if status == PENDING:
+        print(f"⚠️  Saved meeting record to the outbox ({key[:10]}); it is sent automatically once the website is reachable.")
+    return status != REJECTED
+
 import re
 def extract_date_from_filename(filename):
     """Extracts date (YYYY-MM-DD) from filename if exists."""
     match = re.search(r'(\d{4}-\d{2}-\d{2})', filename)
     return match.group(1) if match else None
 
-def process_video(video_path):
+_cache = None
+
+def get_cache():
+    global _cache
+    with _init_lock:
+        if _cache is None:
+            _cache = ResultCache()
+    return _cache
+
+def prompt_key(part):
+    """Cache key of the prompt sent for a segment (the segment note changes the prompt)."""
+    return f"{PROMPT_VERSION}:{part[0]}/{part[1]}" if part else PROMPT_VERSION
+
+_fingerprints = None
+# source_hash -> copies deferred behind that job while it runs. Its fingerprint is indexed
+# while it runs; a copy matching it is parked here and re-run once it finishes.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+def get_fingerprints():
+    global _fingerprints
+    with _init_lock:
+        if _fingerprints is None:
+            _fingerprints = FingerprintIndex()
+    return _fingerprints
+
+def find_duplicate(job):
+    """Fingerprints the recording's opening minutes; returns the matching earlier meeting or None.
+
+    A recording with no match is added to the index, so a second copy arriving later
+    (phone vs laptop, re-export, other container) is caught before its upload. A match
+    that is still being processed is not waited for: the match is returned with
+    job['waiting_for'] set, and cleanup() of that job hands this one back to be re-run.
+    """
+    fingerprint = job.get('fingerprint')
+    if fingerprint is None:
+        try:
+            fingerprint = fingerprint_file(job['video_path'])
+        except Exception as e:
+            print(f"Could not fingerprint {job['name']} ({e}); processing it anyway.")
+            return None
+        if fingerprint is None:
+            return None
+    index = get_fingerprints()
+    with _in_flight_lock:
+        match = index.find(fingerprint, exclude=job['source_hash'])
+        if not match:
+            index.add(job['source_hash'], job['name'], fingerprint)
+            _in_flight[job['source_hash']] = []
+            job['fingerprinted'] = True
+            return None
+        waiting = _in_flight.get(match[0])
+        if waiting is not None:
+            # Kept so the re-run does not decode the recording again
+            job['fingerprint'] = fingerprint
+            job['waiting_for'] = match[1]
+            waiting.append(job)
+    return match
+
+def reuse_or_upload(seg):
+    """Returns the Gemini file for a segment, reusing an earlier upload of the same audio."""
+    cache = get_cache()
+    name = cache.get_upload(seg['hash'])
+    if name:
+        try:
+            file = get_genai().get_file(name)
+            if file.state.name in ("ACTIVE", "PROCESSING"):
+                print(f"Reusing Gemini upload {name} for segment {seg['index']}.")
+                return file
+        except Exception as e:
+            print(f"Cached upload {name} is no longer available ({e}).")
+        cache.forget_upload(seg['hash'])
+    file = upload_to_gemini(seg['path'], seg['mime'])
+    cache.put_upload(seg['hash'], file, seg['mime'])
+    return file
+
+# Pipeline stages: each takes the job dict and raises on failure
+def stage_extract(job):
+    cache = get_cache()
+    job['source_bytes'] = os.path.getsize(job['video_path'])
+    job['source_hash'] = content_hash(job['video_path'])
+    cached = cache.get_result(job['source_hash'], PROMPT_VERSION)
+    if cached:
+        print(f"Recording already processed ({job['source_hash'][:10]}); reusing the cached minutes.")
+        job['result_text'] = cached
+        job['segments'] = []
+        return
+
+    if not job.get('force'):
+        duplicate = find_duplicate(job)
+        if duplicate and job.get('waiting_for'):
+            print(f"{job['name']} matches {job['waiting_for']}, which is still being processed; "
+                  f"checking it again once that finishes.")
+            job['segments'] = []
+            return
+        if duplicate:
+            _, name, error, offset = duplicate
+            print(f"⚠️  {job['name']} is the same meeting as {name} "
+                  f"({1 - error:.0%} fingerprint match, offset {offset:+.0f}s); skipping upload and generation.")
+            job['duplicate_of'] = name
+            job['segments'] = []
+            return
+
+    # Each segment's time_map maps its (silence-trimmed) audio back to the recording's timeline
+    job['segments'], job['audio_info'] = extract_audio(job['video_path'])
+    if not job['segments']:
+        raise Exception("Audio extraction failed")
+    count = len(job['segments'])
+    job['audio_bytes'] = sum(os.path.getsize(seg['path']) for seg in job['segments'])
+    for i, seg in enumerate(job['segments'], 1):
+        seg['index'] = i
+        seg['part'] = (i, count) if count > 1 else None
+        seg['hash'] = content_hash(seg['path'])
+        seg['text'] = cache.get_output(seg['hash'], prompt_key(seg['part']))
+
+def stage_upload(job):
+    # Segments with a cached answer need no upload
+    todo = [seg for seg in job['segments'] if seg['text'] is None]
+    if todo:
+        run_segments(todo, reuse_or_upload, 'file', 'Upload')
+        wait_for_files_active([seg['file'] for seg in todo])
+
+def stage_generate(job):
+    if job.get('result_text') or job.get('duplicate_of') or job.get('waiting_for'):
+        return
+    segments = job['segments']
+
+    def generate(seg):
+        minutes = generate_valid_minutes(seg['file'], seg['part'], sum(length for _, _, length in seg['time_map']))
+        # Segments that stay invalid count as failures, so only those are asked again
+        text = json.dumps(minutes, ensure_ascii=False)
+        get_cache().put_output(seg['hash'], prompt_key(seg['part']), text)
+        return text
+    run_segments(segments, generate, 'text', 'Generation')
+
+    if len(segments) == 1:
+        job['result_text'] = segments[0]['text']
+    else:
+        merged = merge_minutes([(parse_minutes(seg['text']), segment_span(seg)) for seg in segments], merge_summaries)
+        job['result_text'] = json.dumps(merged, ensure_ascii=False)
+    get_cache().put_result(job['source_hash'], PROMPT_VERSION, job['result_text'])
+
+def stage_publish(job):
+    if job.get('duplicate_of') or job.get('waiting_for'):
+        return
+    # Extract date from filename to force correct date
+    filename_date = extract_date_from_filename(os.path.basename(job['video_path']))
+    if not upload_to_website(job['result_text'], filename_date, wait=job.get('deliver_now', True)):
+        raise Exception("Upload to website failed")
+
+# (name, function, workers). ffmpeg is CPU-bound; the other stages mostly wait on the network.
+STAGES = [
+    ('extract', stage_extract, 1),
+    ('upload', stage_upload, 2),
+    ('generate', stage_generate, 2),
+    ('publish', stage_publish, 1),
+]
+
+def new_job(video_path, force=False):
+    """force=True processes the recording even if it matches an earlier meeting's fingerprint."""
+    return {'video_path': video_path, 'name': os.path.basename(video_path), 'timings': {}, 'force': force}
+
+def retry_job(job):
+    """A fresh job for a recording that was deferred behind a copy still being processed."""
+    retry = new_job(job['video_path'], job['force'])
+    for key in ('queue_id', 'deliver_now', 'fingerprint'):
+        if key in job:
+            retry[key] = job[key]
+    return retry
+
+def cleanup(job):
+    """Removes the temporary audio files of a finished (or failed) job.
+
+    Returns the jobs that were deferred behind it (see find_duplicate); the caller
+    re-runs them.
+    """
+    for seg in job.get('segments') or []:
+        if seg['path'] != job['video_path'] and os.path.exists(seg['path']):
+            os.remove(seg['path'])
+    if not job.get('fingerprinted'):
+        return []
+    if 'error' in job:
+        # A failed meeting must not make its other copies look like duplicates
+        get_fingerprints().forget(job['source_hash'])
+    with _in_flight_lock:
+        return _in_flight.pop(job['source_hash'], None) or []
+
+def process_video(video_path, force=False):
     """Main processing logic for a single video."""
     if not os.path.exists(video_path):
         print(f"Error: File {video_path} not found.")
         return False
 
-    # 1. Extract Audio
-    audio_path = extract_audio(video_path)
-    if not audio_path:
-        return False
-
+    job = new_job(video_path, force)
     try:
-        # 2. Upload to Gemini
-        file = upload_to_gemini(audio_path)
-        wait_for_files_active([file])
-
-        # 3. Generate Content
-        result_text = generate_meeting_minutes(file)
-        
-        # 4. Upload to Website
-        # Extract date from filename to force correct date
-        filename = os.path.basename(video_path)
-        filename_date = extract_date_from_filename(filename)
-        
-        success = upload_to_website(result_text, filename_date)
-        return success
-
+        for name, stage, _ in STAGES:
+            with profiling.stage(name):
+                stage(job)
+        return True
     except Exception as e:
         print(f"Error processing video: {e}")
+        job['error'] = str(e)
         return False
     finally:
-        # Optional: Clean up audio file
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
+        cleanup(job)
+
+def process_videos(video_paths, force=False):
+    """Processes several recordings through the overlapped stage pipeline and reports per-stage stats."""
+    from pipeline import Pipeline
+
+    results = {}
+    # Deferred copies to re-run, and None for each recording that is finished. Re-runs are
+    # submitted from this thread, so a full extract queue never blocks a stage worker.
+    events = queue.Queue()
+    def on_done(job):
+        for waiting in cleanup(job):
+            events.put(retry_job(waiting))
+        if job.get('waiting_for'):
+            return
+        results[job['video_path']] = 'error' not in job
+        events.put(None)
+
+    pipeline = Pipeline(STAGES, on_done)
+    pipeline.start()
+    pending = 0
+    for path in video_paths:
+        if os.path.exists(path):
+            pipeline.submit(new_job(path, force))
+            pending += 1
+        else:
+            print(f"Error: File {path} not found.")
+            results[path] = False
+    while pending:
+        retry = events.get()
+        if retry is None:
+            pending -= 1
+        else:
+            pipeline.submit(retry)
+    pipeline.stop()
+    print(pipeline.report())
+    print(get_scheduler().report())
+    return results
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 process.py <video_file_path>")
+    # --force: process recordings even if they match an already processed meeting
+    # --profile: write cProfile/tracemalloc/RSS per stage to profiles/
+    flags = {'--force', '--profile'}
+    force = '--force' in sys.argv[1:]
+    profile = '--profile' in sys.argv[1:]
+    paths = [arg for arg in sys.argv[1:] if arg not in flags]
+    if not paths:
+        print("Usage: python3 process.py [--force] [--profile] <video_file_path> [more_video_files...]")
         sys.exit(1)
 
-    video_path = sys.argv[1]
-    process_video(video_path)
+    try:
+        load_config()
+    except ConfigError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    with profiling.profiled('process', profile):
+        if len(paths) == 1:
+            process_video(paths[0], force)
+        elif profile:
+            # cProfile only sees the calling thread, so profiled runs go one recording at a time
+            results = {path: process_video(path, force) for path in paths}
+            print(f"Done: {sum(results.values())}/{len(results)} succeeded.")
+        else:
+            results = process_videos(paths, force)
+            print(f"Done: {sum(results.values())}/{len(results)} succeeded.")
 
 if __name__ == "__main__":
     main()
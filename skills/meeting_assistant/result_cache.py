@@ -0,0 +1,88 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, 'cache.db')
+
+# Don't reuse a Gemini upload that expires within this window (generation can take a while)
+UPLOAD_EXPIRY_MARGIN = 60 * 60
+
+
+def content_hash(path):
+    """Hash of a file's bytes, so copies and renamed recordings hit the same entries."""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Local cache of Gemini work, keyed by content hash (and prompt version for outputs).
+
+    - results: final minutes of a recording (source file hash + prompt version)
+    - outputs: raw model answer for one uploaded audio file (audio hash + prompt key)
+    - uploads: Gemini file name/uri of an audio file until it expires
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " source_hash TEXT NOT NULL, prompt_version TEXT NOT NULL, text TEXT NOT NULL,"
+                " created_at REAL NOT NULL, PRIMARY KEY (source_hash, prompt_version))"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS outputs ("
+                " audio_hash TEXT NOT NULL, prompt_key TEXT NOT NULL, text TEXT NOT NULL,"
+                " created_at REAL NOT NULL, PRIMARY KEY (audio_hash, prompt_key))"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                " audio_hash TEXT PRIMARY KEY, name TEXT NOT NULL, uri TEXT, mime TEXT,"
+                " expires_at REAL, created_at REAL NOT NULL)"
+            )
+
+    def _get(self, sql, args):
+        with self.lock:
+            row = self.conn.execute(sql, args).fetchone()
+        return row[0] if row else None
+
+    def _put(self, sql, args):
+        with self.lock, self.conn:
+            self.conn.execute(sql, args)
+
+    def get_result(self, source_hash, prompt_version):
+        return self._get("SELECT text FROM results WHERE source_hash = ? AND prompt_version = ?",
+                         (source_hash, prompt_version))
+
+    def put_result(self, source_hash, prompt_version, text):
+        self._put("INSERT OR REPLACE INTO results (source_hash, prompt_version, text, created_at) VALUES (?, ?, ?, ?)",
+                  (source_hash, prompt_version, text, time.time()))
+
+    def get_output(self, audio_hash, prompt_key):
+        return self._get("SELECT text FROM outputs WHERE audio_hash = ? AND prompt_key = ?", (audio_hash, prompt_key))
+
+    def put_output(self, audio_hash, prompt_key, text):
+        self._put("INSERT OR REPLACE INTO outputs (audio_hash, prompt_key, text, created_at) VALUES (?, ?, ?, ?)",
+                  (audio_hash, prompt_key, text, time.time()))
+
+    def get_upload(self, audio_hash):
+        """Gemini file name of a previous upload that is not about to expire, else None."""
+        return self._get("SELECT name FROM uploads WHERE audio_hash = ? AND (expires_at IS NULL OR expires_at > ?)",
+                         (audio_hash, time.time() + UPLOAD_EXPIRY_MARGIN))
+
+    def put_upload(self, audio_hash, file, mime):
+        expiration = getattr(file, 'expiration_time', None)
+        expires_at = expiration.timestamp() if expiration else None
+        self._put("INSERT OR REPLACE INTO uploads (audio_hash, name, uri, mime, expires_at, created_at)"
+                  " VALUES (?, ?, ?, ?, ?, ?)",
+                  (audio_hash, file.name, getattr(file, 'uri', None), mime, expires_at, time.time()))
+
+    def forget_upload(self, audio_hash):
+        self._put("DELETE FROM uploads WHERE audio_hash = ?", (audio_hash,))
@@ -0,0 +1,150 @@
+import re
+import time
+import random
+import threading
+
+# Defaults for the Gemini free tier; override with GEMINI_RPM / GEMINI_TPM / GEMINI_CONCURRENCY in config.json
+DEFAULT_RPM = 10
+DEFAULT_TPM = 250000
+DEFAULT_CONCURRENCY = 4
+
+# Gemini bills audio at about 32 tokens per second
+AUDIO_TOKENS_PER_SECOND = 32
+PROMPT_TOKENS = 1500
+OUTPUT_TOKENS = 2500
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 5
+BACKOFF_MAX = 120
+# After a throttle the admitted rate is halved, then grows back by this fraction per success
+RECOVERY_STEP = 0.1
+MIN_RATE_SCALE = 0.1
+
+RETRY_HINT_PATTERNS = [
+    r'retry in ([\d.]+)\s*s',
+    r'retry_delay\s*\{\s*seconds:\s*(\d+)',
+    r'"retryDelay":\s*"([\d.]+)s"',
+]
+
+
+def is_retryable(error):
+    text = f"{type(error).__name__} {error}"
+    return any(marker in text for marker in ('429', 'ResourceExhausted', '503', 'ServiceUnavailable'))
+
+
+def retry_hint(error):
+    """Seconds the API asked us to wait, if the error says so."""
+    text = str(error)
+    for pattern in RETRY_HINT_PATTERNS:
+        match = re.search(pattern, text)
+        if match:
+            return float(match.group(1))
+    delay = getattr(error, 'retry_after', None)
+    return float(delay) if delay else None
+
+
+def estimate_tokens(audio_seconds=0):
+    return int(audio_seconds * AUDIO_TOKENS_PER_SECOND) + PROMPT_TOKENS + OUTPUT_TOKENS
+
+
+class TokenBucket:
+    """Admits `rate_per_minute` units per minute, with bursts up to `capacity`."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount, scale=1.0):
+        """Takes `amount` (going into debt if needed) and returns how long the caller must wait."""
+        with self.lock:
+            now = time.monotonic()
+            rate = self.rate * scale
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / rate)
+
+
+class GeminiScheduler:
+    """Shared admission control for Gemini calls across all jobs and segments.
+
+    Generation calls take a request and their estimated tokens from the buckets and
+    one of `concurrency` slots. A 429/503 pauses every caller for the server's retry
+    hint (or an exponential backoff) and halves the admitted rate, which then creeps
+    back up with each success.
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, concurrency=DEFAULT_CONCURRENCY, max_attempts=MAX_ATTEMPTS):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.stats = {'calls': 0, 'throttled': 0, 'waited': 0.0}
+
+    def _wait(self, seconds):
+        if seconds > 0:
+            with self.lock:
+                self.stats['waited'] += seconds
+            time.sleep(seconds)
+
+    def _admit(self, tokens):
+        self._wait(self.paused_until - time.monotonic())
+        if tokens:
+            scale = self.scale
+            self._wait(max(self.requests.reserve(1, scale), self.tokens.reserve(tokens, scale)))
+
+    def _throttled(self, delay):
+        with self.lock:
+            self.stats['throttled'] += 1
+            self.scale = max(MIN_RATE_SCALE, self.scale / 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    def _succeeded(self):
+        with self.lock:
+            self.stats['calls'] += 1
+            self.scale = min(1.0, self.scale + RECOVERY_STEP)
+
+    def call(self, func, tokens=0, label="Gemini request"):
+        """Runs func() under the quota. tokens=0 marks calls outside the generation quota (file API)."""
+        for attempt in range(1, self.max_attempts + 1):
+            self._admit(tokens)
+            try:
+                with self.slots:
+                    result = func()
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_attempts:
+                    raise
+                hint = retry_hint(e)
+                delay = hint if hint is not None else min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+                delay += random.uniform(0, 1)
+                self._throttled(delay)
+                print(f"[Scheduler] {label} throttled ({type(e).__name__}); retrying in {delay:.0f}s "
+                      f"({attempt}/{self.max_attempts}, rate now {self.scale:.0%}).")
+                continue
+            self._succeeded()
+            return result
+
+    def poll(self, fetch, pending, initial=1.0, factor=1.6, max_interval=30.0, timeout=30 * 60):
+        """Calls fetch() until pending(value) is False, backing off exponentially between calls."""
+        deadline = time.monotonic() + timeout
+        interval = initial
+        value = self.call(fetch, label="File status")
+        while pending(value):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Still pending after {timeout:.0f}s")
+            time.sleep(interval)
+            interval = min(interval * factor, max_interval)
+            value = self.call(fetch, label="File status")
+        return value
+
+    def report(self):
+        with self.lock:
+            s = dict(self.stats)
+        return (f"[Scheduler] {s['calls']} calls, {s['throttled']} throttled, "
+                f"{s['waited']:.0f}s queued for quota, rate at {self.scale:.0%}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The skill's modules are flat scripts imported by name, as when run from the skill folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
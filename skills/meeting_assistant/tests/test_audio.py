@@ -0,0 +1,19 @@
+from audio import KEEP_SILENCE_SECONDS, speech_intervals, time_map, to_original
+
+
+def test_speech_intervals_trim_the_middle_of_silences():
+    kept = speech_intervals(100.0, [(0.0, 10.0), (40.0, 50.0), (95.0, 100.0)])
+    assert kept == [
+        (10.0 - KEEP_SILENCE_SECONDS, 40.0 + KEEP_SILENCE_SECONDS),
+        (50.0 - KEEP_SILENCE_SECONDS, 95.0 + KEEP_SILENCE_SECONDS),
+    ]
+
+
+def test_time_map_round_trips_to_the_original_timeline():
+    intervals = [(10.0, 40.0), (50.0, 80.0)]
+    mapping = time_map(intervals)
+    assert mapping == [(0.0, 10.0, 30.0), (30.0, 50.0, 30.0)]
+    assert to_original(5.0, mapping) == 15.0
+    assert to_original(35.0, mapping) == 55.0
+    # Past the end stays inside the last interval
+    assert to_original(100.0, mapping) == 80.0
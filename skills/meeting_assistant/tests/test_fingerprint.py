@@ -0,0 +1,131 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import process
+from fingerprint import FingerprintIndex, compare
+from result_cache import ResultCache
+from scheduler import GeminiScheduler
+
+FRAMES = 1800  # about 4 minutes at SAMPLE_RATE / HOP
+
+
+def meeting(seed):
+    rng = np.random.default_rng(seed)
+    bits = rng.integers(0, 2 ** 32, FRAMES, dtype=np.uint32)
+    return bits, np.full(FRAMES, 0xFFFFFFFF, dtype=np.uint32)
+
+
+def noisy_copy(fingerprint, shift, flip=0.1, seed=1):
+    """The same audio starting `shift` frames later, with a fraction of the bits flipped."""
+    bits, reliable = fingerprint
+    rng = np.random.default_rng(seed)
+    noise = (rng.random((FRAMES, 32)) < flip) @ (1 << np.arange(32, dtype=np.uint64))
+    copy = np.roll(bits, -shift) ^ noise.astype(np.uint32)
+    return copy, reliable
+
+
+def test_copy_with_offset_matches_and_other_meeting_does_not():
+    original = meeting(0)
+    error, offset = compare(original, noisy_copy(original, 40))
+    assert error < 0.2 and offset == pytest.approx(40 * 1024 / 8000)
+    error, _ = compare(original, meeting(2))
+    assert error > 0.4
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = FingerprintIndex(str(tmp_path / 'fingerprints.db'))
+    monkeypatch.setattr(process, '_fingerprints', index)
+    monkeypatch.setattr(process, '_in_flight', {})
+    prints = {'a.m4a': meeting(0), 'b.mp4': noisy_copy(meeting(0), 20), 'c.m4a': meeting(3)}
+    monkeypatch.setattr(process, 'fingerprint_file', lambda path: prints[os.path.basename(path)])
+    yield index
+    index.conn.close()
+
+
+def job(name):
+    job = process.new_job(name)
+    job['source_hash'] = f'hash-{name}'
+    return job
+
+
+def test_second_copy_of_a_finished_meeting_is_a_duplicate(index):
+    first = job('a.m4a')
+    assert process.find_duplicate(first) is None
+    process.cleanup(first)
+    match = process.find_duplicate(job('b.mp4'))
+    assert match[:2] == ('hash-a.m4a', 'a.m4a')
+    assert process.find_duplicate(job('c.m4a')) is None
+
+
+def test_failed_meeting_is_forgotten(index):
+    first = job('a.m4a')
+    process.find_duplicate(first)
+    first['error'] = 'generate: quota'
+    process.cleanup(first)
+    assert process.find_duplicate(job('b.mp4')) is None
+
+
+def defer_copy_while_first_is_running(first_fails):
+    first, second = job('a.m4a'), job('b.mp4')
+    assert process.find_duplicate(first) is None
+    # The copy is parked behind the first recording instead of waiting for it
+    match = process.find_duplicate(second)
+    assert match[1] == 'a.m4a' and second['waiting_for'] == 'a.m4a'
+    if first_fails:
+        first['error'] = 'publish: website down'
+    deferred = process.cleanup(first)
+    assert deferred == [second]
+    retry = process.retry_job(second)
+    retry['source_hash'] = second['source_hash']
+    return retry, process.find_duplicate(retry)
+
+
+def test_copy_of_a_running_meeting_is_a_duplicate_once_it_succeeds(index):
+    retry, match = defer_copy_while_first_is_running(first_fails=False)
+    assert match[1] == 'a.m4a'
+    assert not retry.get('fingerprinted') and not retry.get('waiting_for')
+
+
+def test_copy_of_a_running_meeting_is_processed_when_it_fails(index):
+    retry, match = defer_copy_while_first_is_running(first_fails=True)
+    assert match is None
+    assert retry['fingerprinted']
+    process.cleanup(retry)
+    assert process._in_flight == {}
+
+
+def test_copy_does_not_hold_up_other_recordings(index, tmp_path, monkeypatch):
+    monkeypatch.setattr(process, '_cache', ResultCache(str(tmp_path / 'cache.db')))
+    monkeypatch.setattr(process, 'extract_audio', lambda path: ([{'path': path}], {}))
+    monkeypatch.setattr(process, '_scheduler', GeminiScheduler())
+    paths = []
+    for name in ('a.m4a', 'b.mp4', 'c.m4a'):
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        paths.append(str(path))
+
+    extracted = []
+    other_extracted = threading.Event()
+
+    def extract(job):
+        process.stage_extract(job)
+        extracted.append(job['name'])
+        if job['name'] == 'c.m4a':
+            other_extracted.set()
+
+    def generate(job):
+        # The first recording only finishes once the unrelated one got through extraction
+        if job['name'] == 'a.m4a' and not other_extracted.wait(timeout=10):
+            raise RuntimeError('extraction was held up by the copy')
+
+    monkeypatch.setattr(process, 'STAGES', [('extract', extract, 1), ('generate', generate, 1)])
+    results = process.process_videos(paths)
+
+    assert results == dict.fromkeys(paths, True)
+    assert extracted.index('c.m4a') < extracted.index('b.mp4', extracted.index('b.mp4') + 1)
+    assert extracted.count('b.mp4') == 2
+    assert process._in_flight == {}
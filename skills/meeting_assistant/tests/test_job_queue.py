@@ -0,0 +1,89 @@
+import os
+import threading
+
+import pytest
+
+import job_queue
+from job_queue import JobQueue, dispatch_loop
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(job_queue, 'STABLE_SECONDS', 0)
+    return JobQueue(':memory:')
+
+
+def recording(tmp_path, name='meeting.m4a', data=b'audio'):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_enqueue_skips_waiting_duplicates(queue, tmp_path):
+    path = recording(tmp_path)
+    assert queue.enqueue(path)
+    assert not queue.enqueue(path)
+    assert queue.counts() == {'pending': 1}
+
+
+def test_claim_waits_until_the_file_stops_changing(queue, tmp_path):
+    path = recording(tmp_path)
+    queue.enqueue(path)
+
+    # First look only records size/mtime
+    assert queue.claim() is None
+    with open(path, 'ab') as f:
+        f.write(b' more')
+    assert queue.claim() is None
+
+    job = queue.claim()
+    assert job['path'] == path
+    assert queue.counts() == {'running': 1}
+
+
+def test_claim_fails_jobs_whose_file_disappeared(queue, tmp_path):
+    path = recording(tmp_path)
+    queue.enqueue(path)
+    os.remove(path)
+    assert queue.claim() is None
+    assert queue.counts() == {'failed': 1}
+
+
+def test_retry_hands_a_running_job_to_the_next_claim(queue, tmp_path):
+    path = recording(tmp_path)
+    queue.enqueue(path)
+    queue.claim()
+    job = queue.claim()
+
+    queue.retry(job['id'])
+    assert queue.claim()['id'] == job['id']
+    assert queue.counts() == {'running': 1}
+
+
+def test_recover_requeues_running_jobs(queue, tmp_path):
+    path = recording(tmp_path)
+    queue.enqueue(path)
+    queue.claim()
+    job = queue.claim()
+    assert job is not None
+
+    assert queue.recover() == 1
+    assert queue.counts() == {'pending': 1}
+    assert queue.claim()['id'] == job['id']
+
+    queue.finish(job['id'], True)
+    assert queue.counts() == {'done': 1}
+    # A finished recording can be queued again
+    assert queue.enqueue(path)
+
+
+def test_dispatch_loop_fails_jobs_that_cannot_start(queue, tmp_path):
+    queue.enqueue(recording(tmp_path))
+    stop = threading.Event()
+
+    def submit(job):
+        stop.set()
+        raise RuntimeError('pool closed')
+
+    dispatch_loop(queue, submit, stop, poll_seconds=0)
+    assert queue.counts() == {'failed': 1}
@@ -0,0 +1,56 @@
+from minutes import DEFAULT_ASSIGNEE, FIELDS, normalize_minutes, parse_minutes, validate_minutes
+
+
+def test_parse_minutes_tolerates_fences_and_chatter():
+    text = '```json\n{"summary": "line one\nline two"}\n```'
+    assert parse_minutes(text) == {'summary': 'line one\nline two'}
+    assert parse_minutes('Here you go: {"tags": ["a"]} hope it helps') == {'tags': ['a']}
+
+
+def test_validate_minutes_repairs_coercible_fields():
+    minutes, invalid = validate_minutes({
+        'meeting_date': '2026/1/5',
+        'summary': ' 摘要 ',
+        'content': ['- 第一點', '- 第二點'],
+        'tags': '營運，人事',
+        'action_items': ['寄出報價單', {'content': '', 'assignee': 'Allen'},
+                         {'content': '更新菜單', 'assignee': 'Allen', 'dueDate': '2026-02-30'}],
+    })
+    assert invalid == []
+    assert minutes['meeting_date'] == '2026-01-05'
+    assert minutes['summary'] == '摘要'
+    assert minutes['content'] == '- 第一點\n- 第二點'
+    assert minutes['tags'] == ['營運', '人事']
+    assert minutes['action_items'] == [
+        {'content': '寄出報價單', 'assignee': None, 'dueDate': None},
+        {'content': '更新菜單', 'assignee': 'Allen', 'dueDate': None},
+    ]
+
+
+def test_validate_minutes_lists_only_unusable_fields():
+    minutes, invalid = validate_minutes({'summary': '摘要', 'content': '', 'tags': ['a'], 'action_items': None})
+    assert invalid == ['content', 'action_items']
+    assert minutes['summary'] == '摘要'
+
+    _, invalid = validate_minutes('not json at all')
+    assert invalid == list(FIELDS)
+
+
+def test_normalize_minutes_fixes_dates_and_assignees():
+    minutes = {
+        'meeting_date': '2026-03-01',
+        'action_items': [
+            {'content': 'a', 'assignee': None, 'dueDate': None},
+            {'content': 'b', 'assignee': 'Allen', 'dueDate': '2024-03-10'},
+        ],
+    }
+    fixed = normalize_minutes(minutes, filename_date='2026-03-02')
+    assert fixed['meeting_date'] == '2026-03-02'
+    assert fixed['action_items'] == [
+        {'content': 'a', 'assignee': DEFAULT_ASSIGNEE, 'dueDate': '2026-03-02'},
+        {'content': 'b', 'assignee': 'Allen', 'dueDate': '2026-03-10'},
+    ]
+    # The input is left alone
+    assert minutes['action_items'][0]['assignee'] is None
+
+    assert normalize_minutes({'action_items': [{'content': 'c'}]}, today='2026-04-01')['action_items'][0]['dueDate'] == '2026-04-01'
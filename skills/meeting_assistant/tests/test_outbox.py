@@ -0,0 +1,92 @@
+import json
+
+import pytest
+import requests
+
+import outbox
+from outbox import Outbox
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=''):
+        self.status_code = status_code
+        self.text = body
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posts = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.posts.append((json, headers))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def box(tmp_path):
+    box = Outbox('http://example.invalid/api/meetings', directory=str(tmp_path))
+    yield box
+    box.conn.close()
+
+
+def record_id(box, key):
+    return box.conn.execute("SELECT record_id FROM records WHERE key = ?", (key,)).fetchone()[0]
+
+
+@pytest.mark.parametrize('response, expected_id', [
+    (FakeResponse(201, '{"id": 42}'), '42'),
+    (FakeResponse(202, ''), None),
+    (FakeResponse(204, ''), None),
+    (FakeResponse(200, '<html>ok</html>'), None),
+    (FakeResponse(200, '[1, 2]'), None),
+])
+def test_any_2xx_is_sent_whatever_the_body(box, response, expected_id):
+    key = box.add({'title': 'weekly'})
+    box.session = FakeSession(response)
+    assert box.flush() == 0
+    assert box.status(key) == outbox.SENT
+    assert record_id(box, key) == expected_id
+
+
+def test_rejected_record_does_not_block_the_next(box):
+    first = box.add({'title': 'bad'})
+    second = box.add({'title': 'good'})
+    box.session = FakeSession(FakeResponse(422, 'missing date'), FakeResponse(201, '{"id": 1}'))
+    assert box.flush() == 0
+    assert box.status(first) == outbox.REJECTED
+    assert box.status(second) == outbox.SENT
+
+
+def test_transient_failure_keeps_order_and_backs_off(box):
+    first = box.add({'title': 'a'})
+    second = box.add({'title': 'b'})
+    box.session = FakeSession(requests.ConnectionError('down'))
+    assert box.flush() == 2
+    assert box.retry_at > 0
+    # Still backing off: nothing is sent
+    assert box.flush() == 2
+    assert len(box.session.posts) == 1
+
+    box.session = FakeSession(FakeResponse(503, 'busy'))
+    assert box.flush(force=True) == 2
+    box.session = FakeSession(FakeResponse(201, '{"id": 1}'), FakeResponse(201, '{"id": 2}'))
+    assert box.flush(force=True) == 0
+    assert [p[0]['title'] for p in box.session.posts] == ['a', 'b']
+    assert box.status(first) == box.status(second) == outbox.SENT
+
+
+def test_same_record_is_queued_once(box):
+    payload = {'title': 'weekly', 'attendees': ['a', 'b']}
+    key = box.add(payload)
+    assert box.add(dict(reversed(list(payload.items())))) == key
+    assert len(box.pending()) == 1
+    box.session = FakeSession(FakeResponse(201, '{"id": 1}'))
+    box.flush()
+    assert box.session.posts[0][1] == {'Idempotency-Key': key}
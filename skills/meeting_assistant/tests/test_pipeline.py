@@ -0,0 +1,64 @@
+import threading
+
+from pipeline import Pipeline
+
+
+def run(stages, jobs):
+    done = []
+    lock = threading.Lock()
+
+    def on_done(job):
+        with lock:
+            done.append(job)
+
+    pipeline = Pipeline(stages, on_done)
+    pipeline.start()
+    for job in jobs:
+        pipeline.submit(job)
+    pipeline.stop()
+    return pipeline, done
+
+
+def test_jobs_pass_through_every_stage():
+    stages = [
+        ('prepare', lambda job: job.setdefault('steps', []).append('prepare'), 1),
+        ('generate', lambda job: job['steps'].append('generate'), 2),
+    ]
+    pipeline, done = run(stages, [{'name': f'job{i}'} for i in range(5)])
+
+    assert len(done) == 5
+    for job in done:
+        assert job['steps'] == ['prepare', 'generate']
+        assert 'error' not in job
+        assert set(job['timings']) == {'prepare', 'generate', 'total'}
+    assert [stage.stats['done'] for stage in pipeline.stages] == [5, 5]
+
+
+def test_failed_job_skips_the_remaining_stages():
+    def prepare(job):
+        if job['name'] == 'bad':
+            raise ValueError('no audio')
+
+    reached = []
+    stages = [('prepare', prepare, 1), ('generate', lambda job: reached.append(job['name']), 1)]
+    pipeline, done = run(stages, [{'name': 'bad'}, {'name': 'good'}])
+
+    assert reached == ['good']
+    errors = {job['name']: job.get('error') for job in done}
+    assert errors == {'bad': 'prepare: no audio', 'good': None}
+    assert pipeline.stages[0].stats['failed'] == 1
+
+
+def test_completion_handler_errors_do_not_stop_the_stage():
+    calls = []
+
+    def on_done(job):
+        calls.append(job['name'])
+        raise RuntimeError('notify failed')
+
+    pipeline = Pipeline([('prepare', lambda job: None, 1)], on_done)
+    pipeline.start()
+    pipeline.submit({'name': 'a'})
+    pipeline.submit({'name': 'b'})
+    pipeline.stop()
+    assert calls == ['a', 'b']
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import result_cache
+from result_cache import ResultCache, content_hash
+
+
+def test_content_hash_follows_bytes_not_names(tmp_path):
+    a = tmp_path / 'a.m4a'
+    b = tmp_path / 'copy of a.m4a'
+    a.write_bytes(b'same audio')
+    b.write_bytes(b'same audio')
+    assert content_hash(str(a)) == content_hash(str(b))
+    b.write_bytes(b'other audio')
+    assert content_hash(str(a)) != content_hash(str(b))
+
+
+def test_results_and_outputs_are_keyed_by_prompt():
+    cache = ResultCache(':memory:')
+    cache.put_result('src', 'v1', 'minutes v1')
+    cache.put_output('audio', 'prompt-a', 'answer a')
+
+    assert cache.get_result('src', 'v1') == 'minutes v1'
+    assert cache.get_result('src', 'v2') is None
+    assert cache.get_output('audio', 'prompt-a') == 'answer a'
+    assert cache.get_output('audio', 'prompt-b') is None
+
+    cache.put_result('src', 'v1', 'minutes v1 again')
+    assert cache.get_result('src', 'v1') == 'minutes v1 again'
+
+
+def test_uploads_close_to_expiry_are_not_reused():
+    cache = ResultCache(':memory:')
+    soon = datetime.now() + timedelta(seconds=result_cache.UPLOAD_EXPIRY_MARGIN / 2)
+    later = datetime.now() + timedelta(seconds=result_cache.UPLOAD_EXPIRY_MARGIN * 2)
+    cache.put_upload('expiring', SimpleNamespace(name='files/1', uri='u1', expiration_time=soon), 'audio/mp4')
+    cache.put_upload('fresh', SimpleNamespace(name='files/2', uri='u2', expiration_time=later), 'audio/mp4')
+    cache.put_upload('unknown', SimpleNamespace(name='files/3'), 'audio/mp4')
+
+    assert cache.get_upload('expiring') is None
+    assert cache.get_upload('fresh') == 'files/2'
+    assert cache.get_upload('unknown') == 'files/3'
+
+    cache.forget_upload('fresh')
+    assert cache.get_upload('fresh') is None
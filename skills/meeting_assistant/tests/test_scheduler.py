@@ -0,0 +1,80 @@
+import pytest
+
+import scheduler
+from scheduler import GeminiScheduler, TokenBucket, is_retryable, retry_hint
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(scheduler.time, 'sleep', slept.append)
+    monkeypatch.setattr(scheduler.random, 'uniform', lambda a, b: 0.0)
+    return slept
+
+
+def test_retry_hint_formats():
+    assert retry_hint(Exception('429 Quota exceeded. Please retry in 17.5s.')) == 17.5
+    assert retry_hint(Exception('retry_delay {\n  seconds: 42\n}')) == 42
+    assert retry_hint(Exception('{"retryDelay": "9s"}')) == 9
+    assert retry_hint(Exception('bad request')) is None
+
+
+def test_is_retryable():
+    assert is_retryable(ResourceExhausted('quota'))
+    assert is_retryable(Exception('503 Service Unavailable'))
+    assert not is_retryable(ValueError('400 invalid argument'))
+
+
+def test_token_bucket_goes_into_debt():
+    bucket = TokenBucket(60)
+    assert bucket.reserve(60) == 0.0
+    # One more unit at one per second: about a second of wait
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    # Two units of debt at half the rate
+    assert bucket.reserve(1, scale=0.5) == pytest.approx(4.0, abs=0.1)
+
+
+def test_call_retries_throttled_requests_after_the_hint(sleeps):
+    answers = [ResourceExhausted('429 please retry in 3s'), 'minutes']
+
+    def func():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    gemini = GeminiScheduler(rpm=1000, tpm=10 ** 9)
+    assert gemini.call(func, tokens=100) == 'minutes'
+    assert gemini.stats['throttled'] == 1
+    assert gemini.stats['calls'] == 1
+    assert sleeps and sleeps[0] == pytest.approx(3.0, abs=0.1)
+    # Halved on the throttle, one recovery step back on success
+    assert gemini.scale == pytest.approx(0.5 + scheduler.RECOVERY_STEP)
+
+
+def test_call_raises_non_retryable_errors_at_once(sleeps):
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise ValueError('400 invalid argument')
+
+    with pytest.raises(ValueError):
+        GeminiScheduler().call(func)
+    assert len(calls) == 1
+
+
+def test_call_gives_up_after_max_attempts(sleeps):
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise ResourceExhausted('429')
+
+    with pytest.raises(ResourceExhausted):
+        GeminiScheduler(max_attempts=3).call(func)
+    assert len(calls) == 3
@@ -0,0 +1,54 @@
+import pytest
+
+from audio import cut_at_silences, group_intervals, merge_contiguous
+from minutes import merge_minutes
+
+
+def test_cut_at_silences_keeps_everything():
+    assert cut_at_silences(100.0, [(20.0, 30.0), (60.0, 70.0)]) == [(0.0, 25.0), (25.0, 65.0), (65.0, 100.0)]
+
+
+def test_group_intervals_breaks_between_intervals():
+    intervals = [(0, 40), (50, 90), (100, 140), (150, 190)]
+    segments = group_intervals(intervals, max_seconds=100)
+    assert segments == [[(0, 40), (50, 90)], [(100, 140), (150, 190)]]
+
+
+def test_group_intervals_splits_long_speech():
+    segments = group_intervals([(0, 250)], max_seconds=100)
+    assert all(sum(end - start for start, end in segment) <= 100 for segment in segments)
+    assert merge_contiguous([piece for segment in segments for piece in segment]) == [(0, 250)]
+
+
+@pytest.mark.parametrize('intervals, expected', [
+    ([(0, 1), (1, 2), (3, 4)], [(0, 2), (3, 4)]),
+    ([], []),
+])
+def test_merge_contiguous(intervals, expected):
+    assert merge_contiguous(intervals) == expected
+
+
+
+def test_merge_minutes_combines_segments():
+    item = {'content': '寄出報價單', 'assignee': 'Allen', 'dueDate': None}
+    parts = [
+        ({'meeting_date': None, 'summary': '前半', 'content': '- A', 'tags': ['營運'], 'action_items': [item]}, (0, 1500)),
+        ({'meeting_date': '2026-03-01', 'summary': '後半', 'content': '- B', 'tags': ['營運', '人事'],
+          'action_items': [dict(item)]}, (1500, 3000)),
+    ]
+    merged = merge_minutes(parts)
+    assert merged['meeting_date'] == '2026-03-01'
+    assert merged['summary'] == '前半\n後半'
+    assert merged['tags'] == ['營運', '人事']
+    assert merged['action_items'] == [item]
+    assert merged['content'].count('#### 第') == 2
+    assert '- A' in merged['content'] and '- B' in merged['content']
+
+
+def test_merge_minutes_keeps_summaries_when_merging_fails():
+    def merge_summaries(summaries):
+        raise RuntimeError('quota')
+
+    parts = [({'summary': 'a', 'content': ''}, None), ({'summary': 'b', 'content': ''}, None)]
+    assert merge_minutes(parts, merge_summaries)['summary'] == 'a\nb'
+    assert merge_minutes(parts, lambda s: ' + '.join(s))['summary'] == 'a + b'
@@ -2,72 +2,150 @@ import sys
 import time
 import os
 import shutil
+import argparse
+import threading
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from process import process_video
+from process import STAGES, ConfigError, load_config, get_scheduler, new_job, cleanup, get_outbox
+from pipeline import Pipeline
+from job_queue import JobQueue, dispatch_loop
 
 # Config
 WATCH_EXTENSIONS = {'.mp4', '.mov', '.m4a', '.mp3', '.wav'}
 
+def is_recording(path):
+    filename = os.path.basename(path)
+    if filename.startswith('.'): # Ignore hidden files
+        return False
+    return os.path.splitext(filename)[1].lower() in WATCH_EXTENSIONS
+
 class VideoHandler(FileSystemEventHandler):
-    def __init__(self, watch_dir):
-        self.watch_dir = watch_dir
-        self.processed_dir = os.path.join(watch_dir, "processed")
-        if not os.path.exists(self.processed_dir):
-            os.makedirs(self.processed_dir)
+    """Only records new recordings in the job queue; the worker pool processes them."""
+    def __init__(self, watch_dir, queue):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.queue = queue
 
-    def on_created(self, event):
-        if event.is_directory:
-            return
-        
-        filename = os.path.basename(event.src_path)
-        if filename.startswith('.'): # Ignore hidden files
+    def enqueue(self, path):
+        # Files moved into processed/ (or anything in a subfolder) are not ours
+        if os.path.dirname(os.path.abspath(path)) != self.watch_dir or not is_recording(path):
             return
+        if self.queue.enqueue(path):
+            print(f"\n[Detector] New file detected: {os.path.basename(path)}")
 
-        ext = os.path.splitext(filename)[1].lower()
-        if ext in WATCH_EXTENSIONS:
-            print(f"\n[Detector] New file detected: {filename}")
-            # Wait a bit to ensure file copy is complete
-            time.sleep(2) 
-            self.process_file(event.src_path)
-
-    def process_file(self, file_path):
-        print(f"Processing {file_path}...")
-        success = process_video(file_path)
-        
-        if success:
-            print(f"Moving {file_path} to processed folder.")
-            filename = os.path.basename(file_path)
-            dest_path = os.path.join(self.processed_dir, filename)
-            # Handle duplicate names in processed folder
-            if os.path.exists(dest_path):
-                 base, ext = os.path.splitext(filename)
-                 dest_path = os.path.join(self.processed_dir, f"{base}_{int(time.time())}{ext}")
-            
-            shutil.move(file_path, dest_path)
-        else:
-            print(f"Failed to process {file_path}. Keeping in place.")
+    def on_created(self, event):
+        if not event.is_directory:
+            self.enqueue(event.src_path)
+
+    def on_modified(self, event):
+        # Still being copied: pushes the readiness check back
+        if not event.is_directory:
+            self.enqueue(event.src_path)
+
+    def on_moved(self, event):
+        # Finder/AirDrop copy to a temp name and rename when done
+        if not event.is_directory:
+            self.enqueue(event.dest_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.enqueue(event.src_path)
+
+def move_to_processed(file_path, processed_dir):
+    print(f"Moving {file_path} to processed folder.")
+    filename = os.path.basename(file_path)
+    dest_path = os.path.join(processed_dir, filename)
+    # Handle duplicate names in processed folder
+    if os.path.exists(dest_path):
+         base, ext = os.path.splitext(filename)
+         dest_path = os.path.join(processed_dir, f"{base}_{int(time.time())}{ext}")
+
+    shutil.move(file_path, dest_path)
+
+def stage_plan(workers):
+    """STAGES with --workers applied to the network-bound stages."""
+    if not workers:
+        return STAGES
+    return [(name, func, workers if name in ('upload', 'generate') else n) for name, func, n in STAGES]
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 watch.py <folder_to_watch>")
-        print("Example: python3 watch.py ~/Downloads/meeting_videos")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Watch a folder and turn new meeting recordings into minutes.")
+    parser.add_argument('folder', help="Folder to watch, e.g. ~/Downloads/meeting_videos")
+    parser.add_argument('--workers', type=int, help="Parallel Gemini uploads/generations (default from process.STAGES)")
+    args = parser.parse_args()
+
+    path = os.path.abspath(os.path.expanduser(args.folder))
 
-    path = sys.argv[1]
-    path = os.path.expanduser(path)
-    
     if not os.path.exists(path):
         print(f"Error: Directory {path} does not exist.")
         sys.exit(1)
 
-    event_handler = VideoHandler(path)
+    # Fail fast on a bad config; the Gemini SDK itself is only imported by the first job
+    try:
+        load_config()
+    except ConfigError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    processed_dir = os.path.join(path, "processed")
+    duplicates_dir = os.path.join(processed_dir, "duplicates")
+    if not os.path.exists(duplicates_dir):
+        os.makedirs(duplicates_dir)
+
+    queue = JobQueue()
+    recovered = queue.recover()
+    if recovered:
+        print(f"Resuming {recovered} job(s) interrupted by the last shutdown.")
+
+    # Recordings already waiting (or that failed last time) go through the same queue
+    for filename in sorted(os.listdir(path)):
+        file_path = os.path.join(path, filename)
+        if os.path.isfile(file_path) and is_recording(file_path):
+            queue.enqueue(file_path)
+
+    def on_done(job):
+        for waiting in cleanup(job):
+            # Copies deferred behind this recording are checked again on the next dispatch
+            queue.retry(waiting['queue_id'])
+        if job.get('waiting_for'):
+            return
+        if 'error' in job:
+            print(f"Failed to process {job['video_path']} ({job['error']}). Keeping in place.")
+            queue.finish(job['queue_id'], False, job['error'])
+        elif job.get('duplicate_of'):
+            # Kept aside for review; run process.py --force on it if it really is a different meeting
+            move_to_processed(job['video_path'], duplicates_dir)
+            queue.finish(job['queue_id'], True, f"duplicate of {job['duplicate_of']}")
+        else:
+            move_to_processed(job['video_path'], processed_dir)
+            queue.finish(job['queue_id'], True)
+        timings = ', '.join(f"{k} {v:.0f}s" for k, v in job['timings'].items())
+        print(f"[Pipeline] {job['name']}: {timings}")
+        print(pipeline.report())
+        print(get_scheduler().report())
+
+    def submit(job):
+        print(f"Processing {job['path']}...")
+        pipeline_job = new_job(job['path'])
+        pipeline_job['queue_id'] = job['id']
+        # The outbox replayer delivers the record, so a slow website never holds up the pipeline
+        pipeline_job['deliver_now'] = False
+        pipeline.submit(pipeline_job)
+
+    get_outbox().start()
+    pipeline = Pipeline(stage_plan(args.workers), on_done)
+    pipeline.start()
+    stop = threading.Event()
+    dispatcher = threading.Thread(target=dispatch_loop, args=(queue, submit, stop), daemon=True)
+    dispatcher.start()
+
+    event_handler = VideoHandler(path, queue)
     observer = Observer()
     observer.schedule(event_handler, path, recursive=False)
     observer.start()
-    
+
     print(f"Monitoring directory: {path}")
     print(f"Supported extensions: {WATCH_EXTENSIONS}")
+    print("Stages: " + ", ".join(f"{stage.name} x{stage.workers}" for stage in pipeline.stages))
     print("Press Ctrl+C to stop.")
 
     try:
@@ -75,7 +153,11 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
+        stop.set()
     observer.join()
+    # Jobs still in the pipeline are picked up again by recover() on the next start
+    dispatcher.join(timeout=1)
+    print(pipeline.report())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import resource
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager, nullcontext
+
+# Shared by the skills' CLIs (each puts skills/shared on sys.path before importing it).
+# Runs are written next to the script that was started, e.g. skills/ichef_sync/profiles/
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])) if sys.argv and sys.argv[0] else os.getcwd(),
+                           'profiles')
+
+# Lines of each listing in summary.txt
+HOT_SPOTS = 20
+ALLOCATION_SITES = 5
+
+_active = None
+
+
+def peak_rss_mb():
+    """Process-wide peak resident set size so far (ru_maxrss is bytes on macOS, KiB on Linux)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+class Profiler:
+    """cProfile, tracemalloc and peak RSS for one run, split into named stages.
+
+    Writes to profiles/<name>_<timestamp>/: profile.pstats (open with
+    `python -m pstats` or snakeviz), stages.json, and summary.txt with the stage
+    table, the hottest functions and the allocation sites that grew the most per stage.
+    cProfile sees the calling thread only, so stages should run on it.
+    """
+
+    def __init__(self, name, directory=PROFILE_DIR):
+        self.dir = os.path.join(directory, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        self.profile = cProfile.Profile()
+        self.stages = {}
+        self.stack = []
+        self.peak = 0
+        # Time spent taking snapshots, left out of the run total
+        self.overhead = 0.0
+        self.started_at = None
+
+    def start(self):
+        tracemalloc.start()
+        self.peak = 0
+        self.started_at = time.perf_counter()
+        self.profile.enable()
+
+    def _snapshot(self):
+        # Leave the profiler's own bookkeeping out of the allocation listings
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def _take_peak(self):
+        """Python heap peak since the last reset, carried into every open stage and the run total."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self.stack:
+            frame['peak'] = max(frame['peak'], peak)
+        self.peak = max(self.peak, peak)
+
+    @contextmanager
+    def stage(self, name):
+        """Times a stage; a stage entered several times (e.g. once per file) is added up.
+
+        Snapshots are taken with the profiler paused and outside the timed span, so
+        stage times and hot spots only show the stage's own work. rss +MB is how far
+        the stage raised the process's peak RSS.
+        """
+        self.profile.disable()
+        paused = time.perf_counter()
+        self._take_peak()
+        frame = {'peak': 0, 'snapshot': self._snapshot(), 'rss': peak_rss_mb()}
+        self.stack.append(frame)
+        tracemalloc.reset_peak()
+        frame['cpu'], frame['wall'] = time.process_time(), time.perf_counter()
+        self.overhead += frame['wall'] - paused
+        self.profile.enable()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+            paused = time.perf_counter()
+            wall, cpu = paused - frame['wall'], time.process_time() - frame['cpu']
+            self._take_peak()
+            self.stack.pop()
+            growth = self._snapshot().compare_to(frame['snapshot'], 'lineno')
+            stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'cpu_seconds': 0.0,
+                                                   'python_peak_mb': 0.0, 'rss_peak_mb': 0.0,
+                                                   'rss_growth_mb': 0.0, 'allocations': []})
+            stats['calls'] += 1
+            stats['seconds'] += wall
+            stats['cpu_seconds'] += cpu
+            stats['python_peak_mb'] = max(stats['python_peak_mb'], frame['peak'] / (1 << 20))
+            stats['rss_peak_mb'] = max(stats['rss_peak_mb'], peak_rss_mb())
+            stats['rss_growth_mb'] += peak_rss_mb() - frame['rss']
+            stats['allocations'] = sorted(
+                stats['allocations'] + [(str(s.traceback), s.size_diff / (1 << 20)) for s in growth[:ALLOCATION_SITES]],
+                key=lambda site: -site[1])[:ALLOCATION_SITES]
+            tracemalloc.reset_peak()
+            self.overhead += time.perf_counter() - paused
+            self.profile.enable()
+
+    def stop(self):
+        """Writes the profile directory and prints the stage table; returns the directory."""
+        self.profile.disable()
+        total = time.perf_counter() - self.started_at - self.overhead
+        self._take_peak()
+        python_peak = self.peak / (1 << 20)
+        top = self._snapshot().statistics('lineno')[:HOT_SPOTS]
+        tracemalloc.stop()
+
+        os.makedirs(self.dir, exist_ok=True)
+        self.profile.dump_stats(os.path.join(self.dir, 'profile.pstats'))
+        with open(os.path.join(self.dir, 'stages.json'), 'w', encoding='utf-8') as f:
+            json.dump({'seconds': total, 'python_peak_mb': python_peak, 'rss_peak_mb': peak_rss_mb(),
+                       'stages': self.stages}, f, ensure_ascii=False, indent=2)
+
+        table = self.stage_table(total, python_peak)
+        with open(os.path.join(self.dir, 'summary.txt'), 'w', encoding='utf-8') as f:
+            f.write(table + "\n")
+            for sort, label in (('cumulative', 'cumulative'), ('tottime', 'own')):
+                f.write(f"\n--- Hot spots by {label} time ---\n")
+                stats = pstats.Stats(self.profile, stream=f)
+                stats.strip_dirs().sort_stats(sort).print_stats(HOT_SPOTS)
+            f.write("\n--- Largest allocation growth per stage (MB) ---\n")
+            for name, stats in self.stages.items():
+                f.write(f"[{name}]\n")
+                for site, size in stats['allocations']:
+                    f.write(f"  {size:+9.2f}  {site}\n")
+            f.write("\n--- Live allocations at the end (MB) ---\n")
+            for s in top:
+                f.write(f"  {s.size / (1 << 20):9.2f}  {s.traceback}\n")
+        print(table)
+        print(f"Profile written to {self.dir}")
+        return self.dir
+
+    def stage_table(self, total, python_peak):
+        lines = [f"{'stage':<16}{'calls':>6}{'wall s':>9}{'cpu s':>9}{'py peak MB':>12}{'rss peak MB':>13}{'rss +MB':>9}"]
+        for name, s in self.stages.items():
+            lines.append(f"{name:<16}{s['calls']:>6}{s['seconds']:>9.2f}{s['cpu_seconds']:>9.2f}"
+                         f"{s['python_peak_mb']:>12.1f}{s['rss_peak_mb']:>13.1f}{s['rss_growth_mb']:>9.1f}")
+        lines.append(f"{'total':<16}{'':>6}{total:>9.2f}{'':>9}{python_peak:>12.1f}{peak_rss_mb():>13.1f}{'':>9}")
+        return "\n".join(lines)
+
+
+def start(name, directory=None):
+    """Turns on profiling for this process; stage() blocks are recorded until stop()."""
+    global _active
+    _active = Profiler(name, directory or PROFILE_DIR)
+    _active.start()
+    return _active
+
+
+def stage(name):
+    """`with profiling.stage('orders'):` - records the block when profiling is on, else does nothing."""
+    return _active.stage(name) if _active else nullcontext()
+
+
+def stop():
+    global _active
+    profiler, _active = _active, None
+    return profiler.stop() if profiler else None
+
+
+@contextmanager
+def profiled(name, enabled=True, directory=None):
+    """Profiles the block (when enabled) and writes the results even if it fails."""
+    if not enabled:
+        yield
+        return
+    start(name, directory)
+    try:
+        yield
+    finally:
+        stop()
@@ -0,0 +1,9 @@
+-- Upsert keys for the iCHEF sync SQL sink (skills/ichef_sync, SqlSink)
+-- Run once on an existing Supabase database before using `--sinks sql`.
+-- Remove any duplicate (invoice_number, checkout_time) orders first, or the index creation fails.
+
+-- Line items of one invoice share invoice_number + checkout_time; line_no tells them apart
+ALTER TABLE product_sales ADD COLUMN IF NOT EXISTS line_no INTEGER NOT NULL DEFAULT 0;
+
+CREATE UNIQUE INDEX IF NOT EXISTS orders_upsert_key ON orders(invoice_number, checkout_time);
+CREATE UNIQUE INDEX IF NOT EXISTS product_sales_upsert_key ON product_sales(invoice_number, checkout_time, line_no);